@@ -1,20 +1,49 @@
-import copy
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 import gc
 import logging
-from typing import List, Optional, Tuple, Union
+import math
+import multiprocessing
+import re
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 from nltk import wordpunct_tokenize
 import numpy as np
 from tqdm import tqdm
 import torch
-from transformers import pipeline, Pipeline
+from transformers import pipeline, Pipeline, StoppingCriteria, StoppingCriteriaList
 
 from utils.utils import time_to_str, get_device
-from wav_io.wav_io import TARGET_SAMPLING_FREQUENCY
+from vad.vad import calculate_voice_probabilities, find_speech_regions, compress_pauses, VADSegmenter
+from vad.vad import find_speech_run_bounds
+from vad.vad import split_long_sound_bounds, stick_short_bounds_to_longer_neighbours
+from wav_io.wav_io import TARGET_SAMPLING_FREQUENCY, AudioBuffer, as_waveform, downmix_to_mono
+from wav_io.wav_io import iter_sound_blocks, prefetch_sound_blocks, PREFETCHED_BLOCKS
 
 
 MIN_SOUND_LENGTH: int = 1600
 OSCILLATORY_HALLUCINATION_MIN_SIZE: int = 4
+WORD_REGEXP = re.compile(r'\w+')  # the word tokens of `nltk.wordpunct_tokenize`
+PHRASE_LOOP_MIN_REPETITIONS: int = 3
+PHRASE_LOOP_MAX_PERIOD: int = 8  # words
+GENERATION_LOOP_MIN_REPETITIONS: int = 5
+GENERATION_LOOP_MAX_PERIOD: int = 16  # tokens
+GENERATION_LOOP_MIN_LENGTH: int = 24  # tokens, so a short word or phrase may be repeated in a real speech
+MAX_CHARS_PER_SECOND: float = 25.0  # a ceiling of the speech rate, which is much faster than a real speech
+GENERATION_TOKEN_MARGIN: int = 8
+WHISPER_WINDOW_DURATION: float = 30.0  # seconds
+WHISPER_MAX_NEW_TOKENS: int = 440  # 448 target positions of Whisper without the decoder prompt
+CHANNEL_ACTIVITY_FRAME: float = 0.03  # seconds
+CHANNEL_SILENCE_LEVEL: float = -50.0  # dBFS
+CROSSTALK_MARGIN: float = 10.0  # dB below the loudest channel, where a channel is considered as crosstalk
+CHANNEL_ACTIVITY_HANGOVER: float = 0.5  # seconds
+SILENCE_SKIPPING_PADDING: float = 0.25  # seconds of a removed silence, which are kept around each speech region
+SHARD_MAX_DURATION: float = 600.0  # seconds
+SEGMENTER_TYPES: Tuple[str, str] = ('wav2vec2', 'vad')
+STREAMING_WINDOW_DURATION: float = 60.0  # seconds of sound, which are processed by the segmenter at once
+STREAMING_WINDOW_OVERLAP: float = 5.0  # seconds, it should be much longer than any word
+STREAMING_BLOCK_DURATION: float = 10.0  # seconds of sound, which are decoded at once
+SEGMENT_FLAG_SPEECH: int = 1  # the segment contains a human speech according to the voice activity detector
 asr_logger = logging.getLogger(__name__)
 
 
@@ -107,36 +136,105 @@ def find_tokens_in_text(source_text: str, tokens: List[str], start_pos: int = 0)
 
 def remove_oscillatory_hallucinations(input_transcription: str) -> str:
     """
-    Searches for a subsequence of OSCILLATORY_HALLUCINATION_MIN_SIZE or more consecutive repetitions
-    of the same word. If found, removes the repetitions. Also strips the input string and performs a
-    space deduplication.
+    Searches for subsequences of OSCILLATORY_HALLUCINATION_MIN_SIZE or more consecutive repetitions
+    of the same word (case-insensitively and ignoring punctuation between them). Each found subsequence
+    is replaced with its first word, and the text after its last word is kept. Also strips the input
+    string and performs a space deduplication.
 
-    TODO consider fixing cases when both calls to `find_tokens_in_text` attend to different fragments:
+    The words are found with their character offsets in one pass, so the time is linear in the text length.
+    Repetitions are cut at their own offsets, even if the repeated word occurs earlier in the text:
     ```
     text = 'What a mess, someone stole the words! A-a-a-a!'
     remove_oscillatory_hallucinations(text)
-    >>> 'What a-a!'
-    """
-    tokens = wordpunct_tokenize(input_transcription.lower())
-    tokens_without_punctuation = list(filter(lambda it: it.isalnum(), tokens))
-    if len(tokens_without_punctuation) >= OSCILLATORY_HALLUCINATION_MIN_SIZE:
-        hallucination_bounds = find_repeated_tokens(tokens_without_punctuation)
-        if hallucination_bounds is None:
-            output_transcription = ' '.join(input_transcription.strip().split())
-        else:
-            start_pos, end_pos = find_tokens_in_text(
-                input_transcription,
-                tokens_without_punctuation[hallucination_bounds[0]:hallucination_bounds[1]]
-            )
-            first_token_start, first_token_end = find_tokens_in_text(
-                input_transcription,
-                tokens_without_punctuation[hallucination_bounds[0]:(hallucination_bounds[0] + 1)]
-            )
-            output_transcription = input_transcription[0:first_token_end] + input_transcription[end_pos:]
-            output_transcription = remove_oscillatory_hallucinations(' '.join(output_transcription.strip().split()))
-    else:
-        output_transcription = ' '.join(input_transcription.strip().split())
-    return output_transcription
+    >>> 'What a mess, someone stole the words! A!'
+    ```
+    """
+    words = [it for it in WORD_REGEXP.finditer(input_transcription) if it.group().isalnum()]
+    fragments = []
+    fragment_start = 0
+    repeated_group_start = 0
+    n_words = len(words)
+    while repeated_group_start < n_words:
+        repeated_word = words[repeated_group_start].group().lower()
+        repeated_group_end = repeated_group_start + 1
+        while (repeated_group_end < n_words) and (words[repeated_group_end].group().lower() == repeated_word):
+            repeated_group_end += 1
+        if (repeated_group_end - repeated_group_start) >= OSCILLATORY_HALLUCINATION_MIN_SIZE:
+            fragments.append(input_transcription[fragment_start:words[repeated_group_start].end()])
+            fragment_start = words[repeated_group_end - 1].end()
+        repeated_group_start = repeated_group_end
+    fragments.append(input_transcription[fragment_start:])
+    return ' '.join(''.join(fragments).split())
+
+
+def find_repeated_ngrams(tokens: List[str], min_repetitions: int = PHRASE_LOOP_MIN_REPETITIONS,
+                         max_period: int = PHRASE_LOOP_MAX_PERIOD, min_period: int = 1) -> List[Tuple[int, int, int]]:
+    """
+    Finds loops of n-grams, i.e. `min_repetitions` or more consecutive copies of the same phrase of `min_period`
+    to `max_period` tokens (tokens are compared case-insensitively).
+
+    The tokens are replaced with integer ids, and for each period P the id array is compared with itself shifted
+    by P, so a run of matches of length M means a periodic fragment of M + P tokens. This takes
+    O(len(tokens) * max_period) vectorized operations, i.e. linear time for a bounded period.
+    If loops overlap, then the earliest one is selected (the longest one and then the one with the shortest
+    period, if they start at the same token).
+
+    Output: a sorted list of non-overlapping loops (start, end, period), where `tokens[start:end]` consists
+    of (end - start) // period copies of `tokens[start:(start + period)]`.
+    """
+    if min_repetitions < 2:
+        err_msg = f'The minimal repetition number is wrong! Expected 2 or greater, got {min_repetitions}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    if (min_period < 1) or (max_period < min_period):
+        err_msg = f'The period range [{min_period}, {max_period}] is wrong!'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    token_vocabulary: Dict[str, int] = dict()
+    token_ids = np.array([token_vocabulary.setdefault(it.lower(), len(token_vocabulary)) for it in tokens],
+                         dtype=np.int64)
+    n_tokens = token_ids.shape[0]
+    candidates = []
+    for period in range(min_period, min(max_period, n_tokens // min_repetitions) + 1):
+        is_equal = np.zeros((n_tokens - period + 2,), dtype=np.int8)
+        is_equal[1:-1] = (token_ids[period:] == token_ids[:(n_tokens - period)])
+        changes = np.diff(is_equal)
+        run_starts = np.flatnonzero(changes == 1)
+        run_ends = np.flatnonzero(changes == -1)
+        n_repetitions = (run_ends - run_starts + period) // period
+        for run_start, run_repetitions in zip(run_starts[n_repetitions >= min_repetitions].tolist(),
+                                              n_repetitions[n_repetitions >= min_repetitions].tolist()):
+            candidates.append((run_start, run_start + run_repetitions * period, period))
+    candidates.sort(key=lambda it: (it[0], it[0] - it[1], it[2]))
+    loops = []
+    for loop_start, loop_end, period in candidates:
+        if (len(loops) == 0) or (loop_start >= loops[-1][1]):
+            loops.append((loop_start, loop_end, period))
+    return loops
+
+
+def remove_repeated_phrases(input_transcription: str, min_repetitions: int = PHRASE_LOOP_MIN_REPETITIONS,
+                            max_period: int = PHRASE_LOOP_MAX_PERIOD) -> str:
+    """
+    Replaces loops of repeated phrases of 2 to `max_period` words (see `find_repeated_ngrams`) with the first copy
+    of the phrase, and keeps the text after the last copy. Single repeated words are processed by
+    `remove_oscillatory_hallucinations`. Also strips the input string and performs a space deduplication.
+
+    Example:
+    ```
+    remove_repeated_phrases('Thank you for watching. Thank you for watching. Thank you for watching.')
+    >>> 'Thank you for watching.'
+    ```
+    """
+    words = [it for it in WORD_REGEXP.finditer(input_transcription) if it.group().isalnum()]
+    fragments = []
+    fragment_start = 0
+    for loop_start, loop_end, period in find_repeated_ngrams([it.group() for it in words], min_repetitions,
+                                                             max_period, min_period=2):
+        fragments.append(input_transcription[fragment_start:words[loop_start + period - 1].end()])
+        fragment_start = words[loop_end - 1].end()
+    fragments.append(input_transcription[fragment_start:])
+    return ' '.join(''.join(fragments).split())
 
 
 def check_language(lang: str) -> str:
@@ -152,7 +250,8 @@ def check_language(lang: str) -> str:
     return language_name
 
 
-def initialize_model_for_speech_segmentation(language: str = 'ru', model_info: Optional[str] = None) -> Pipeline:
+def initialize_model_for_speech_segmentation(language: str = 'ru', model_info: Optional[str] = None,
+                                             device: Optional[str] = None) -> Pipeline:
     """
     Loads and returns a specified Pipeline to use for speech segmentation.
     
@@ -162,6 +261,7 @@ def initialize_model_for_speech_segmentation(language: str = 'ru', model_info: O
     - `language` is used only if `model_info` is not provided to load a default pipeline:
         - for language='ru': 'bond005/wav2vec2-large-ru-golos'
         - for language='en': 'jonatasgrosman/wav2vec2-large-xlsr-53-english'.
+    - `device` is a device of the model (see `utils.get_device` for the default one).
     
     Returned value: an AutomaticSpeechRecognitionPipeline, to be called on mono sound with rate 16_000
     and argument `return_timestamps='word'`. In Pisets, only the output timestamps are used, not the
@@ -196,7 +296,8 @@ def initialize_model_for_speech_segmentation(language: str = 'ru', model_info: O
         else:
             model_name = 'jonatasgrosman/wav2vec2-large-xlsr-53-english'
     try:
-        device = get_device()
+        if device is None:
+            device = get_device()
         print(f"Используется устройство: {device}")
 
         segmenter = pipeline(
@@ -208,13 +309,30 @@ def initialize_model_for_speech_segmentation(language: str = 'ru', model_info: O
     return segmenter
 
 
-def initialize_model_for_speech_classification(model_info: Optional[str] = None) -> Pipeline:
+def initialize_segmenter(segmenter_type: str = 'wav2vec2', language: str = 'ru',
+                         model_info: Optional[str] = None, device: Optional[str] = None) -> Union[Pipeline, VADSegmenter]:
+    """
+    Returns a segmenter of the specified type (one of `SEGMENTER_TYPES`): the Wav2Vec2-based pipeline
+    (see `initialize_model_for_speech_segmentation`) or the lightweight `vad.VADSegmenter`, which needs no model.
+    """
+    if segmenter_type == 'vad':
+        return VADSegmenter()
+    if segmenter_type != 'wav2vec2':
+        err_msg = f'The segmenter type "{segmenter_type}" is unknown! Expected one of {SEGMENTER_TYPES}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    return initialize_model_for_speech_segmentation(language, model_info=model_info, device=device)
+
+
+def initialize_model_for_speech_classification(model_info: Optional[str] = None,
+                                               device: Optional[str] = None) -> Pipeline:
     """
     Loads and returns a specified Pipeline to use for voice activity detection (VAD).
     
     Arguments:
     - `model_info` can be any Hugging Face model name or path for 'audio-classification' pipeline.
       By default, loads 'MIT/ast-finetuned-audioset-10-10-0.4593' (a default VAD for Pisets).
+    - `device` is a device of the model (see `utils.get_device` for the default one).
     
     Returned value: An AudioClassificationPipeline, to be called on mono sound with rate 16_000 and returns
     a list of classes. Pisets considers a sound as speech if the top class name contains a word "speech".
@@ -240,7 +358,8 @@ def initialize_model_for_speech_classification(model_info: Optional[str] = None)
     else:
         model_name = 'MIT/ast-finetuned-audioset-10-10-0.4593'
     try:
-        device = get_device()
+        if device is None:
+            device = get_device()
         print(f"Используется устройство: {device}")
 
         classifier = pipeline(
@@ -251,7 +370,8 @@ def initialize_model_for_speech_classification(model_info: Optional[str] = None)
     return classifier
 
 
-def initialize_model_for_speech_recognition(language: str = 'ru', model_info: Optional[str] = None) -> Pipeline:
+def initialize_model_for_speech_recognition(language: str = 'ru', model_info: Optional[str] = None,
+                                            device: Optional[str] = None) -> Pipeline:
     """
     Loads and returns a specified Pipeline to use for speech recognition.
     
@@ -260,8 +380,10 @@ def initialize_model_for_speech_recognition(language: str = 'ru', model_info: Op
     - `language` is used only if `model_info` is not provided to load a default pipeline:
         - for language='ru': 'bond005/whisper-large-v3-ru-podlodka'
         - for language='en': 'openai/whisper-large-v3'.
+    - `device` is a device of the model (see `utils.get_device` for the default one).
     
     Returned value: an AutomaticSpeechRecognitionPipeline, to be called on mono sound with rate 16_000.
+    `recognize_sounds` limits its generation with `RepetitionLoopStoppingCriteria` and `calculate_max_new_tokens`.
 
     Example:
     ```
@@ -281,13 +403,14 @@ def initialize_model_for_speech_recognition(language: str = 'ru', model_info: Op
         else:
             model_name = 'openai/whisper-large-v3'
     try:
-        device = get_device()
+        if device is None:
+            device = get_device()
         print(f"Используется устройство: {device}")
 
         recognizer = pipeline(
             'automatic-speech-recognition', model=model_name,
             chunk_length_s=20, stride_length_s=(4, 2),
-            device=device, model_kwargs={'attn_implementation': 'sdpa'}, torch_dtype=torch.float16 if device == "cuda:0" else torch.float32
+            device=device, model_kwargs={'attn_implementation': 'sdpa'}, torch_dtype=torch.float16 if device.startswith("cuda") else torch.float32
             )
         
     except Exception as err:
@@ -303,8 +426,8 @@ def select_word_groups(
     """
     Accepts a list of consecutive segments, each segment is a tuple (start_time, end_time).
 
-    Iteratively splits the list of segments into "left" and "right" part by the largest pause between segments,
-    then splits both parts the same way, and so on. A list of segments is splitted only if its total length
+    Iteratively splits the list of segments into "left" and "right" part by the largest pause between segments
+    (the leftmost one if there are several such pauses), then splits both parts the same way, and so on. A list of segments is splitted only if its total length
     (from the beginning of the first segment to the end of the last segment) is no shorter than `segment_size`,
     otherwise it is not splitted.
 
@@ -327,33 +450,160 @@ def select_word_groups(
     result = select_word_groups([], segment_size=0)
     assert result == [[]]
     ```
+
+    The largest pause of each part is found with a sparse table over the pauses, so the splitting takes
+    O(n log n) time without any recursion, and a list of tens of thousands of words is processed quickly.
     """
     if len(words) < 2:
         return [words]
-    if words[-1][1] - words[0][0] < segment_size:
-        return [words]
-    if len(words) == 2:
-        return [words[0:1], words[1:2]]
-    max_pause = words[1][0] - words[0][1]
-    best_word_idx = 0
-    for word_idx in range(1, len(words) - 1):
-        new_pause = words[word_idx + 1][0] - words[word_idx][1]
-        if new_pause > max_pause:
-            max_pause = new_pause
-            best_word_idx = word_idx
-    left_frame = words[0:(best_word_idx + 1)]
-    right_frame = words[(best_word_idx + 1):]
-    if (left_frame[-1][1] - left_frame[0][0]) < segment_size:
-        word_groups = [left_frame]
-    else:
-        word_groups = select_word_groups(left_frame, segment_size)
-    if (right_frame[-1][1] - right_frame[0][0]) < segment_size:
-        word_groups += [right_frame]
-    else:
-        word_groups += select_word_groups(right_frame, segment_size)
+    starts = np.array([it[0] for it in words], dtype=np.float64)
+    ends = np.array([it[1] for it in words], dtype=np.float64)
+    pauses = starts[1:] - ends[:-1]
+    # The sparse table: table[k][i] is an index of the leftmost maximal pause among pauses[i:(i + 2 ** k)]
+    table = [np.arange(pauses.shape[0], dtype=np.int64)]
+    step = 1
+    while 2 * step <= pauses.shape[0]:
+        prev = table[-1]
+        left = prev[:(prev.shape[0] - step)]
+        right = prev[step:]
+        table.append(np.where(pauses[left] >= pauses[right], left, right))
+        step *= 2
+    # Scalar access to Python lists is much faster than to NumPy arrays in the loop below
+    table = [it.tolist() for it in table]
+    starts = starts.tolist()
+    ends = ends.tolist()
+    pauses = pauses.tolist()
+    word_groups = []
+    frames = [(0, len(words))]
+    while len(frames) > 0:
+        frame_start, frame_end = frames.pop()
+        if (frame_end - frame_start < 2) or (ends[frame_end - 1] - starts[frame_start] < segment_size):
+            word_groups.append(words[frame_start:frame_end])
+            continue
+        level = (frame_end - frame_start - 1).bit_length() - 1
+        left = table[level][frame_start]
+        right = table[level][frame_end - 1 - (1 << level)]
+        best_word_idx = left if pauses[left] >= pauses[right] else right
+        frames.append((best_word_idx + 1, frame_end))
+        frames.append((frame_start, best_word_idx + 1))
     return word_groups
 
 
+class SegmentTable:
+    """
+    A compact columnar table of segments: NumPy arrays of starts and ends (in seconds), bit flags
+    (e.g. `SEGMENT_FLAG_SPEECH`) and scores (e.g. the score of the voice activity detector, NaN if unknown).
+
+    The table imitates a list of tuples (start_time, end_time): `len(table)`, `table[idx]` and iteration work
+    as for a list, and `to_list` converts the table to a list. The clipping, the overlap resolution, the conversion
+    to sample indices and the statistics are vectorized, so long recordings with many thousands of segments
+    are processed quickly, and each segment takes 21 bytes instead of a tuple of two Python floats.
+
+    Example:
+    ```
+    table = SegmentTable.from_list([(-0.5, 2.0), (1.5, 3.0)]).clip(5.0).resolve_overlaps()
+    assert table.to_list() == [(0.0, 1.75), (1.75, 3.0)]
+    ```
+    """
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, flags: Optional[np.ndarray] = None,
+                 scores: Optional[np.ndarray] = None):
+        starts = np.asarray(starts, dtype=np.float64).reshape((-1,))
+        ends = np.asarray(ends, dtype=np.float64).reshape((-1,))
+        if starts.shape != ends.shape:
+            err_msg = f'The segment starts do not correspond to the segment ends! {starts.shape} != {ends.shape}.'
+            raise ValueError(err_msg)
+        if flags is None:
+            flags = np.zeros(starts.shape, dtype=np.uint8)
+        else:
+            flags = np.asarray(flags, dtype=np.uint8).reshape((-1,))
+        if scores is None:
+            scores = np.full(starts.shape, np.nan, dtype=np.float32)
+        else:
+            scores = np.asarray(scores, dtype=np.float32).reshape((-1,))
+        if (flags.shape != starts.shape) or (scores.shape != starts.shape):
+            err_msg = f'The segment flags or scores do not correspond to the segment bounds! ' \
+                      f'{flags.shape} and {scores.shape} are not equal to {starts.shape}.'
+            raise ValueError(err_msg)
+        self.starts = starts
+        self.ends = ends
+        self.flags = flags
+        self.scores = scores
+
+    @classmethod
+    def from_list(cls, segments: Sequence[Tuple[float, float]]) -> 'SegmentTable':
+        if len(segments) == 0:
+            return cls(np.zeros((0,), dtype=np.float64), np.zeros((0,), dtype=np.float64))
+        segment_bounds = np.array(segments, dtype=np.float64).reshape((len(segments), 2))
+        return cls(segment_bounds[:, 0], segment_bounds[:, 1])
+
+    @property
+    def durations(self) -> np.ndarray:
+        return self.ends - self.starts
+
+    @property
+    def nbytes(self) -> int:
+        return self.starts.nbytes + self.ends.nbytes + self.flags.nbytes + self.scores.nbytes
+
+    def __len__(self) -> int:
+        return self.starts.shape[0]
+
+    def __getitem__(self, item: int) -> Tuple[float, float]:
+        return float(self.starts[item]), float(self.ends[item])
+
+    def __iter__(self):
+        return iter(zip(self.starts.tolist(), self.ends.tolist()))
+
+    def to_list(self) -> List[Tuple[float, float]]:
+        return list(zip(self.starts.tolist(), self.ends.tolist()))
+
+    def select(self, mask: np.ndarray) -> 'SegmentTable':
+        return SegmentTable(self.starts[mask], self.ends[mask], self.flags[mask], self.scores[mask])
+
+    def pad(self, indent: float) -> 'SegmentTable':
+        return SegmentTable(self.starts - indent, self.ends + indent, self.flags, self.scores)
+
+    def clip(self, max_sound_duration: float) -> 'SegmentTable':
+        return SegmentTable(np.maximum(self.starts, 0.0), np.minimum(self.ends, max_sound_duration),
+                            self.flags, self.scores)
+
+    def resolve_overlaps(self) -> 'SegmentTable':
+        """
+        If a segment overlaps the next one, then both overlapping borders are shifted to the middle of the overlap,
+        so the end of the previous segment becomes the start of the next segment.
+        """
+        overlaps = np.maximum(self.ends[:-1] - self.starts[1:], 0.0) / 2.0
+        new_starts = self.starts.copy()
+        new_ends = self.ends.copy()
+        new_starts[1:] += overlaps
+        new_ends[:-1] -= overlaps
+        return SegmentTable(new_starts, new_ends, self.flags, self.scores)
+
+    def to_samples(self, n_samples: int) -> np.ndarray:
+        """
+        Returns an int64 array of (start, end) sample bounds of shape (n_segments, 2), which do not go beyond
+        the sound of `n_samples` samples.
+        """
+        sample_bounds = np.empty((len(self), 2), dtype=np.int64)
+        sample_bounds[:, 0] = np.round(self.starts * TARGET_SAMPLING_FREQUENCY)
+        sample_bounds[:, 1] = np.round(self.ends * TARGET_SAMPLING_FREQUENCY)
+        return np.minimum(sample_bounds, n_samples)
+
+    def describe(self) -> Dict[str, Union[int, float]]:
+        """
+        Returns the statistics of segment durations: the minimal duration (and the index of the first shortest
+        segment), the maximal, the median (the upper one for an even number of segments) and the mean durations.
+        """
+        durations = self.durations
+        min_segment_idx = int(np.argmin(durations))
+        return {
+            'min_segment_idx': min_segment_idx,
+            'min': float(durations[min_segment_idx]),
+            'max': float(np.max(durations)),
+            'median': float(np.partition(durations, durations.shape[0] // 2)[durations.shape[0] // 2]),
+            'mean': float(np.mean(durations))
+        }
+
+
 def strip_segments(
     segments: List[Tuple[float, float]],
     max_sound_duration: float
@@ -361,7 +611,7 @@ def strip_segments(
     """
     Clips tuples (start_time, end_time) between (0, max_sound_duration).
     """
-    return [(max(0.0, it[0]), min(it[1], max_sound_duration)) for it in segments]
+    return SegmentTable.from_list(segments).clip(max_sound_duration).to_list()
 
 
 def join_short_segments_to_long_ones(
@@ -374,91 +624,132 @@ def join_short_segments_to_long_ones(
     2) The pause between it and a neigbour segment is shorter than `min_segment_size`
 
     If segment is short, not the first, not the last, and both pauses around it are shorter
-    than `min_segment_size`, then merges along the shorter pause.
+    than `min_segment_size`, then merges along the shorter pause. A segment merged with the right neighbour
+    is checked again, and the merging takes linear time on the number of segments.
     """
     n_segments = len(segments)
-
-    if n_segments > 1:
-        new_segments = copy.deepcopy(segments)
-
-        segment_idx = 0
-        while segment_idx < len(new_segments):
-            segment_start, segment_end = new_segments[segment_idx]
-            if (segment_end - segment_start) < min_segment_size:
-                if (segment_idx > 0) and (segment_idx < len(new_segments) - 1):
-                    distance_to_left = segment_start - new_segments[segment_idx - 1][1]
-                    distance_to_right = new_segments[segment_idx + 1][0] - segment_end
-                    if distance_to_left < distance_to_right:
-                        if distance_to_left < min_segment_size:
-                            new_segments[segment_idx - 1] = (
-                                new_segments[segment_idx - 1][0],
-                                segment_end
-                            )
-                            _ = new_segments.pop(segment_idx)
-                        else:
-                            segment_idx += 1
-                    else:
-                        if distance_to_right < min_segment_size:
-                            new_segments[segment_idx + 1] = (
-                                segment_start,
-                                new_segments[segment_idx + 1][1]
-                            )
-                            _ = new_segments.pop(segment_idx)
-                        else:
-                            segment_idx += 1
-                elif segment_idx > 0:
-                    distance_to_left = segment_start - new_segments[segment_idx - 1][1]
-                    if distance_to_left < min_segment_size:
-                        new_segments[segment_idx - 1] = (
-                            new_segments[segment_idx - 1][0],
-                            segment_end
-                        )
-                        _ = new_segments.pop(segment_idx)
-                    else:
-                        segment_idx += 1
+    if n_segments < 2:
+        return segments
+
+    # The merged segments form a stack: a short segment is either added to the top of the stack (the left
+    # neighbour), or joined with the next segment, and then the joined segment is checked again.
+    new_segments = []
+    segment_start, segment_end = segments[0]
+    next_idx = 1
+    while True:
+        if (segment_end - segment_start) < min_segment_size:
+            distance_to_left = (segment_start - new_segments[-1][1]) if (len(new_segments) > 0) else None
+            distance_to_right = (segments[next_idx][0] - segment_end) if (next_idx < n_segments) else None
+            if (distance_to_left is not None) and (distance_to_right is not None):
+                join_to_left = (distance_to_left < distance_to_right)
+            else:
+                join_to_left = (distance_to_left is not None)
+            if (distance_to_left is None) and (distance_to_right is None):
+                new_segments.append((segment_start, segment_end))
+            elif join_to_left:
+                if distance_to_left < min_segment_size:
+                    new_segments[-1] = (new_segments[-1][0], segment_end)
                 else:
-                    distance_to_right = new_segments[segment_idx + 1][0] - segment_end
-                    if distance_to_right < min_segment_size:
-                        new_segments[segment_idx + 1] = (
-                            segment_start,
-                            new_segments[segment_idx + 1][1]
-                        )
-                        _ = new_segments.pop(segment_idx)
-                    else:
-                        segment_idx += 1
+                    new_segments.append((segment_start, segment_end))
+            elif distance_to_right < min_segment_size:
+                segment_end = segments[next_idx][1]
+                next_idx += 1
+                continue
             else:
-                segment_idx += 1
-    else:
-        new_segments = segments
+                new_segments.append((segment_start, segment_end))
+        else:
+            new_segments.append((segment_start, segment_end))
+        if next_idx >= n_segments:
+            break
+        segment_start, segment_end = segments[next_idx]
+        next_idx += 1
 
     return new_segments
 
 
+def find_word_bounds(mono_sound: Union[np.ndarray, AudioBuffer], segmenter: Pipeline) -> List[Tuple[float, float]]:
+    """
+    Applies `segmenter` to the whole `mono_sound` and returns a list of tuples (start_time, end_time)
+    for all recognized words (in seconds from the sound start).
+
+    A `vad.VADSegmenter` quantizes the sound to 16-bit PCM anyway, so it gets an AudioBuffer as is, and the float32
+    copy of the whole sound is made only for the Wav2Vec2 pipeline.
+    """
+    if isinstance(segmenter, VADSegmenter):
+        return [(float(it['timestamp'][0]), float(it['timestamp'][1]))
+                for it in segmenter(mono_sound, return_timestamps='word')['chunks']]
+    output = segmenter(as_waveform(mono_sound), return_timestamps='word')
+    gc.collect()
+    torch.cuda.empty_cache()
+    return [(float(it['timestamp'][0]), float(it['timestamp'][1])) for it in output['chunks']]
+
+
+def snap_segments_to_speech(segments: Union[List[Tuple[float, float]], SegmentTable], speech_probabilities: np.ndarray,
+                            indent_for_silence: float, speech_guard: float) -> SegmentTable:
+    """
+    Pads segments up to the speech onsets and offsets found by the VAD ensemble instead of the fixed padding.
+
+    Each segment start is moved to the onset of the speech run around it (see `vad.find_speech_run_bounds`)
+    minus `speech_guard` seconds, and each segment end is moved to the offset of the speech run plus `speech_guard`.
+    The segment (i.e. the edges of its words) is never shrunk, so at least `speech_guard` seconds are kept around
+    it (if `speech_guard` does not exceed `indent_for_silence`), and it is never padded by more than
+    `indent_for_silence`, so the result is not longer than with the fixed padding.
+
+    Returns a `SegmentTable` with the padded segments.
+    """
+    if not isinstance(segments, SegmentTable):
+        segments = SegmentTable.from_list(segments)
+    if len(segments) == 0:
+        return segments
+    onsets, _ = find_speech_run_bounds(speech_probabilities,
+                                       np.round(segments.starts * TARGET_SAMPLING_FREQUENCY).astype(np.int64))
+    _, offsets = find_speech_run_bounds(speech_probabilities,
+                                        np.round(segments.ends * TARGET_SAMPLING_FREQUENCY).astype(np.int64))
+    onsets = np.minimum(onsets / TARGET_SAMPLING_FREQUENCY, segments.starts) - speech_guard
+    offsets = np.maximum(offsets / TARGET_SAMPLING_FREQUENCY, segments.ends) + speech_guard
+    return SegmentTable(np.maximum(onsets, segments.starts - indent_for_silence),
+                        np.minimum(offsets, segments.ends + indent_for_silence), segments.flags, segments.scores)
+
+
 def segment_sound(
-    mono_sound: np.ndarray,
+    mono_sound: Union[np.ndarray, AudioBuffer],
     segmenter: Pipeline,
     min_segment_size: float,
     max_segment_size: float,
-    indent_for_silence: float = 0.5
-) -> List[Tuple[float, float]]:
+    indent_for_silence: float = 0.5,
+    min_silence: Optional[float] = None,
+    speech_guard: Optional[float] = None
+) -> SegmentTable:
     """
     Arguments:
     - mono_sound: 1D waveform with rate 16_000 (equals wav_io.TARGET_SAMPLING_FREQUENCY),
-      possibly very long, and no shorter than asr.MIN_SOUND_LENGTH.
+      possibly very long, and no shorter than asr.MIN_SOUND_LENGTH. It can be an AudioBuffer,
+      which is converted to float32 only for the duration of the `segmenter` call.
     - segmenter: an AutomaticSpeechRecognitionPipeline that can process long audios and
       returns word timestamps. See `initialize_model_for_speech_segmentation` for details.
+      A `vad.VADSegmenter` can be used instead, if the Wav2Vec2 model is too heavy.
     - min_segment_size: see below
     - max_segment_size: see below
     - indent_for_silence: see below
+    - min_silence: if it is specified, then silences no shorter than `min_silence` seconds
+      are found by the WebRTC VAD ensemble (see `vad.find_speech_regions`), and `segmenter` is
+      applied to the speech regions between them only. Word timestamps are mapped back to the
+      timeline of `mono_sound`, so the output does not depend on the regions.
+    - speech_guard: if it is specified, then segments are padded up to the speech onsets and offsets
+      found by the WebRTC VAD ensemble with a guard margin of `speech_guard` seconds instead of the
+      fixed `indent_for_silence` (see `snap_segments_to_speech`).
+
+    Output: a `SegmentTable` with (start_time, end_time) of all found utterances, can be empty.
+    It can be used as a list of tuples (start_time, end_time).
 
-    Output: a list of tuples (start_time, end_time) for all found utterances, can be empty.
-    
     Performs the following actions:
-    1) Obtains speech segment boundaries by applying `segmenter` to `mono_sound`.
+    1) Obtains speech segment boundaries by applying `segmenter` to `mono_sound` (or to its
+      speech regions, if `min_silence` is specified).
     2) Performs `select_word_groups` with `max_segment_size` argment and then merge each
       group into one segment. Thus we join adjacent segments with short pauses between, but
       do not exceed `max_segment_size` (if the initial segments do not exceed it).
-    3) Adds a padding `indent_for_silence` (in seconds) added around each obtained segment,
+    3) Adds a padding `indent_for_silence` (in seconds) added around each obtained segment
+      (or a shorter padding up to the speech bounds, if `speech_guard` is specified),
       but without going beyond the input audio boundaries. Note that we just expand the borders,
       but we do not check that padding is a silence. If the segments start to overlap after
       adding a padding, we shift the overlapping borders so that the end of the previous sement
@@ -479,7 +770,7 @@ def segment_sound(
     if A = (0, 0.75), B = (1.5, 6), they will be joined to (0, 6), exceeding `max_segment_size=5`,
     while both segments do not.
     """
-    if not isinstance(mono_sound, np.ndarray):
+    if not isinstance(mono_sound, (np.ndarray, AudioBuffer)):
         err_msg = f'The sound is wrong! Expected {type(np.array([1, 2]))}, got {type(mono_sound)}.'
         asr_logger.error(err_msg)
         raise ValueError(err_msg)
@@ -493,72 +784,315 @@ def segment_sound(
         asr_logger.error(err_msg)
         raise ValueError(err_msg)
 
-    output = segmenter(mono_sound, return_timestamps='word')
-    gc.collect()
-    torch.cuda.empty_cache()
+    if (min_silence is not None) and (min_silence <= 0.0):
+        err_msg = f'The minimal silence duration is wrong! Expected a positive value, got {min_silence}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    if (speech_guard is not None) and (speech_guard < 0.0):
+        err_msg = f'The guard margin is wrong! Expected a non-negative value, got {speech_guard}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    if (min_silence is None) and (speech_guard is None):
+        speech_probabilities = None
+    else:
+        speech_probabilities = calculate_voice_probabilities(mono_sound)
+
+    def pad_segments(segments_without_padding: SegmentTable) -> SegmentTable:
+        if speech_guard is None:
+            padded_segments = segments_without_padding.pad(indent_for_silence)
+        else:
+            padded_segments = snap_segments_to_speech(segments_without_padding, speech_probabilities,
+                                                      indent_for_silence, speech_guard)
+        return padded_segments.clip(mono_sound.shape[0] / TARGET_SAMPLING_FREQUENCY)
+
+    if min_silence is None:
+        word_bounds = find_word_bounds(mono_sound, segmenter)
+    else:
+        speech_regions = find_speech_regions(
+            speech_probabilities,
+            sound_length=mono_sound.shape[0],
+            min_silence_length=round(min_silence * TARGET_SAMPLING_FREQUENCY),
+            padding=round(SILENCE_SKIPPING_PADDING * TARGET_SAMPLING_FREQUENCY)
+        )
+        speech_duration = sum([(it[1] - it[0]) for it in speech_regions]) / TARGET_SAMPLING_FREQUENCY
+        asr_logger.info(f'The VAD has found {len(speech_regions)} speech regions with a total duration of '
+                        f'{round(speech_duration, 3)} seconds '
+                        f'from {round(mono_sound.shape[0] / TARGET_SAMPLING_FREQUENCY, 3)} seconds.')
+        word_bounds = []
+        for region_start, region_end in speech_regions:
+            if (region_end - region_start) <= MIN_SOUND_LENGTH:
+                continue
+            if isinstance(mono_sound, AudioBuffer):
+                region_sound = mono_sound.view(region_start, region_end)
+            else:
+                region_sound = mono_sound[region_start:region_end]
+            region_offset = region_start / TARGET_SAMPLING_FREQUENCY
+            word_bounds += [(it[0] + region_offset, it[1] + region_offset)
+                            for it in find_word_bounds(region_sound, segmenter)]
+            del region_sound
+    return join_words_into_segments(word_bounds, min_segment_size, max_segment_size, pad_segments)
+
 
-    word_bounds = [(float(it['timestamp'][0]), float(it['timestamp'][1])) for it in output['chunks']]
+def join_words_into_segments(word_bounds: List[Tuple[float, float]], min_segment_size: float,
+                             max_segment_size: float,
+                             pad_segments: Callable[[SegmentTable], SegmentTable]) -> SegmentTable:
+    """
+    Performs the steps 2-4 of `segment_sound` on word bounds found by a segmenter: groups words by
+    `select_word_groups`, pads the groups by `pad_segments`, which should also clip them to the sound,
+    resolves overlaps and merges short segments by `join_short_segments_to_long_ones`.
+    """
     if len(word_bounds) < 1:
-        return []
+        return SegmentTable.from_list([])
     if len(word_bounds) == 1:
-        segment_start = word_bounds[0][0] - indent_for_silence
-        segment_end = word_bounds[0][1] + indent_for_silence
-        return strip_segments([(segment_start, segment_end)],
-                              mono_sound.shape[0] / TARGET_SAMPLING_FREQUENCY)
+        return pad_segments(SegmentTable.from_list([word_bounds[0]]))
     if (word_bounds[-1][1] - word_bounds[0][0]) <= max_segment_size:
-        segment_start = word_bounds[0][0] - indent_for_silence
-        segment_end = word_bounds[-1][1] + indent_for_silence
-        return strip_segments([(segment_start, segment_end)],
-                              mono_sound.shape[0] / TARGET_SAMPLING_FREQUENCY)
+        return pad_segments(SegmentTable.from_list([(word_bounds[0][0], word_bounds[-1][1])]))
     word_groups = select_word_groups(word_bounds, max_segment_size)
 
-    segments = strip_segments(
-        [(cur_group[0][0] - indent_for_silence, cur_group[-1][1] + indent_for_silence) for cur_group in word_groups],
-        mono_sound.shape[0] / TARGET_SAMPLING_FREQUENCY
-    )
-    n_segments = len(segments)
+    segments = pad_segments(SegmentTable.from_list([(cur_group[0][0], cur_group[-1][1])
+                                                     for cur_group in word_groups]))
+    segments = segments.resolve_overlaps()
 
-    if n_segments > 1:
-        for idx in range(1, n_segments):
-            if segments[idx - 1][1] > segments[idx][0]:
-                overlap = segments[idx - 1][1] - segments[idx][0]
-                segments[idx - 1] = (segments[idx - 1][0], segments[idx - 1][1] - overlap / 2.0)
-                segments[idx] = (segments[idx][0] + overlap / 2.0, segments[idx][1])
+    return SegmentTable.from_list(join_short_segments_to_long_ones(segments.to_list(), min_segment_size))
 
-    return join_short_segments_to_long_ones(segments, min_segment_size)
+
+def find_word_bounds_streaming(
+    blocks: Iterable[Tuple[int, np.ndarray]],
+    segmenter: Pipeline,
+    window_duration: float = STREAMING_WINDOW_DURATION,
+    overlap_duration: float = STREAMING_WINDOW_OVERLAP
+) -> Tuple[List[Tuple[float, float]], int]:
+    """
+    Applies `segmenter` to overlapping windows of a sound, which is given by consecutive blocks
+    (pairs of the block offset in samples and the block, as `wav_io.iter_sound_blocks` yields without overlap).
+
+    Each window is `window_duration` seconds long, and it starts `overlap_duration` seconds before the end
+    of the previous window. The words of a window, which start after the middle of its overlap with the next window,
+    are not accepted yet, because the next window sees them with more context (so a word crossing a window edge
+    is taken from the window where it is complete, if the overlap is at least twice as long as the word). The
+    timestamps of a word depend on its context, so the words of the next window are deduplicated by time instead
+    of the cut point: a word is skipped if it ends before the end of the last accepted word, or if it overlaps
+    the last accepted word by more than half of the shorter one of them (the start of a word with a smaller overlap
+    is moved to the end of the last accepted word). Samples before the next window are released as soon as
+    the window is processed, so no more than one window and one block are kept in memory.
+
+    Returns a list of tuples (start_time, end_time) for all recognized words (in seconds from the sound start)
+    and the total number of samples.
+    """
+    window_size = round(window_duration * TARGET_SAMPLING_FREQUENCY)
+    overlap_size = round(overlap_duration * TARGET_SAMPLING_FREQUENCY)
+    if window_size <= MIN_SOUND_LENGTH:
+        err_msg = f'The window duration is too short! Expected a value greater than ' \
+                  f'{MIN_SOUND_LENGTH / TARGET_SAMPLING_FREQUENCY} seconds, got {window_duration}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    if (overlap_size < 0) or (overlap_size >= window_size):
+        err_msg = f'The window overlap is wrong! Expected a non-negative value which is less than the window ' \
+                  f'duration {window_duration}, got {overlap_duration} seconds.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+
+    word_bounds = []
+    pending_words = []  # words after the cut point of the last window, which can be found by the next window again
+    buffered_blocks = []
+    buffer_start = 0
+    buffer_length = 0
+    n_windows = 0
+
+    def find_words_in_window(window: np.ndarray, window_start: int) -> List[Tuple[float, float]]:
+        window_offset = window_start / TARGET_SAMPLING_FREQUENCY
+        window_sound = AudioBuffer(window) if window.dtype == np.dtype(np.int16) else window
+        found_words = [(it[0] + window_offset, it[1] + window_offset)
+                       for it in find_word_bounds(window_sound, segmenter)]
+        new_words = []
+        last_word = word_bounds[-1] if len(word_bounds) > 0 else None
+        for word_start, word_end in found_words:
+            if last_word is not None:
+                if word_end <= last_word[1]:
+                    continue
+                overlap = last_word[1] - max(word_start, last_word[0])
+                if overlap > 0.5 * min(word_end - word_start, last_word[1] - last_word[0]):
+                    continue
+                word_start = max(word_start, last_word[1])
+            last_word = (word_start, word_end)
+            new_words.append(last_word)
+        return new_words
+
+    for block_start, block in blocks:
+        if block_start != buffer_start + buffer_length:
+            err_msg = f'The sound blocks are not consecutive! Expected a block from the sample ' \
+                      f'{buffer_start + buffer_length}, got a block from the sample {block_start}.'
+            asr_logger.error(err_msg)
+            raise ValueError(err_msg)
+        buffered_blocks.append(block)
+        buffer_length += block.shape[0]
+        del block
+        while buffer_length >= window_size:
+            buffered_sound = np.concatenate(buffered_blocks) if len(buffered_blocks) > 1 else buffered_blocks[0]
+            new_words = find_words_in_window(buffered_sound[0:window_size], buffer_start)
+            n_windows += 1
+            cut_time = (buffer_start + window_size - overlap_size / 2.0) / TARGET_SAMPLING_FREQUENCY
+            word_bounds += [it for it in new_words if it[0] < cut_time]
+            pending_words = [it for it in new_words if it[0] >= cut_time]
+            step = window_size - overlap_size
+            buffered_blocks = [buffered_sound[step:].copy()]
+            buffer_start += step
+            buffer_length -= step
+            del buffered_sound, new_words
+
+    if ((n_windows == 0) or (buffer_length > overlap_size)) and (buffer_length > MIN_SOUND_LENGTH):
+        buffered_sound = np.concatenate(buffered_blocks) if len(buffered_blocks) > 1 else buffered_blocks[0]
+        word_bounds += find_words_in_window(buffered_sound, buffer_start)
+        n_windows += 1
+    else:
+        word_bounds += pending_words
+    asr_logger.info(f'The segmenter has processed {n_windows} windows of the sound with a duration of '
+                    f'{round((buffer_start + buffer_length) / TARGET_SAMPLING_FREQUENCY, 3)} seconds.')
+    return word_bounds, buffer_start + buffer_length
 
 
-def is_speech(sound: np.ndarray, classifier: Pipeline) -> bool:
+def segment_sound_streaming(
+    source: Union[str, BinaryIO],
+    segmenter: Pipeline,
+    min_segment_size: float,
+    max_segment_size: float,
+    indent_for_silence: float = 0.5,
+    window_duration: float = STREAMING_WINDOW_DURATION,
+    overlap_duration: float = STREAMING_WINDOW_OVERLAP,
+    block_duration: float = STREAMING_BLOCK_DURATION,
+    max_prefetched: int = PREFETCHED_BLOCKS
+) -> SegmentTable:
+    """
+    Segments a sound file of any length as `segment_sound` does, but without loading the whole sound.
+
+    The sound is decoded block by block (see `wav_io.iter_sound_blocks`) in a background thread
+    (see `wav_io.prefetch_sound_blocks`), so the decoding of next blocks overlaps with the segmentation,
+    and `segmenter` is applied to overlapping windows of the sound (see `find_word_bounds_streaming`).
+    The peak memory usage depends on `window_duration`, `block_duration` and `max_prefetched`,
+    but not on the sound duration.
+
+    Arguments:
+    - source: a file name or a binary file object of any format supported by `wav_io.iter_sound_blocks`.
+    - segmenter, min_segment_size, max_segment_size, indent_for_silence: see `segment_sound` for details.
+    - window_duration, overlap_duration: see `find_word_bounds_streaming` for details.
+    - block_duration: a duration (in seconds) of decoded blocks.
+    - max_prefetched: a maximal number of decoded blocks waiting for the segmentation.
+
+    Output: a `SegmentTable` with (start_time, end_time) of all found utterances, can be empty.
+    """
+    blocks = prefetch_sound_blocks(iter_sound_blocks(source, block_duration, dtype=np.int16), max_prefetched)
+    try:
+        word_bounds, sound_length = find_word_bounds_streaming(blocks, segmenter, window_duration, overlap_duration)
+    finally:
+        blocks.close()
+    sound_duration = sound_length / TARGET_SAMPLING_FREQUENCY
+    return join_words_into_segments(word_bounds, min_segment_size, max_segment_size,
+                                    lambda it: it.pad(indent_for_silence).clip(sound_duration))
+
+
+def is_speech(sound: Union[np.ndarray, AudioBuffer], classifier: Pipeline) -> bool:
     """
     Checks if top class, according to the classifier, contains a word "speech".
 
     Arguments:
-    - sound: 1D waveform with rate 16_000 (equals wav_io.TARGET_SAMPLING_FREQUENCY)
+    - sound: 1D waveform with rate 16_000 (equals wav_io.TARGET_SAMPLING_FREQUENCY), or an AudioBuffer
     - classifier: an AudioClassificationPipeline that can classify audios. See
       `initialize_model_for_speech_classification` for details.
     """
-    output = classifier(sound)
+    return classify_speech(sound, classifier)[0]
+
+
+def classify_speech(sound: Union[np.ndarray, AudioBuffer], classifier: Pipeline) -> Tuple[bool, float]:
+    """
+    Returns the same decision as `is_speech` and the score of the top class (NaN if there are no classes).
+    """
+    output = classifier(as_waveform(sound))
     if len(output) > 0:
         class_label = output[0]['label']
         contains_speech = ('speech' in set(wordpunct_tokenize(class_label.lower())))
+        class_score = float(output[0].get('score', float('nan')))
     else:
         contains_speech = False
-    return contains_speech
+        class_score = float('nan')
+    return contains_speech, class_score
+
+
+class RepetitionLoopStoppingCriteria(StoppingCriteria):
+    """
+    Stops the generation of a hypothesis as soon as it ends with `min_repetitions` or more copies of the same
+    token sequence of 1 to `max_period` tokens, because the decoder has fallen into a loop (the hallucination,
+    which is typical for Whisper). The loop, which is already generated, is removed from the transcription
+    by `remove_oscillatory_hallucinations` and `remove_repeated_phrases` later.
+
+    A speaker can repeat a short word or phrase several times (e.g. "нет, нет, нет, нет, нет, я не согласен"),
+    and the text after such a repetition would be lost, so the loop has to be at least `min_loop_length` tokens
+    long, i.e. a sequence of few tokens has to be repeated much more than `min_repetitions` times.
+    """
+    def __init__(self, min_repetitions: int = GENERATION_LOOP_MIN_REPETITIONS,
+                 max_period: int = GENERATION_LOOP_MAX_PERIOD,
+                 min_loop_length: int = GENERATION_LOOP_MIN_LENGTH):
+        if min_repetitions < 2:
+            err_msg = f'The minimal repetition number is wrong! Expected 2 or greater, got {min_repetitions}.'
+            asr_logger.error(err_msg)
+            raise ValueError(err_msg)
+        if max_period < 1:
+            err_msg = f'The maximal period is wrong! Expected a positive value, got {max_period}.'
+            asr_logger.error(err_msg)
+            raise ValueError(err_msg)
+        if min_loop_length < 1:
+            err_msg = f'The minimal loop length is wrong! Expected a positive value, got {min_loop_length}.'
+            asr_logger.error(err_msg)
+            raise ValueError(err_msg)
+        self.min_repetitions = min_repetitions
+        self.max_period = max_period
+        self.min_loop_length = min_loop_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: Optional[torch.FloatTensor] = None,
+                 **kwargs) -> torch.BoolTensor:
+        is_looped = torch.zeros((input_ids.shape[0],), dtype=torch.bool, device=input_ids.device)
+        for period in range(1, self.max_period + 1):
+            loop_length = max(period * self.min_repetitions, self.min_loop_length)
+            if loop_length > input_ids.shape[1]:
+                break
+            tail = input_ids[:, -loop_length:]
+            is_looped |= torch.all(tail[:, period:] == tail[:, :-period], dim=1)
+        return is_looped
+
+
+def calculate_max_new_tokens(duration: float, max_chars_per_second: float = MAX_CHARS_PER_SECOND) -> int:
+    """
+    Returns a budget of Whisper decoder steps for a sound of the specified duration (in seconds): a token
+    takes at least one character, so a transcription of a real speech cannot be longer than
+    `max_chars_per_second` tokens per second (a sound, which is longer than the Whisper window,
+    is recognized window by window).
+    """
+    max_new_tokens = math.ceil(min(duration, WHISPER_WINDOW_DURATION) * max_chars_per_second)
+    return min(max_new_tokens + GENERATION_TOKEN_MARGIN, WHISPER_MAX_NEW_TOKENS)
 
 
-def recognize_sounds(sounds: List[np.ndarray], recognizer: Pipeline) -> List[str]:
+def recognize_sounds(sounds: List[Union[np.ndarray, AudioBuffer]], recognizer: Pipeline,
+                     max_chars_per_second: Optional[float] = MAX_CHARS_PER_SECOND,
+                     stop_loops: bool = True) -> List[str]:
     """
     Arguments:
     - mono_sound: a list of 1D waveforms with rate 16_000 (equals wav_io.TARGET_SAMPLING_FREQUENCY)
+      or AudioBuffers (each of them is converted to float32 just before its recognition)
     - recognizer: an AutomaticSpeechRecognitionPipeline that can return transcriptions. See
       `initialize_model_for_speech_recognition` for details.
+    - max_chars_per_second: if it is specified, then the number of generated tokens for each sound is limited
+      according to its duration (see `calculate_max_new_tokens`), so a hallucinating decoder cannot spend
+      hundreds of steps on a short sound.
+    - stop_loops: if it is True, then the generation is stopped as soon as the decoder falls into a loop
+      (see `RepetitionLoopStoppingCriteria`).
+
+    The generation limits are applied only if `recognizer` is a generative model (such as Whisper).
 
     Sequentially applies `recognizer` to each sound, gathers a list of the resulting transcriptions
-    (a "text" field in `recognizer` output). Further, calls `remove_oscillatory_hallucinations` for
-    each transcription, and returns the list.
+    (a "text" field in `recognizer` output). Further, calls `remove_oscillatory_hallucinations` and
+    `remove_repeated_phrases` for each transcription, and returns the list.
     """
     for idx, val in enumerate(sounds):
-        if not isinstance(val, np.ndarray):
+        if not isinstance(val, (np.ndarray, AudioBuffer)):
             err_msg = f'The sound {idx} is wrong! Expected {type(np.array([1, 2]))}, got {type(val)}.'
             asr_logger.error(err_msg)
             raise ValueError(err_msg)
@@ -567,21 +1101,39 @@ def recognize_sounds(sounds: List[np.ndarray], recognizer: Pipeline) -> List[str
             asr_logger.error(err_msg)
             raise ValueError(err_msg)
 
+    is_generative = (getattr(recognizer, 'model', None) is not None) and recognizer.model.can_generate()
+    stopping_criteria = StoppingCriteriaList([RepetitionLoopStoppingCriteria()]) if stop_loops else None
     all_transcriptions = []
     for cur_sound in tqdm(sounds):
-        all_transcriptions.append(recognizer(cur_sound)['text'])
+        generate_kwargs = dict()
+        if is_generative and (stopping_criteria is not None):
+            generate_kwargs['stopping_criteria'] = stopping_criteria
+        if is_generative and (max_chars_per_second is not None):
+            generate_kwargs['max_new_tokens'] = calculate_max_new_tokens(
+                cur_sound.shape[0] / TARGET_SAMPLING_FREQUENCY,
+                max_chars_per_second
+            )
+        if len(generate_kwargs) > 0:
+            output = recognizer(as_waveform(cur_sound), generate_kwargs=generate_kwargs)
+        else:
+            output = recognizer(as_waveform(cur_sound))
+        all_transcriptions.append(output['text'])
+        del output
         gc.collect()
         torch.cuda.empty_cache()
-    return [remove_oscillatory_hallucinations(it) for it in all_transcriptions]
+    return [remove_repeated_phrases(remove_oscillatory_hallucinations(it)) for it in all_transcriptions]
 
 
 def transcribe(
-    mono_sound: np.ndarray,
+    mono_sound: Union[np.ndarray, AudioBuffer],
     segmenter: Pipeline,
     voice_activity_detector: Pipeline,
     asr: Pipeline,
     min_segment_size: float,
-    max_segment_size: float
+    max_segment_size: float,
+    min_silence: Optional[float] = None,
+    max_pause: Optional[float] = None,
+    speech_guard: Optional[float] = None
 ) -> List[Tuple[float, float, str]]:
     """
     Transcribes a (possibly long) audio as follows:
@@ -590,13 +1142,15 @@ def transcribe(
     2) Adds padding around each segment
     3) Merges short segments into longer ones
     4) Applies `voice_activity_detector` to filter out non-speech segments
-    5) Applies `asr` to obtain final transcriptions for each segment
-    6) Removes oscillatory hallucinations from the final transcriptions
-    7) Returns only the segments with non-empty resulting transcriptions
+    5) Shortens internal pauses of each segment to `max_pause`, if it is specified
+    6) Applies `asr` to obtain final transcriptions for each segment
+    7) Removes oscillatory hallucinations from the final transcriptions
+    8) Returns only the segments with non-empty resulting transcriptions
 
     Arguments:
     - mono_sound: 1D waveform with rate 16_000 (equals wav_io.TARGET_SAMPLING_FREQUENCY),
-      no shorter than asr.MIN_SOUND_LENGTH.
+      no shorter than asr.MIN_SOUND_LENGTH. An AudioBuffer keeps the sound as 16-bit PCM, and
+      only the segment which is being classified or recognized is converted to float32.
     - segmenter: an AutomaticSpeechRecognitionPipeline that can process long audios and
       returns word timestamps. See `initialize_model_for_speech_segmentation` for details.
     - voice_activity_detector: an AudioClassificationPipeline that can classify audios. See
@@ -605,6 +1159,14 @@ def transcribe(
       `initialize_model_for_speech_recognition` for details.
     - min_segment_size: a parameter for segment processing, see `segment_sound` for details.
     - max_segment_size: a parameter for segment processing, see `segment_sound` for details.
+    - min_silence: a minimal duration (in seconds) of silences, which are skipped by `segmenter`,
+      see `segment_sound` for details. The silence skipping is disabled by default.
+    - max_pause: a maximal duration (in seconds) of pauses inside segments, which are passed to `asr`.
+      Longer pauses are found by the WebRTC VAD ensemble and shortened (see `vad.compress_pauses`), so
+      `asr` processes less silence. The segment timestamps are not affected, because they are found before
+      the compression. The pause compression is disabled by default.
+    - speech_guard: a guard margin (in seconds) around the speech bounds, which are found by the WebRTC VAD
+      ensemble, to pad segments up to them instead of the fixed padding (see `segment_sound` for details).
 
     Output: a list of tuples (start_time, end_time, transcription) for all found utterances,
     can be empty.
@@ -629,51 +1191,54 @@ def transcribe(
     max batch size to fit into GPU memory, or this help:
     https://discuss.pytorch.org/t/is-it-possible-to-execute-two-modules-in-parallel-in-pytorch/54866
     """
-    sound_segments = segment_sound(mono_sound, segmenter, min_segment_size, max_segment_size)
+    sound_segments = segment_sound(mono_sound, segmenter, min_segment_size, max_segment_size,
+                                   min_silence=min_silence, speech_guard=speech_guard)
     asr_logger.info(f'The speech sound is divided into {len(sound_segments)} segments.')
     if len(sound_segments) == 0:
         return []
-    sound_segments_ = []
-    for it in sound_segments:
-        segment_start = min(round(it[0] * TARGET_SAMPLING_FREQUENCY), mono_sound.shape[0])
-        segment_end = min(round(it[1] * TARGET_SAMPLING_FREQUENCY), mono_sound.shape[0])
-        if segment_start >= segment_end:
-            err_msg = f'Segments {sound_segments} are wrong!'
-            asr_logger.error(err_msg)
-            raise RuntimeError(err_msg)
-        sound_segments_.append((segment_start, segment_end))
-    segment_lengths = sorted([(it[1] - it[0]) for it in sound_segments])
-    mean_length = float(np.mean(segment_lengths))
-    min_segment_idx = -1
-    min_segment_length = None
-    for idx, val in enumerate(sound_segments):
-        cur_segment_length = val[1] - val[0]
-        if min_segment_length is None:
-            min_segment_idx = idx
-            min_segment_length = cur_segment_length
-        elif cur_segment_length < min_segment_length:
-            min_segment_idx = idx
-            min_segment_length = cur_segment_length
+    sample_bounds = sound_segments.to_samples(mono_sound.shape[0])
+    if np.any(sample_bounds[:, 0] >= sample_bounds[:, 1]):
+        err_msg = f'Segments {sound_segments.to_list()} are wrong!'
+        asr_logger.error(err_msg)
+        raise RuntimeError(err_msg)
+    segment_statistics = sound_segments.describe()
+    min_segment_idx = segment_statistics['min_segment_idx']
     minimal_segment_description = ('[' + time_to_str(sound_segments[min_segment_idx][0]) + ' - ' +
                                    time_to_str(sound_segments[min_segment_idx][1]) + ']')
-    info_msg = (f'Minimal segment duration is {segment_lengths[0]} seconds. '
+    info_msg = (f'Minimal segment duration is {segment_statistics["min"]} seconds. '
                 f'This segment is {minimal_segment_description}.')
     asr_logger.info(info_msg)
-    asr_logger.info(f'Maximal segment duration is {segment_lengths[-1]} seconds.')
-    asr_logger.info(f'Median segment duration is {segment_lengths[len(segment_lengths) // 2]} seconds.')
-    asr_logger.info(f'Mean segment duration is {mean_length} seconds.')
-    del segment_lengths
-    segments_with_speech = []
+    asr_logger.info(f'Maximal segment duration is {segment_statistics["max"]} seconds.')
+    asr_logger.info(f'Median segment duration is {segment_statistics["median"]} seconds.')
+    asr_logger.info(f'Mean segment duration is {segment_statistics["mean"]} seconds.')
     sounds_with_speech = []
-    for idx in range(len(sound_segments)):
-        bounds = sound_segments_[idx]
-        if is_speech(sound=mono_sound[bounds[0]:bounds[1]], classifier=voice_activity_detector):
-            sounds_with_speech.append(mono_sound[bounds[0]:bounds[1]])
-            segments_with_speech.append(sound_segments[idx])
+    for idx, (segment_start, segment_end) in enumerate(sample_bounds.tolist()):
+        if isinstance(mono_sound, AudioBuffer):
+            cur_sound = mono_sound.view(segment_start, segment_end)
+        else:
+            cur_sound = mono_sound[segment_start:segment_end]
+        contains_speech, class_score = classify_speech(sound=cur_sound, classifier=voice_activity_detector)
+        sound_segments.scores[idx] = class_score
+        if contains_speech:
+            sound_segments.flags[idx] |= SEGMENT_FLAG_SPEECH
+            sounds_with_speech.append(cur_sound)
+    segments_with_speech = sound_segments.select((sound_segments.flags & SEGMENT_FLAG_SPEECH) != 0)
     asr_logger.info(f'{len(sounds_with_speech)} of {len(sound_segments)} segments contain a human speech.')
-    del sound_segments_, sound_segments
+    del sample_bounds, sound_segments
     if len(sounds_with_speech) == 0:
         return []
+    if max_pause is not None:
+        if max_pause <= 0.0:
+            err_msg = f'The maximal pause duration is wrong! Expected a positive value, got {max_pause}.'
+            asr_logger.error(err_msg)
+            raise ValueError(err_msg)
+        total_length = sum([it.shape[0] for it in sounds_with_speech])
+        max_pause_length = round(max_pause * TARGET_SAMPLING_FREQUENCY)
+        sounds_with_speech = [compress_pauses(it, max_pause_length)[0] for it in sounds_with_speech]
+        compressed_length = sum([it.shape[0] for it in sounds_with_speech])
+        asr_logger.info(f'Long pauses are removed from the speech segments, so their total duration is reduced '
+                        f'from {round(total_length / TARGET_SAMPLING_FREQUENCY, 3)} to '
+                        f'{round(compressed_length / TARGET_SAMPLING_FREQUENCY, 3)} seconds.')
     recognized_transcriptions = recognize_sounds(
         sounds=sounds_with_speech,
         recognizer=asr
@@ -687,3 +1252,312 @@ def transcribe(
         )
     ))
     return results
+
+
+def calculate_frame_levels(sound: Union[np.ndarray, AudioBuffer], frame_size: int,
+                           block_size: int = 1 << 20) -> np.ndarray:
+    """
+    Calculates the RMS level (in dBFS) of each non-overlapping frame of the sound. The last frame may be shorter.
+    The sound is converted to float32 block by block, so no full-length temporary arrays are allocated.
+    """
+    n_samples = sound.shape[0]
+    n_frames = (n_samples + frame_size - 1) // frame_size
+    levels = np.empty((n_frames,), dtype=np.float32)
+    block_size = max(1, block_size // frame_size) * frame_size
+    for block_start in range(0, n_samples, block_size):
+        block_end = min(n_samples, block_start + block_size)
+        block = as_waveform(sound[block_start:block_end])
+        n_block_frames = (block.shape[0] + frame_size - 1) // frame_size
+        if block.shape[0] < n_block_frames * frame_size:
+            block = np.concatenate((block, np.zeros((n_block_frames * frame_size - block.shape[0],), dtype=np.float32)))
+        block = block.reshape((n_block_frames, frame_size))
+        energy = np.mean(np.square(block, dtype=np.float32), axis=1)
+        energy[-1] *= frame_size / float((block_end - block_start) - (n_block_frames - 1) * frame_size)
+        frame_start = block_start // frame_size
+        levels[frame_start:(frame_start + n_block_frames)] = 10.0 * np.log10(energy + 1e-12)
+        del block, energy
+    return levels
+
+
+def find_channel_activity(levels: np.ndarray, silence_level: float = CHANNEL_SILENCE_LEVEL,
+                          crosstalk_margin: float = CROSSTALK_MARGIN, hangover: int = 0) -> np.ndarray:
+    """
+    Finds the frames where each channel contains its own sound rather than silence or crosstalk.
+
+    Arguments:
+    - levels: a 2-D array of frame levels (in dBFS) of shape (n_channels, n_frames).
+    - silence_level: frames which are quieter than this level are silent.
+    - crosstalk_margin: frames which are quieter than the loudest channel by more than this margin (in dB)
+      are crosstalk from the other channels.
+    - hangover: a number of frames around each active frame which are also considered as active,
+      so word beginnings and endings are not cut.
+
+    Returns a boolean array of shape (n_channels, n_frames).
+    """
+    loudest_level = np.max(levels, axis=0)
+    activity = (levels > silence_level) & (levels >= (loudest_level - crosstalk_margin))
+    if hangover > 0:
+        n_frames = activity.shape[1]
+        cumulative_activity = np.zeros((activity.shape[0], n_frames + 1), dtype=np.int64)
+        np.cumsum(activity, axis=1, out=cumulative_activity[:, 1:])
+        window_starts = np.maximum(np.arange(n_frames) - hangover, 0)
+        window_ends = np.minimum(np.arange(n_frames) + hangover + 1, n_frames)
+        activity = (cumulative_activity[:, window_ends] - cumulative_activity[:, window_starts]) > 0
+    return activity
+
+
+def transcribe_channels(
+    channels: Union[np.ndarray, Sequence[Union[np.ndarray, AudioBuffer]]],
+    segmenter: Pipeline,
+    voice_activity_detector: Pipeline,
+    asr: Pipeline,
+    min_segment_size: float,
+    max_segment_size: float,
+    speakers: Optional[List[str]] = None,
+    silence_level: float = CHANNEL_SILENCE_LEVEL,
+    crosstalk_margin: float = CROSSTALK_MARGIN,
+    min_silence: Optional[float] = None,
+    max_pause: Optional[float] = None,
+    speech_guard: Optional[float] = None
+) -> List[Tuple[float, float, str, str]]:
+    """
+    Transcribes each channel of a multichannel recording independently, when every speaker
+    (e.g. an interviewer and a candidate) is recorded into a separate channel.
+
+    Silent stretches of each channel and the crosstalk from the other channels are found by frame levels
+    and replaced with silence, so the segmenter and the ASR process only the own speech of each channel.
+    A channel without any own speech is not transcribed at all. The results of all channels are interleaved
+    by their timestamps.
+
+    Arguments:
+    - channels: a tuple of channel waveforms (float32 or PCM, as `load_sound` returns for stereo, or AudioBuffers),
+      or a 2-D array of shape (n_samples, n_channels), as `decode_audio` returns with `keep_channels=True`.
+    - segmenter, voice_activity_detector, asr, min_segment_size, max_segment_size, min_silence, max_pause,
+      speech_guard: see `transcribe` for details.
+    - speakers: speaker labels of the channels (SPEAKER_00, SPEAKER_01 and so on by default).
+    - silence_level, crosstalk_margin: see `find_channel_activity` for details.
+
+    Output: a list of tuples (start_time, end_time, transcription, speaker) sorted by time, can be empty.
+    """
+    if isinstance(channels, np.ndarray) and (len(channels.shape) == 2):
+        channels = [channels[:, channel_idx] for channel_idx in range(channels.shape[1])]
+    channels = [(it.pcm if isinstance(it, AudioBuffer) else it) for it in channels]
+    if len(channels) == 0:
+        err_msg = 'The channel list is empty!'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    if speakers is None:
+        speakers = [f'SPEAKER_{channel_idx:02d}' for channel_idx in range(len(channels))]
+    if len(speakers) != len(channels):
+        err_msg = f'The speaker number does not correspond to the channel number! ' \
+                  f'{len(speakers)} != {len(channels)}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    n_samples = min(it.shape[0] for it in channels)
+    frame_size = round(CHANNEL_ACTIVITY_FRAME * TARGET_SAMPLING_FREQUENCY)
+    levels = np.stack([calculate_frame_levels(it[0:n_samples], frame_size) for it in channels])
+    activity = find_channel_activity(levels, silence_level, crosstalk_margin,
+                                     hangover=round(CHANNEL_ACTIVITY_HANGOVER / CHANNEL_ACTIVITY_FRAME))
+    del levels
+
+    results = []
+    for channel_idx, (channel, speaker) in enumerate(zip(channels, speakers)):
+        n_active_frames = int(np.sum(activity[channel_idx]))
+        asr_logger.info(f'The channel {channel_idx} ({speaker}) is active in {n_active_frames} '
+                        f'of {activity.shape[1]} frames.')
+        if n_active_frames == 0:
+            continue
+        masked_sound = np.array(downmix_to_mono(channel[0:n_samples], dtype=np.int16))
+        masked_sound[np.repeat(~activity[channel_idx], frame_size)[0:n_samples]] = 0
+        if masked_sound.shape[0] < MIN_SOUND_LENGTH:
+            continue
+        channel_results = transcribe(AudioBuffer(masked_sound), segmenter, voice_activity_detector, asr,
+                                     min_segment_size, max_segment_size, min_silence=min_silence,
+                                     max_pause=max_pause, speech_guard=speech_guard)
+        del masked_sound
+        results += [(start_time, end_time, text, speaker) for start_time, end_time, text in channel_results]
+        del channel_results
+    results.sort(key=lambda it: (it[0], it[1]))
+    return results
+
+
+_shard_worker_models: Dict[str, Union[Pipeline, VADSegmenter]] = dict()
+
+
+def find_shard_bounds(mono_sound: Union[np.ndarray, AudioBuffer], max_shard_size: float = SHARD_MAX_DURATION,
+                      n_processes: int = 1) -> np.ndarray:
+    """
+    Splits a long sound into shards no longer than `max_shard_size` seconds (approximately) at the points
+    with the lowest speech probability (see `vad.split_long_sound_bounds`).
+
+    Unlike the sub-sounds of `vad.split_long_sound_bounds`, the shards do not overlap: each cut point is the middle
+    of the quietest window, and the shards cover the whole sound, so every sample belongs to exactly one shard.
+    Shards, which are too short to be transcribed, are joined with their neighbours.
+
+    Returns an int64 array of (start, end) sample bounds of shape (n_shards, 2).
+    """
+    if max_shard_size <= 0.0:
+        err_msg = f'The maximal shard duration is wrong! Expected a positive value, got {max_shard_size}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    bounds_of_subsounds = split_long_sound_bounds(mono_sound, None, round(max_shard_size * TARGET_SAMPLING_FREQUENCY),
+                                                  n_processes=n_processes)
+    cut_points = (bounds_of_subsounds[:-1, 1] + bounds_of_subsounds[1:, 0]) // 2
+    bounds_of_shards = np.empty(bounds_of_subsounds.shape, dtype=np.int64)
+    bounds_of_shards[0, 0] = 0
+    bounds_of_shards[1:, 0] = cut_points
+    bounds_of_shards[:-1, 1] = cut_points
+    bounds_of_shards[-1, 1] = mono_sound.shape[0]
+    return stick_short_bounds_to_longer_neighbours(bounds_of_shards)
+
+
+def select_shard_devices(n_processes: int) -> List[str]:
+    """
+    Returns devices of the worker processes of `transcribe_sharded`, so that no device keeps more than one copy
+    of the models: distinct CUDA devices if there are GPUs (so the process number is limited by their number),
+    or the CPU otherwise (the CPU memory should be enough for `n_processes` copies of the models).
+    """
+    if n_processes < 1:
+        err_msg = f'The process number is wrong! Expected a positive value, got {n_processes}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    if torch.cuda.is_available():
+        n_devices = torch.cuda.device_count()
+        if n_processes > n_devices:
+            asr_logger.warning(f'The process number {n_processes} is reduced to the number of CUDA devices '
+                               f'{n_devices}, because each process loads its own models.')
+        return [f'cuda:{device_idx}' for device_idx in range(min(n_processes, n_devices))]
+    return ['cpu' for _ in range(n_processes)]
+
+
+def merge_shard_results(
+    shard_results: List[Tuple[int, List[Tuple[float, float, str]]]]
+) -> List[Tuple[float, float, str]]:
+    """
+    Merges the transcriptions of shards, which are given as pairs of the shard start (in samples) and the list
+    of tuples (start_time, end_time, transcription) from the shard start, in any order. The timestamps are shifted
+    by the shard starts, and the results are sorted by time.
+    """
+    results = []
+    for shard_start, cur_results in shard_results:
+        shard_offset = shard_start / TARGET_SAMPLING_FREQUENCY
+        results += [(start_time + shard_offset, end_time + shard_offset, text)
+                    for start_time, end_time, text in cur_results]
+    results.sort(key=lambda it: (it[0], it[1]))
+    return results
+
+
+def _initialize_shard_worker(devices: multiprocessing.Queue, language: str, segmenter_type: str,
+                             wav2vec2_path: Optional[str], audiotransformer_path: Optional[str],
+                             whisper_path: Optional[str]) -> None:
+    device = devices.get()  # each worker takes its own device
+    _shard_worker_models['segmenter'] = initialize_segmenter(segmenter_type, language, model_info=wav2vec2_path,
+                                                             device=device)
+    _shard_worker_models['vad'] = initialize_model_for_speech_classification(model_info=audiotransformer_path,
+                                                                             device=device)
+    _shard_worker_models['asr'] = initialize_model_for_speech_recognition(language, model_info=whisper_path,
+                                                                          device=device)
+
+
+def _transcribe_shard(shard: np.ndarray, min_segment_size: float, max_segment_size: float,
+                      min_silence: Optional[float], max_pause: Optional[float],
+                      speech_guard: Optional[float]) -> List[Tuple[float, float, str]]:
+    if shard.shape[0] <= MIN_SOUND_LENGTH:
+        return []
+    return transcribe(AudioBuffer(shard) if shard.dtype in {np.dtype(np.int16), np.dtype(np.uint8)} else shard,
+                      _shard_worker_models['segmenter'], _shard_worker_models['vad'], _shard_worker_models['asr'],
+                      min_segment_size, max_segment_size, min_silence=min_silence, max_pause=max_pause,
+                      speech_guard=speech_guard)
+
+
+def transcribe_sharded(
+    mono_sound: Union[np.ndarray, AudioBuffer],
+    min_segment_size: float,
+    max_segment_size: float,
+    n_processes: int,
+    language: str = 'ru',
+    segmenter_type: str = 'wav2vec2',
+    wav2vec2_path: Optional[str] = None,
+    audiotransformer_path: Optional[str] = None,
+    whisper_path: Optional[str] = None,
+    min_silence: Optional[float] = None,
+    max_pause: Optional[float] = None,
+    speech_guard: Optional[float] = None,
+    max_shard_size: float = SHARD_MAX_DURATION,
+    devices: Optional[Sequence[str]] = None
+) -> List[Tuple[float, float, str]]:
+    """
+    Transcribes a long sound by a pool of worker processes, which run the full `transcribe` pipeline
+    on silence-aligned shards of the sound (see `find_shard_bounds`) independently.
+
+    Each worker loads its own segmenter, voice activity detector and ASR (with the same arguments as the CLI tools),
+    so the memory of the models is multiplied by the worker number (several GB per worker for the default
+    Whisper-large). Therefore, each worker is pinned to its own device (see `select_shard_devices`). The shards do not overlap, and the segments of each
+    shard do not go beyond it, so no utterance is lost or duplicated at shard edges. The timestamps are shifted
+    by the shard starts and the results are merged in the time order.
+
+    Arguments:
+    - mono_sound: 1D waveform with rate 16_000 or an AudioBuffer.
+    - min_segment_size, max_segment_size, min_silence, max_pause, speech_guard: see `transcribe` for details.
+    - n_processes: a number of worker processes. On a host with GPUs, it is limited by the number of CUDA devices.
+    - language, segmenter_type, wav2vec2_path, audiotransformer_path, whisper_path: the language, the segmenter type
+      (see `initialize_segmenter`) and the model paths (None means the default models).
+    - max_shard_size: the maximal shard duration (in seconds).
+    - devices: the devices of the worker processes (one per process), which are selected by `select_shard_devices`
+      if they are not specified. The same device can be repeated, if it has enough memory for several model copies.
+
+    Output: a list of tuples (start_time, end_time, transcription) as `transcribe` returns.
+    """
+    if devices is None:
+        devices = select_shard_devices(n_processes)
+    elif len(devices) != n_processes:
+        err_msg = f'The device number does not correspond to the process number! {len(devices)} != {n_processes}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    n_processes = len(devices)
+    if n_processes < 1:
+        err_msg = f'The process number is wrong! Expected a positive value, got {n_processes}.'
+        asr_logger.error(err_msg)
+        raise ValueError(err_msg)
+    bounds_of_shards = find_shard_bounds(mono_sound, max_shard_size, n_processes)
+    asr_logger.info(f'The sound is divided into {bounds_of_shards.shape[0]} shards, '
+                    f'which are transcribed by {n_processes} processes on {", ".join(sorted(set(devices)))}.')
+    pcm = mono_sound.pcm if isinstance(mono_sound, AudioBuffer) else mono_sound
+    shard_iterator = iter(bounds_of_shards.tolist())
+    max_in_flight = 2 * n_processes
+    pending: deque = deque()
+    shard_starts: Dict[Future, int] = dict()
+    shard_results = []
+    # The spawn start method is used, because forking a process with loaded models and their threads is not safe.
+    mp_context = multiprocessing.get_context('spawn')
+    worker_devices = mp_context.Queue()
+    for cur_device in devices:
+        worker_devices.put(cur_device)
+    with ProcessPoolExecutor(max_workers=n_processes, mp_context=mp_context,
+                             initializer=_initialize_shard_worker,
+                             initargs=(worker_devices, language, segmenter_type, wav2vec2_path, audiotransformer_path,
+                                       whisper_path)) as pool:
+        try:
+            while True:
+                while len(shard_starts) < max_in_flight:
+                    shard_bounds = next(shard_iterator, None)
+                    if shard_bounds is None:
+                        break
+                    new_future = pool.submit(_transcribe_shard, pcm[shard_bounds[0]:shard_bounds[1]],
+                                             min_segment_size, max_segment_size, min_silence, max_pause,
+                                             speech_guard)
+                    shard_starts[new_future] = shard_bounds[0]
+                    pending.append(new_future)
+                if len(shard_starts) == 0:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for done_future in done:
+                    pending.remove(done_future)
+                    shard_start = shard_starts.pop(done_future)
+                    shard_results.append((shard_start, done_future.result()))
+                    asr_logger.info(f'The shard starting at {time_to_str(shard_start / TARGET_SAMPLING_FREQUENCY)} '
+                                    f'is transcribed.')
+        finally:
+            for cur_future in pending:
+                cur_future.cancel()
+    return merge_shard_results(shard_results)
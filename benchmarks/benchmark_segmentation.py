@@ -0,0 +1,116 @@
+"""
+Benchmark of the word grouping and the segment joining of `asr`.
+
+Synthetic word bounds (random word durations and pauses between words) of the specified sizes are generated,
+so neither models nor test data are needed. For every size, the benchmark reports the median times of
+`select_word_groups` and of `join_short_segments_to_long_ones` (applied to the word bounds) and the numbers
+of their resulting groups and segments.
+
+Example:
+```
+python benchmarks/benchmark_segmentation.py --sizes 1000,100000 --output results/benchmark_segmentation.json
+```
+"""
+
+from argparse import ArgumentParser
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+try:
+    from asr.asr import select_word_groups, join_short_segments_to_long_ones
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    from asr.asr import select_word_groups, join_short_segments_to_long_ones
+
+
+DEFAULT_SIZES = '1000,10000,100000'
+DEFAULT_SEGMENT_SIZE = 20.0  # seconds, as the default maximal segment size of the speech recognition
+DEFAULT_MIN_SEGMENT_SIZE = 1.0  # seconds, as the default minimal segment size of the speech recognition
+
+
+def generate_words(n_words: int, random_seed: int) -> List[Tuple[float, float]]:
+    generator = np.random.default_rng(random_seed)
+    word_durations = generator.uniform(0.1, 0.8, size=(n_words,))
+    # Most pauses between words are short, but some of them are long, as in a real conversation
+    pauses = generator.exponential(0.15, size=(n_words,))
+    pauses[generator.uniform(size=(n_words,)) < 0.05] += generator.uniform(0.5, 3.0)
+    starts = np.cumsum(pauses + word_durations) - word_durations
+    ends = starts + word_durations
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def measure(words: List[Tuple[float, float]], segment_size: float, min_segment_size: float,
+            repeats: int) -> Dict[str, float]:
+    grouping_times = []
+    joining_times = []
+    word_groups = []
+    segments = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        word_groups = select_word_groups(words, segment_size)
+        grouping_times.append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        segments = join_short_segments_to_long_ones(words, min_segment_size)
+        joining_times.append(time.perf_counter() - start_time)
+    return {
+        'grouping_time': float(np.median(grouping_times)),
+        'n_groups': len(word_groups),
+        'joining_time': float(np.median(joining_times)),
+        'n_segments': len(segments)
+    }
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark of the word grouping and the segment joining of asr.')
+    parser.add_argument('--sizes', dest='sizes', type=str, required=False, default=DEFAULT_SIZES,
+                        help='Comma-separated numbers of words.')
+    parser.add_argument('--segment_size', dest='segment_size', type=float, required=False,
+                        default=DEFAULT_SEGMENT_SIZE, help='The maximal duration of a word group (in seconds).')
+    parser.add_argument('--min_segment_size', dest='min_segment_size', type=float, required=False,
+                        default=DEFAULT_MIN_SEGMENT_SIZE, help='The minimal duration of a segment (in seconds).')
+    parser.add_argument('--repeats', dest='repeats', type=int, required=False, default=5,
+                        help='The number of runs for each size (the median time is reported).')
+    parser.add_argument('--seed', dest='random_seed', type=int, required=False, default=42,
+                        help='The random seed of generated words.')
+    parser.add_argument('--output', dest='output_name', type=str, required=False, default=None,
+                        help='The JSON file name for the results.')
+    args = parser.parse_args()
+
+    sizes = [int(it) for it in args.sizes.split(',') if len(it.strip()) > 0]
+    for it in sizes:
+        if it < 1:
+            raise ValueError(f'The number of words is wrong! Expected a positive value, got {it}.')
+    if args.repeats < 1:
+        raise ValueError(f'The number of runs is wrong! Expected a positive value, got {args.repeats}.')
+
+    results = []
+    for n_words in sizes:
+        words = generate_words(n_words, args.random_seed)
+        res = measure(words, args.segment_size, args.min_segment_size, args.repeats)
+        res['n_words'] = n_words
+        res['duration'] = words[-1][1]
+        results.append(res)
+        print(f'{n_words} words: grouping {res["grouping_time"]:.3f} s, joining {res["joining_time"]:.3f} s',
+              file=sys.stderr)
+
+    header = f'{"words":>9} {"duration, s":>12} {"groups":>9} {"grouping, s":>12} {"segments":>9} {"joining, s":>11}'
+    print(header)
+    print('-' * len(header))
+    for it in results:
+        print(f'{it["n_words"]:>9} {it["duration"]:>12.1f} {it["n_groups"]:>9} {it["grouping_time"]:>12.3f} '
+              f'{it["n_segments"]:>9} {it["joining_time"]:>11.3f}')
+    if args.output_name is not None:
+        output_dir = os.path.dirname(args.output_name)
+        if len(output_dir) > 0:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(args.output_name, mode='w', encoding='utf-8') as fp:
+            json.dump(results, fp, indent=4)
+
+
+if __name__ == '__main__':
+    main()
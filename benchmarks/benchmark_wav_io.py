@@ -0,0 +1,231 @@
+"""
+Benchmark of the audio loading paths of `wav_io`.
+
+Synthetic sounds of the specified durations are generated by FFmpeg (so no network and no test data are needed),
+and each loading path is run in a separate Python process, so that peak memory of one run does not hide another.
+For every run, the benchmark reports the decoding throughput (audio seconds per wall-clock second), the peak RSS
+of the Python process and of its child processes (FFmpeg), and the peak size of files written on disk
+(temporary files, the WAV written by `transform_to_wavpcm` and the entries of `AudioCache`).
+
+Example:
+```
+python benchmarks/benchmark_wav_io.py --durations 60,3600 --formats wav,mp3 --output results/benchmark_wav_io.json
+```
+"""
+
+from argparse import ArgumentParser, SUPPRESS
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+try:
+    from wav_io.wav_io import load_sound, decode_audio, transform_to_wavpcm, iter_sound_blocks
+    from wav_io.wav_io import downmix_to_mono, AudioBuffer, AudioCache, FFMPEG_EXECUTABLE
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    from wav_io.wav_io import load_sound, decode_audio, transform_to_wavpcm, iter_sound_blocks
+    from wav_io.wav_io import downmix_to_mono, AudioBuffer, AudioCache, FFMPEG_EXECUTABLE
+
+
+DEFAULT_DURATIONS = '60,3600,18000'  # 1 minute, 1 hour and 5 hours
+SOUND_FORMATS = {
+    'wav': ['-ar', '44100', '-ac', '2', '-c:a', 'pcm_s16le'],  # converted in-process by the resampler
+    'wav16k': ['-ar', '16000', '-ac', '1', '-c:a', 'pcm_s16le'],  # already in the target format
+    'mp3': ['-ar', '44100', '-ac', '2', '-c:a', 'libmp3lame', '-b:a', '128k'],
+    'm4a': ['-ar', '44100', '-ac', '2', '-c:a', 'aac', '-b:a', '128k'],
+}
+WAV_ONLY_PATHS = {'load_sound', 'load_sound_mmap'}
+LOADING_PATHS = ['load_sound', 'load_sound_mmap', 'decode_audio', 'transform_to_wavpcm', 'iter_sound_blocks',
+                 'audio_cache']
+DISK_POLLING_INTERVAL = 0.01  # seconds
+
+
+def generate_sound(fname: str, sound_format: str, duration: int) -> None:
+    # A chirp-like tone with a pink noise, so lossy encoders work as on a real speech rather than on a silence
+    cmd = [
+        FFMPEG_EXECUTABLE, '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'sine=frequency=220:beep_factor=4:sample_rate=44100:duration={duration}',
+        '-f', 'lavfi', '-i', f'anoisesrc=color=pink:amplitude=0.05:sample_rate=44100:duration={duration}',
+        '-filter_complex', 'amix=inputs=2:duration=shortest'
+    ] + SOUND_FORMATS[sound_format] + [fname]
+    subprocess.run(cmd, check=True)
+
+
+def directory_size(dirname: str) -> int:
+    total_size = 0
+    for root, _, files in os.walk(dirname):
+        for cur_file in files:
+            try:
+                total_size += os.path.getsize(os.path.join(root, cur_file))
+            except OSError:
+                pass
+    return total_size
+
+
+def run_loading_path(loading_path: str, fname: str, scratch_dir: str) -> None:
+    if loading_path == 'load_sound':
+        sound = load_sound(fname)
+        if isinstance(sound, tuple):
+            sound = downmix_to_mono(sound)
+    elif loading_path == 'load_sound_mmap':
+        sound = AudioBuffer(downmix_to_mono(load_sound(fname, use_mmap=True), dtype=np.int16))
+    elif loading_path == 'decode_audio':
+        sound = decode_audio(fname)
+    elif loading_path == 'transform_to_wavpcm':
+        transform_to_wavpcm(fname, os.path.join(scratch_dir, 'converted.wav'))
+        sound = None
+    elif loading_path == 'iter_sound_blocks':
+        sound = None
+        for _, block in iter_sound_blocks(fname, block_seconds=60.0):
+            del block
+    elif loading_path == 'audio_cache':
+        sound = AudioCache(os.path.join(scratch_dir, 'audio_cache')).load(fname)
+    else:
+        raise ValueError(f'The loading path "{loading_path}" is unknown!')
+    del sound
+
+
+def worker(loading_path: str, fname: str, scratch_dir: str) -> None:
+    start_time = time.perf_counter()
+    run_loading_path(loading_path, fname, scratch_dir)
+    elapsed_time = time.perf_counter() - start_time
+    # ru_maxrss is measured in kilobytes on Linux
+    print(json.dumps({
+        'elapsed_time': elapsed_time,
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'children_peak_rss': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    }))
+
+
+def measure(loading_path: str, fname: str, work_dir: str) -> Dict[str, float]:
+    scratch_dir = tempfile.mkdtemp(dir=work_dir, prefix='scratch_')
+    environment = dict(os.environ)
+    environment['TMPDIR'] = scratch_dir  # all temporary files of the run are counted
+    peak_disk_usage = [0]
+    is_finished = threading.Event()
+
+    def poll_disk_usage():
+        while not is_finished.is_set():
+            peak_disk_usage[0] = max(peak_disk_usage[0], directory_size(scratch_dir))
+            is_finished.wait(DISK_POLLING_INTERVAL)
+
+    polling_thread = threading.Thread(target=poll_disk_usage, daemon=True)
+    polling_thread.start()
+    try:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', loading_path, fname, scratch_dir],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=environment)
+    finally:
+        is_finished.set()
+        polling_thread.join()
+        peak_disk_usage[0] = max(peak_disk_usage[0], directory_size(scratch_dir))
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    if proc.returncode != 0:
+        err_msg = f'The loading path "{loading_path}" is failed for "{fname}": ' \
+                  f'{proc.stderr.decode("utf-8", errors="replace").strip()}'
+        raise RuntimeError(err_msg)
+    res = json.loads(proc.stdout.decode('utf-8').strip().split('\n')[-1])
+    res['temp_disk_bytes'] = peak_disk_usage[0]
+    return res
+
+
+def print_results(results: List[Dict[str, float]]) -> None:
+    header = f'{"format":<8} {"duration":>9} {"path":<20} {"xRT^-1":>9} {"RSS, MB":>9} ' \
+             f'{"FFmpeg RSS, MB":>15} {"temp disk, MB":>14}'
+    print(header)
+    print('-' * len(header))
+    for it in results:
+        print(f'{it["format"]:<8} {it["duration"]:>9} {it["path"]:<20} {it["throughput"]:>9.1f} '
+              f'{it["peak_rss"] / 1024.0 ** 2:>9.1f} {it["children_peak_rss"] / 1024.0 ** 2:>15.1f} '
+              f'{it["temp_disk_bytes"] / 1024.0 ** 2:>14.1f}')
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark of the audio loading paths of wav_io.')
+    parser.add_argument('--durations', dest='durations', type=str, required=False, default=DEFAULT_DURATIONS,
+                        help='Comma-separated durations (in seconds) of generated sounds.')
+    parser.add_argument('--formats', dest='formats', type=str, required=False, default=','.join(SOUND_FORMATS),
+                        help=f'Comma-separated formats of generated sounds ({", ".join(SOUND_FORMATS)}).')
+    parser.add_argument('--paths', dest='paths', type=str, required=False, default=','.join(LOADING_PATHS),
+                        help=f'Comma-separated loading paths ({", ".join(LOADING_PATHS)}).')
+    parser.add_argument('--repeats', dest='repeats', type=int, required=False, default=1,
+                        help='The number of runs of each loading path (the median time is reported).')
+    parser.add_argument('--work_dir', dest='work_dir', type=str, required=False, default=None,
+                        help='The directory for generated sounds (a temporary directory by default).')
+    parser.add_argument('--output', dest='output_name', type=str, required=False, default=None,
+                        help='The JSON file name for the results.')
+    parser.add_argument('--worker', dest='worker', nargs=3, required=False, default=None,
+                        help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        worker(*args.worker)
+        return
+
+    durations = [int(it) for it in args.durations.split(',') if len(it.strip()) > 0]
+    sound_formats = [it.strip() for it in args.formats.split(',') if len(it.strip()) > 0]
+    loading_paths = [it.strip() for it in args.paths.split(',') if len(it.strip()) > 0]
+    for it in sound_formats:
+        if it not in SOUND_FORMATS:
+            raise ValueError(f'The sound format "{it}" is unknown!')
+    for it in loading_paths:
+        if it not in LOADING_PATHS:
+            raise ValueError(f'The loading path "{it}" is unknown!')
+    if args.repeats < 1:
+        raise ValueError(f'The number of runs is wrong! Expected a positive value, got {args.repeats}.')
+
+    remove_work_dir = args.work_dir is None
+    work_dir = tempfile.mkdtemp(prefix='benchmark_wav_io_') if remove_work_dir else args.work_dir
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    try:
+        for duration in durations:
+            for sound_format in sound_formats:
+                base_name = f'sound_{duration}s_{sound_format}.{"wav" if sound_format.startswith("wav") else sound_format}'
+                fname = os.path.join(work_dir, base_name)
+                if not os.path.isfile(fname):
+                    print(f'Generating {fname}...', file=sys.stderr)
+                    generate_sound(os.path.join(work_dir, 'partial_' + base_name), sound_format, duration)
+                    os.replace(os.path.join(work_dir, 'partial_' + base_name), fname)
+                for loading_path in loading_paths:
+                    if (loading_path in WAV_ONLY_PATHS) and (not sound_format.startswith('wav')):
+                        continue
+                    runs = [measure(loading_path, fname, work_dir) for _ in range(args.repeats)]
+                    elapsed_time = float(np.median([it['elapsed_time'] for it in runs]))
+                    results.append({
+                        'format': sound_format,
+                        'duration': duration,
+                        'path': loading_path,
+                        'file_size': os.path.getsize(fname),
+                        'elapsed_time': elapsed_time,
+                        'throughput': duration / max(elapsed_time, 1e-9),
+                        'peak_rss': max(it['peak_rss'] for it in runs),
+                        'children_peak_rss': max(it['children_peak_rss'] for it in runs),
+                        'temp_disk_bytes': max(it['temp_disk_bytes'] for it in runs)
+                    })
+                    print(f'{sound_format}, {duration} s, {loading_path}: {elapsed_time:.3f} s', file=sys.stderr)
+                if remove_work_dir:
+                    os.remove(fname)
+    finally:
+        if remove_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results)
+    if args.output_name is not None:
+        output_dir = os.path.dirname(args.output_name)
+        if len(output_dir) > 0:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(args.output_name, mode='w', encoding='utf-8') as fp:
+            json.dump(results, fp, indent=4)
+
+
+if __name__ == '__main__':
+    main()
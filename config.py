@@ -7,5 +7,8 @@ HUGGINGFACE_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
 
 MODEL_DIR = os.getenv("MODELS_DIR", "models/ru/diarization")
 
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "cache/audio")
+AUDIO_CACHE_MAX_SIZE = int(os.getenv("AUDIO_CACHE_MAX_SIZE", str(10 * 1024 ** 3)))
+
 if not HUGGINGFACE_TOKEN:
     raise ValueError("Ошибка: HUGGINGFACE_TOKEN не найден в .env файле!")
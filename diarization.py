@@ -1,11 +1,10 @@
 import os
 import argparse
 import torch
-import tempfile
-from config import HUGGINGFACE_TOKEN, MODEL_DIR
+from config import HUGGINGFACE_TOKEN, MODEL_DIR, AUDIO_CACHE_MAX_SIZE
 from utils.utils import download_diarization_models, get_device
 from pyannote.audio import Pipeline
-from wav_io.wav_io import transform_to_wavpcm, load_sound
+from wav_io.wav_io import decode_audio, pcm_to_float32, AudioCache, TARGET_SAMPLING_FREQUENCY
 
 
 # Проверка наличия необходимых моделей
@@ -21,7 +20,7 @@ def check_and_download_models():
     print("Все модели на месте.")
 
 
-def perform_diarization(input_audio, output_txt):
+def perform_diarization(input_audio, output_txt, cache_dir=None):
     print(f"Обрабатываем файл: {input_audio}")
 
     if not os.path.isfile(input_audio):
@@ -32,28 +31,24 @@ def perform_diarization(input_audio, output_txt):
     # Определяем устройство для вычислений
     device = get_device()
 
-    # Если файл не WAV, конвертируем его в временный .wav
-    tmp_wav_name = None
-    if not input_audio.endswith(".wav"):
-        print("Конвертация в WAV...")
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.wav') as fp:
-            tmp_wav_name = fp.name
-        transform_to_wavpcm(input_audio, tmp_wav_name)
-        wav_audio_path = tmp_wav_name
-    else:
-        wav_audio_path = input_audio
-
+    # Декодируем файл сразу в память (mono, 16 кГц), без временного .wav,
+    # или берём уже декодированный звук из кэша
     try:
-        sound_data = load_sound(wav_audio_path)
+        if cache_dir is None:
+            sound_data = decode_audio(input_audio)
+        else:
+            sound_data = AudioCache(cache_dir, AUDIO_CACHE_MAX_SIZE).load(input_audio)
         if sound_data is None:
-            raise ValueError(f"Файл {wav_audio_path} пуст или повреждён.")
+            raise ValueError(f"Файл {input_audio} пуст или повреждён.")
     except Exception as e:
-        raise RuntimeError(f"Ошибка загрузки {wav_audio_path}: {str(e)}")
+        raise RuntimeError(f"Ошибка загрузки {input_audio}: {str(e)}")
+    waveform = torch.from_numpy(pcm_to_float32(sound_data)).unsqueeze(0)
+    del sound_data
 
     config_path = os.path.join(MODEL_DIR, "speaker-diarization-3.1", "config.yaml")
     pipeline = Pipeline.from_pretrained(config_path).to(torch.device(device))
 
-    diarization_result = pipeline({"uri": "interview", "audio": wav_audio_path})
+    diarization_result = pipeline({"uri": "interview", "waveform": waveform, "sample_rate": TARGET_SAMPLING_FREQUENCY})
 
     # Сохраняем результат в файл
     os.makedirs(os.path.dirname(output_txt), exist_ok=True)
@@ -65,17 +60,13 @@ def perform_diarization(input_audio, output_txt):
 
     print(f"Диаризация завершена. Файл сохранён в {output_txt}")
 
-    # Удаление временного .wav файла
-    if tmp_wav_name and os.path.isfile(tmp_wav_name):
-        os.remove(tmp_wav_name)
-        print(f"Временный файл {tmp_wav_name} удалён.")
-
 # Аргументы командной строки
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Выполнить диаризацию спикеров в аудиофайле.")
     parser.add_argument("--input", type=str, required=True, help="Путь к входному аудиофайлу")
     parser.add_argument("--output", type=str, required=True, help="Путь к сохранённому файлу с результатами (.txt)")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Папка кэша декодированного звука")
     
     args = parser.parse_args()
     
-    perform_diarization(args.input, args.output)
+    perform_diarization(args.input, args.output, args.cache_dir)
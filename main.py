@@ -5,6 +5,7 @@ import logging
 from speech_to_docx import perform_transcribation
 from diarization import perform_diarization
 from utils.postprocessing import process_transcription_file, process_speaker_segments, convert_diarization_file
+from config import AUDIO_CACHE_DIR
 
 import torch
 print(torch.version.cuda)
@@ -16,7 +17,8 @@ print(torch.__version__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def main(input_audio, model_path, enable_diarization, enable_postprocessing):
+def main(input_audio, model_path, enable_diarization, enable_postprocessing, cache_dir=AUDIO_CACHE_DIR,
+         split_channels=False):
     logger.info(f"Старт пайплайна для {input_audio}")
 
     # Создаём структуру директорий
@@ -42,14 +44,19 @@ def main(input_audio, model_path, enable_diarization, enable_postprocessing):
         "speech_to_docx.py",
         "--input", input_audio,
         "--output", output_transcription,
-        "--model", model_path
+        "--model", model_path,
+        "--cache_dir", cache_dir
     ]
+    if split_channels:
+        sys.argv.append("--split_channels")
     perform_transcribation()
 
-    # 2. Опционально: Диаризация
-    if enable_diarization:
+    # 2. Опционально: Диаризация (не нужна, если каждый спикер записан в свой канал)
+    if enable_diarization and split_channels:
+        logger.info("Этап 2: Диаризация пропущена, спикеры определены по каналам записи")
+    elif enable_diarization:
         logger.info("Этап 2.1: Диаризация...")
-        perform_diarization(input_audio, diarization_output)
+        perform_diarization(input_audio, diarization_output, cache_dir)
 
         # Устанавливаем путь для объединённого файла
         diarization_output_merged = os.path.join(diarization_dir, f"{base_name}_diarization_merged_interim.txt")
@@ -80,6 +87,11 @@ if __name__ == "__main__":
     parser.add_argument("--model", type=str, default="models/ru", help="Путь к папке с моделями")
     parser.add_argument("--enable_diarization", action="store_true", help="Включить диаризацию")
     parser.add_argument("--enable_postprocessing", action="store_true", help="Включить постобработку")
+    parser.add_argument("--split_channels", action="store_true",
+                        help="Транскрибировать каналы раздельно (каждый спикер записан в свой канал)")
+    parser.add_argument("--cache_dir", type=str, default=AUDIO_CACHE_DIR,
+                        help="Папка кэша декодированного звука (общего для транскрипции и диаризации)")
 
     args = parser.parse_args()
-    main(args.input, args.model, args.enable_diarization, args.enable_postprocessing)
+    main(args.input, args.model, args.enable_diarization, args.enable_postprocessing, args.cache_dir,
+         args.split_channels)
@@ -3,12 +3,10 @@ import os
 import tempfile
 
 from flask import Flask, request, jsonify, send_file
-import numpy as np
 import uuid
 import asyncio
 
-from wav_io.wav_io import transform_to_wavpcm, load_sound
-from wav_io.wav_io import TARGET_SAMPLING_FREQUENCY
+from wav_io.wav_io import decode_audio, probe_audio, AudioBuffer
 from asr.asr import initialize_model_for_speech_recognition
 from asr.asr import initialize_model_for_speech_classification
 from asr.asr import initialize_model_for_speech_segmentation
@@ -88,54 +86,57 @@ async def transcribe():
         task_status[task_id] = jsonify(
             {"status": "Error", "status_code": 400, "message": "Unknown type of the file provided for upload"})
         return task_status[task_id]
-    tmp_audio_name = ''
-    tmp_wav_name = ''
-    err_msg = ''
-    input_sound = None
+    # Some containers (e.g. MP4 with the moov atom at the end) cannot be demuxed from a stream,
+    # so the upload is saved into a temporary file.
+    with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.' + src_file_ext) as fp:
+        tmp_audio_name = fp.name
     try:
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.' + src_file_ext) as fp:
-            tmp_audio_name = fp.name
         file.save(tmp_audio_name)
         speech_to_srt_logger.info(f'The sound "{file.filename}" is saved to the "{tmp_audio_name}".')
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.wav') as fp:
-            tmp_wav_name = fp.name
+        # The probing is used only for logging, so the sound is decoded even if it cannot be probed
         try:
-            transform_to_wavpcm(tmp_audio_name, tmp_wav_name)
+            sound_info = probe_audio(tmp_audio_name)
+        except BaseException as ex:
+            speech_to_srt_logger.warning(f'The sound "{file.filename}" cannot be probed: {str(ex)}')
+            sound_info = None
+        if (sound_info is not None) and (sound_info.duration is not None) and (sound_info.duration <= 0.0):
+            speech_to_srt_logger.error('400: Audio file is empty.')
+            task_status[task_id] = jsonify(
+                {"status": "Error", "status_code": 400, "message": "Audio file is empty."})
+            return task_status[task_id]
+        if sound_info is not None:
+            speech_to_srt_logger.info(f'The new sound "{file.filename}" is {sound_info.codec} in '
+                                      f'{sound_info.container} ({sound_info.n_channels} channels, '
+                                      f'{sound_info.sampling_frequency} Hz).')
+        if (sound_info is not None) and (sound_info.duration is not None):
+            speech_to_srt_logger.info(f'The total duration of the new sound "{file.filename}" is '
+                                      f'{time_to_str(sound_info.duration)}.')
+
+        err_msg = ''
+        input_sound = None
+        try:
+            input_sound = decode_audio(tmp_audio_name)
         except BaseException as ex:
             err_msg = str(ex)
             speech_to_srt_logger.error(err_msg)
         if len(err_msg) == 0:
-            speech_to_srt_logger.info(f'The sound "{file.filename}" is converted to the "{tmp_wav_name}".')
-            try:
-                input_sound = load_sound(tmp_wav_name)
-            except BaseException as ex:
-                err_msg = str(ex)
-                speech_to_srt_logger.error(err_msg)
+            speech_to_srt_logger.info(f'The sound "{file.filename}" is decoded.')
+        if (len(err_msg) > 0) or (input_sound is None):
             if len(err_msg) == 0:
-                speech_to_srt_logger.info(f'The sound is "{tmp_wav_name}" is loaded.')
+                err_msg = 'Audio file is empty.'
+                speech_to_srt_logger.error('400: ' + err_msg)
+                task_status[task_id]['message'] = err_msg
+            else:
+                task_status[task_id]['message'] = err_msg
+            task_status[task_id]['status'] = 'Error'
+            task_status[task_id]['status_code'] = 400
+            return jsonify(task_status[task_id])
     finally:
         if os.path.isfile(tmp_audio_name):
             os.remove(tmp_audio_name)
-            speech_to_srt_logger.info(f'The sound is "{tmp_audio_name}" is removed.')
-        if os.path.isfile(tmp_wav_name):
-            os.remove(tmp_wav_name)
-            speech_to_srt_logger.info(f'The sound is "{tmp_wav_name}" is removed.')
-    if (len(err_msg) > 0) or (input_sound is None):
-        if len(err_msg) == 0:
-            err_msg = 'Audio file is empty.'
-            speech_to_srt_logger.error('400: ' + err_msg)
-            task_status[task_id]['message'] = err_msg
-        else:
-            task_status[task_id]['message'] = err_msg
-        task_status[task_id]['status'] = 'Error'
-        task_status[task_id]['status_code'] = 400
-        return jsonify(task_status[task_id])
-
-    if not isinstance(input_sound, np.ndarray):
-        speech_to_srt_logger.info(f'The sound "{file.filename}" is stereo.')
-        input_sound = (input_sound[0] + input_sound[1]) / 2.0
-    speech_to_srt_logger.info(f'The total duration of the new sound "{file.filename}" is '
-                              f'{time_to_str(input_sound.shape[0] / TARGET_SAMPLING_FREQUENCY)}.')
+            speech_to_srt_logger.info(f'The sound "{tmp_audio_name}" is removed.')
+
+    input_sound = AudioBuffer(input_sound)
 
     if input_sound is None:
         speech_to_srt_logger.info(f'The sound "{file.filename}" is empty.')
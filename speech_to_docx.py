@@ -3,19 +3,18 @@ import codecs
 import logging
 import os
 import sys
-import tempfile
 
 from docx import Document
 import numpy as np
 
-from wav_io.wav_io import transform_to_wavpcm, load_sound
-from wav_io.wav_io import TARGET_SAMPLING_FREQUENCY
+from wav_io.wav_io import decode_audio, probe_audio, load_sound, downmix_to_mono, AudioBuffer, AudioCache
 from asr.asr import initialize_model_for_speech_recognition
 from asr.asr import initialize_model_for_speech_classification
-from asr.asr import initialize_model_for_speech_segmentation
-from asr.asr import transcribe, check_language
+from asr.asr import initialize_segmenter, SEGMENTER_TYPES
+from asr.asr import transcribe, transcribe_channels, check_language
 from asr.asr import asr_logger
 from utils.utils import time_to_str
+from config import AUDIO_CACHE_MAX_SIZE
 
 
 speech_to_srt_logger = logging.getLogger(__name__)
@@ -32,6 +31,24 @@ def perform_transcribation():
                         help='The path to directory with Wav2Vec2, AudioTransformer and Whisper.')
     parser.add_argument('-o', '--output', dest='output_name', type=str, required=True,
                         help='The output DocX file name.')
+    parser.add_argument('--cache_dir', dest='cache_dir', type=str, required=False, default=None,
+                        help='The directory of the decoded sound cache (the cache is not used if it is not specified).')
+    parser.add_argument('--split_channels', dest='split_channels', action='store_true', required=False,
+                        help='Each channel of a multichannel sound is a separate speaker, so the channels are '
+                             'transcribed independently.')
+    parser.add_argument('--min_silence', dest='min_silence', type=float, required=False, default=None,
+                        help='The minimal duration (in seconds) of silences, which are found by the WebRTC VAD and '
+                             'are skipped by the speech segmenter (silences are not skipped by default).')
+    parser.add_argument('--max_pause', dest='max_pause', type=float, required=False, default=None,
+                        help='The maximal duration (in seconds) of pauses inside speech segments: longer pauses are '
+                             'shortened before the recognition (pauses are not shortened by default).')
+    parser.add_argument('--speech_guard', dest='speech_guard', type=float, required=False, default=None,
+                        help='The guard margin (in seconds) around speech bounds, which are found by the WebRTC VAD: '
+                             'segments are padded up to these bounds instead of the fixed padding of 0.5 seconds.')
+    parser.add_argument('--segmenter', dest='segmenter_type', type=str, required=False, default='wav2vec2',
+                        choices=SEGMENTER_TYPES,
+                        help='The speech segmenter: Wav2Vec2 (precise word boundaries) or WebRTC VAD (fast and '
+                             'without the Wav2Vec2 model, but boundaries are less precise).')
     args = parser.parse_args()
 
     language_name = check_language(args.language)
@@ -47,7 +64,7 @@ def perform_transcribation():
             speech_to_srt_logger.error(err_msg)
             raise IOError(err_msg)
         wav2vec2_path = os.path.join(model_dir, 'wav2vec2')
-        if not os.path.isdir(wav2vec2_path):
+        if (args.segmenter_type == 'wav2vec2') and (not os.path.isdir(wav2vec2_path)):
             err_msg = f'The directory "{wav2vec2_path}" does not exist!'
             speech_to_srt_logger.error(err_msg)
             raise IOError(err_msg)
@@ -86,38 +103,60 @@ def perform_transcribation():
         speech_to_srt_logger.error(err_msg)
         raise IOError(err_msg)
 
+    # The probing is used only for logging and for the channel splitting, so the sound is decoded even if it cannot be probed
+    try:
+        sound_info = probe_audio(audio_fname)
+    except BaseException as ex:
+        speech_to_srt_logger.warning(f'The sound "{audio_fname}" cannot be probed: {str(ex)}')
+        sound_info = None
+    if (sound_info is None) or (sound_info.duration is None):
+        speech_to_srt_logger.info(f'The total duration of the sound "{audio_fname}" is unknown.')
+    else:
+        speech_to_srt_logger.info(f'The total duration of the sound "{audio_fname}" is '
+                                  f'{time_to_str(sound_info.duration)}.')
+    split_channels = args.split_channels and (sound_info is not None) and (sound_info.n_channels > 1)
+    if args.split_channels and (not split_channels):
+        if sound_info is None:
+            speech_to_srt_logger.warning(f'The channel number of the sound "{audio_fname}" is unknown, '
+                                         f'so it is not split into channels.')
+        else:
+            speech_to_srt_logger.warning(f'The sound "{audio_fname}" is mono, so it cannot be split into channels.')
+
     # Определяем, является ли входной файл WAV (по расширению)
     is_wav = audio_fname.lower().endswith('.wav')
 
-    if not is_wav:
-        # Если файл не WAV, то создаём временный WAV-файл и конвертируем
-        tmp_wav_name = ''
+    if split_channels:
+        # Каналы транскрибируются раздельно, поэтому декодируем звук без сведения в моно (кэш хранит только моно)
+        try:
+            input_sound = decode_audio(audio_fname, keep_channels=True)
+        except BaseException as ex:
+            err_msg = str(ex)
+            speech_to_srt_logger.error(err_msg)
+            raise
+        speech_to_srt_logger.info(f'The sound "{audio_fname}" is decoded with {sound_info.n_channels} channels.')
+    elif args.cache_dir is not None:
+        # Берём декодированный звук из кэша (или декодируем и кладём в кэш)
+        try:
+            input_sound = AudioCache(args.cache_dir, AUDIO_CACHE_MAX_SIZE).load(audio_fname)
+        except BaseException as ex:
+            err_msg = str(ex)
+            speech_to_srt_logger.error(err_msg)
+            raise
+        speech_to_srt_logger.info(f'The sound "{audio_fname}" is loaded from the cache "{args.cache_dir}".')
+    elif not is_wav:
+        # Если файл не WAV, то декодируем его через FFmpeg прямо в память, без временных файлов
         try:
-            with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.wav') as fp:
-                tmp_wav_name = fp.name
-            try:
-                transform_to_wavpcm(audio_fname, tmp_wav_name)
-            except BaseException as ex:
-                err_msg = str(ex)
-                speech_to_srt_logger.error(err_msg)
-                raise
-            speech_to_srt_logger.info(f'The sound "{audio_fname}" is converted to "{tmp_wav_name}".')
-            try:
-                input_sound = load_sound(tmp_wav_name)
-            except BaseException as ex:
-                err_msg = str(ex)
-                speech_to_srt_logger.error(err_msg)
-                raise
-            speech_to_srt_logger.info(f'The sound from "{tmp_wav_name}" is loaded.')
-        finally:
-            if os.path.isfile(tmp_wav_name):
-                os.remove(tmp_wav_name)
-                speech_to_srt_logger.info(f'Temporary file "{tmp_wav_name}" is removed.')
+            input_sound = decode_audio(audio_fname)
+        except BaseException as ex:
+            err_msg = str(ex)
+            speech_to_srt_logger.error(err_msg)
+            raise
+        speech_to_srt_logger.info(f'The sound "{audio_fname}" is decoded.')
     else:
         # Если файл уже WAV, передаём его напрямую в load_sound
         speech_to_srt_logger.info(f'The input file "{audio_fname}" is WAV; loading it directly.')
         try:
-            input_sound = load_sound(audio_fname)
+            input_sound = load_sound(audio_fname, use_mmap=True)
         except BaseException as ex:
             err_msg = str(ex)
             speech_to_srt_logger.error(err_msg)
@@ -127,19 +166,21 @@ def perform_transcribation():
         speech_to_srt_logger.info(f'The sound "{audio_fname}" is empty.')
         texts_with_timestamps = []
     else:
-        if not isinstance(input_sound, np.ndarray):
-            speech_to_srt_logger.info(f'The sound "{audio_fname}" is stereo.')
-            input_sound = (input_sound[0] + input_sound[1]) / 2.0
-        speech_to_srt_logger.info(f'The total duration of the sound "{audio_fname}" is '
-                                  f'{time_to_str(input_sound.shape[0] / TARGET_SAMPLING_FREQUENCY)}.')
+        if not split_channels:
+            if not isinstance(input_sound, np.ndarray):
+                speech_to_srt_logger.info(f'The sound "{audio_fname}" is stereo.')
+            input_sound = AudioBuffer(downmix_to_mono(input_sound, dtype=np.int16))
 
         try:
-            segmenter = initialize_model_for_speech_segmentation(language_name, model_info=wav2vec2_path)
+            segmenter = initialize_segmenter(args.segmenter_type, language_name, model_info=wav2vec2_path)
         except BaseException as ex:
             err_msg = str(ex)
             speech_to_srt_logger.error(err_msg)
             raise
-        speech_to_srt_logger.info('The Wav2Vec2-based segmenter is loaded.')
+        if args.segmenter_type == 'vad':
+            speech_to_srt_logger.info('The WebRTC VAD-based segmenter is initialized.')
+        else:
+            speech_to_srt_logger.info('The Wav2Vec2-based segmenter is loaded.')
 
         try:
             vad = initialize_model_for_speech_classification(model_info=audiotransformer_path)
@@ -157,11 +198,23 @@ def perform_transcribation():
             raise
         speech_to_srt_logger.info('The Whisper-based ASR is initialized.')
 
-        texts_with_timestamps = transcribe(input_sound, segmenter, vad, asr, min_segment_size=1, max_segment_size=20)
+        if split_channels:
+            texts_with_timestamps = transcribe_channels(input_sound, segmenter, vad, asr,
+                                                        min_segment_size=1, max_segment_size=20,
+                                                        min_silence=args.min_silence, max_pause=args.max_pause,
+                                                        speech_guard=args.speech_guard)
+        else:
+            texts_with_timestamps = transcribe(input_sound, segmenter, vad, asr,
+                                               min_segment_size=1, max_segment_size=20, min_silence=args.min_silence,
+                                               max_pause=args.max_pause, speech_guard=args.speech_guard)
 
     doc = Document()
-    for start_time, end_time, sentence_text in texts_with_timestamps:
-        line = f'{time_to_str(start_time)} - {time_to_str(end_time)} - {sentence_text}'
+    for cur in texts_with_timestamps:
+        start_time, end_time, sentence_text = cur[0:3]
+        if len(cur) > 3:
+            line = f'{time_to_str(start_time)} - {time_to_str(end_time)} - {cur[3]}: {sentence_text}'
+        else:
+            line = f'{time_to_str(start_time)} - {time_to_str(end_time)} - {sentence_text}'
         doc.add_paragraph(line)
         doc.add_paragraph('')
     doc.save(output_docx_fname)
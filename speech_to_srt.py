@@ -3,33 +3,145 @@ import codecs
 import logging
 import os
 import sys
-import tempfile
+from typing import List, Optional, Tuple, Union
 
-import numpy as np
+from transformers import Pipeline
 
-from wav_io.wav_io import transform_to_wavpcm, load_sound
+from wav_io.wav_io import decode_audio, decode_audio_batch, probe_audio, AudioBuffer, AudioCache
 from wav_io.wav_io import TARGET_SAMPLING_FREQUENCY
 from asr.asr import initialize_model_for_speech_recognition
 from asr.asr import initialize_model_for_speech_classification
-from asr.asr import initialize_model_for_speech_segmentation
-from asr.asr import transcribe, check_language
+from asr.asr import initialize_segmenter, SEGMENTER_TYPES
+from asr.asr import transcribe, transcribe_sharded, check_language
 from asr.asr import asr_logger
+from vad.vad import VADSegmenter
 from utils.utils import time_to_str
+from config import AUDIO_CACHE_MAX_SIZE
 
 
 speech_to_srt_logger = logging.getLogger(__name__)
 
 
+def load_models(language_name: str, wav2vec2_path: Optional[str], audiotransformer_path: Optional[str],
+                whisper_path: Optional[str],
+                segmenter_type: str = 'wav2vec2') -> Tuple[Union[Pipeline, VADSegmenter], Pipeline, Pipeline]:
+    try:
+        segmenter = initialize_segmenter(segmenter_type, language_name, model_info=wav2vec2_path)
+    except BaseException as ex:
+        err_msg = str(ex)
+        speech_to_srt_logger.error(err_msg)
+        raise
+    if segmenter_type == 'vad':
+        speech_to_srt_logger.info('The WebRTC VAD-based segmenter is initialized.')
+    else:
+        speech_to_srt_logger.info('The Wav2Vec2-based segmenter is loaded.')
+
+    try:
+        vad = initialize_model_for_speech_classification(model_info=audiotransformer_path)
+    except BaseException as ex:
+        err_msg = str(ex)
+        speech_to_srt_logger.error(err_msg)
+        raise
+    speech_to_srt_logger.info('The AST-based voice activity detector is loaded.')
+
+    try:
+        asr = initialize_model_for_speech_recognition(language_name, model_info=whisper_path)
+    except BaseException as ex:
+        err_msg = str(ex)
+        speech_to_srt_logger.error(err_msg)
+        raise
+    speech_to_srt_logger.info('The Whisper-based ASR is initialized.')
+    return segmenter, vad, asr
+
+
+def save_srt(texts_with_timestamps: List[Tuple[float, float, str]], output_srt_fname: str) -> None:
+    with codecs.open(output_srt_fname, mode='w', encoding='utf-8') as fp:
+        for counter, (sent_start, sent_end, sentence_text) in enumerate(texts_with_timestamps):
+            fp.write(f'{counter + 1}\n')
+            fp.write(f'{time_to_str(sent_start)} --> {time_to_str(sent_end)}\n')
+            fp.write(f'{sentence_text}\n\n')
+
+
+def transcribe_directory(input_dir: str, output_dir: str, language_name: str, wav2vec2_path: Optional[str],
+                         audiotransformer_path: Optional[str], whisper_path: Optional[str],
+                         cache_dir: Optional[str], n_processes: Optional[int],
+                         min_silence: Optional[float] = None, segmenter_type: str = 'wav2vec2',
+                         max_pause: Optional[float] = None, speech_guard: Optional[float] = None) -> None:
+    if not os.path.isdir(output_dir):
+        err_msg = f'The directory "{output_dir}" does not exist!'
+        speech_to_srt_logger.error(err_msg)
+        raise IOError(err_msg)
+    audio_fnames = sorted(filter(
+        lambda it: os.path.isfile(it),
+        map(lambda it: os.path.join(input_dir, it), filter(lambda it: not it.startswith('.'), os.listdir(input_dir)))
+    ))
+    if len(audio_fnames) == 0:
+        err_msg = f'The directory "{input_dir}" is empty!'
+        speech_to_srt_logger.error(err_msg)
+        raise IOError(err_msg)
+    speech_to_srt_logger.info(f'There are {len(audio_fnames)} files in the directory "{input_dir}".')
+
+    segmenter, vad, asr = load_models(language_name, wav2vec2_path, audiotransformer_path, whisper_path,
+                                      segmenter_type)
+    n_errors = 0
+    for audio_fname, input_sound, err_msg in decode_audio_batch(audio_fnames, n_processes=n_processes, ordered=False,
+                                                                cache_dir=cache_dir,
+                                                                cache_max_size=AUDIO_CACHE_MAX_SIZE):
+        if err_msg is not None:
+            speech_to_srt_logger.error(err_msg)
+            n_errors += 1
+            continue
+        speech_to_srt_logger.info(f'The sound "{audio_fname}" is decoded.')
+        if input_sound is None:
+            speech_to_srt_logger.info(f'The sound "{audio_fname}" is empty.')
+            texts_with_timestamps = []
+        else:
+            input_sound = AudioBuffer(input_sound)
+            speech_to_srt_logger.info(f'The total duration of the sound "{audio_fname}" is '
+                                      f'{time_to_str(input_sound.shape[0] / TARGET_SAMPLING_FREQUENCY)}.')
+            texts_with_timestamps = transcribe(input_sound, segmenter, vad, asr,
+                                               min_segment_size=1, max_segment_size=20, min_silence=min_silence,
+                                               max_pause=max_pause, speech_guard=speech_guard)
+        del input_sound
+        output_srt_fname = os.path.join(output_dir, os.path.splitext(os.path.basename(audio_fname))[0] + '.srt')
+        save_srt(texts_with_timestamps, output_srt_fname)
+        speech_to_srt_logger.info(f'The sound "{audio_fname}" is transcribed into "{output_srt_fname}".')
+    if n_errors > 0:
+        speech_to_srt_logger.warning(f'{n_errors} files of {len(audio_fnames)} cannot be decoded.')
+
+
 def main():
     parser = ArgumentParser()
     parser.add_argument('--lang', dest='language', type=str, required=False, default='ru',
                         help='The language of input speech (Russian or English).')
     parser.add_argument('-i', '--input', dest='input_name', type=str, required=True,
-                        help='The input sound file name.')
+                        help='The input sound file name (or the directory of sound files).')
     parser.add_argument('-m', '--model', dest='model_dir', type=str, required=False, default=None,
                         help='The path to directory with Wav2Vec2, AudioTransformer and Whisper.')
     parser.add_argument('-o', '--output', dest='output_name', type=str, required=True,
-                        help='The output SubRip file name.')
+                        help='The output SubRip file name (or the output directory, if the input is a directory).')
+    parser.add_argument('--cache_dir', dest='cache_dir', type=str, required=False, default=None,
+                        help='The directory of the decoded sound cache (the cache is not used if it is not specified).')
+    parser.add_argument('--n_processes', dest='n_processes', type=int, required=False, default=None,
+                        help='The number of processes which decode sound files, if the input is a directory, '
+                             'or which transcribe shards of a single long sound file. In the last case, each process '
+                             'loads its own copy of the segmenter, the AST and the Whisper models (several GB of '
+                             'memory per process for Whisper-large), so on a GPU host each process takes its own '
+                             'CUDA device, and the process number is limited by the device number. Without a GPU, '
+                             'all processes run on the CPU, and the RAM should be enough for all model copies.')
+    parser.add_argument('--min_silence', dest='min_silence', type=float, required=False, default=None,
+                        help='The minimal duration (in seconds) of silences, which are found by the WebRTC VAD and '
+                             'are skipped by the speech segmenter (silences are not skipped by default).')
+    parser.add_argument('--max_pause', dest='max_pause', type=float, required=False, default=None,
+                        help='The maximal duration (in seconds) of pauses inside speech segments: longer pauses are '
+                             'shortened before the recognition (pauses are not shortened by default).')
+    parser.add_argument('--speech_guard', dest='speech_guard', type=float, required=False, default=None,
+                        help='The guard margin (in seconds) around speech bounds, which are found by the WebRTC VAD: '
+                             'segments are padded up to these bounds instead of the fixed padding of 0.5 seconds.')
+    parser.add_argument('--segmenter', dest='segmenter_type', type=str, required=False, default='wav2vec2',
+                        choices=SEGMENTER_TYPES,
+                        help='The speech segmenter: Wav2Vec2 (precise word boundaries) or WebRTC VAD (fast and '
+                             'without the Wav2Vec2 model, but boundaries are less precise).')
     args = parser.parse_args()
 
     language_name = check_language(args.language)
@@ -45,7 +157,7 @@ def main():
             speech_to_srt_logger.error(err_msg)
             raise IOError(err_msg)
         wav2vec2_path = os.path.join(model_dir, 'wav2vec2')
-        if not os.path.isdir(wav2vec2_path):
+        if (args.segmenter_type == 'wav2vec2') and (not os.path.isdir(wav2vec2_path)):
             err_msg = f'The directory "{wav2vec2_path}" does not exist!'
             speech_to_srt_logger.error(err_msg)
             raise IOError(err_msg)
@@ -61,6 +173,11 @@ def main():
             raise IOError(err_msg)
 
     audio_fname = os.path.normpath(args.input_name)
+    if os.path.isdir(audio_fname):
+        transcribe_directory(audio_fname, os.path.normpath(args.output_name), language_name, wav2vec2_path,
+                             audiotransformer_path, whisper_path, args.cache_dir, args.n_processes, args.min_silence,
+                             args.segmenter_type, args.max_pause, args.speech_guard)
+        return
     if not os.path.isfile(audio_fname):
         err_msg = f'The file "{audio_fname}" does not exist!'
         speech_to_srt_logger.error(err_msg)
@@ -84,70 +201,50 @@ def main():
         speech_to_srt_logger.error(err_msg)
         raise IOError(err_msg)
 
-    tmp_wav_name = ''
+    # The probing is used only for logging, so the sound is decoded even if it cannot be probed
     try:
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.wav') as fp:
-            tmp_wav_name = fp.name
-        try:
-            transform_to_wavpcm(audio_fname, tmp_wav_name)
-        except BaseException as ex:
-            err_msg = str(ex)
-            speech_to_srt_logger.error(err_msg)
-            raise
-        speech_to_srt_logger.info(f'The sound "{audio_fname}" is converted to the "{tmp_wav_name}".')
-        try:
-            input_sound = load_sound(tmp_wav_name)
-        except BaseException as ex:
-            err_msg = str(ex)
-            speech_to_srt_logger.error(err_msg)
-            raise
-        speech_to_srt_logger.info(f'The sound is "{tmp_wav_name}" is loaded.')
-    finally:
-        if os.path.isfile(tmp_wav_name):
-            os.remove(tmp_wav_name)
-            speech_to_srt_logger.info(f'The sound is "{tmp_wav_name}" is removed.')
+        sound_info = probe_audio(audio_fname)
+    except BaseException as ex:
+        speech_to_srt_logger.warning(f'The sound "{audio_fname}" cannot be probed: {str(ex)}')
+        sound_info = None
+    if (sound_info is None) or (sound_info.duration is None):
+        speech_to_srt_logger.info(f'The total duration of the sound "{audio_fname}" is unknown.')
+    else:
+        speech_to_srt_logger.info(f'The total duration of the sound "{audio_fname}" is '
+                                  f'{time_to_str(sound_info.duration)}.')
+
+    try:
+        if args.cache_dir is None:
+            input_sound = decode_audio(audio_fname)
+        else:
+            input_sound = AudioCache(args.cache_dir, AUDIO_CACHE_MAX_SIZE).load(audio_fname)
+    except BaseException as ex:
+        err_msg = str(ex)
+        speech_to_srt_logger.error(err_msg)
+        raise
+    speech_to_srt_logger.info(f'The sound "{audio_fname}" is decoded.')
 
     if input_sound is None:
         speech_to_srt_logger.info(f'The sound "{audio_fname}" is empty.')
         texts_with_timestamps = []
     else:
-        if not isinstance(input_sound, np.ndarray):
-            speech_to_srt_logger.info(f'The sound "{audio_fname}" is stereo.')
-            input_sound = (input_sound[0] + input_sound[1]) / 2.0
-        speech_to_srt_logger.info(f'The total duration of the sound "{audio_fname}" is '
-                                  f'{time_to_str(input_sound.shape[0] / TARGET_SAMPLING_FREQUENCY)}.')
+        input_sound = AudioBuffer(input_sound)
 
-        try:
-            segmenter = initialize_model_for_speech_segmentation(language_name, model_info=wav2vec2_path)
-        except BaseException as ex:
-            err_msg = str(ex)
-            speech_to_srt_logger.error(err_msg)
-            raise
-        speech_to_srt_logger.info('The Wav2Vec2-based segmenter is loaded.')
-
-        try:
-            vad = initialize_model_for_speech_classification(model_info=audiotransformer_path)
-        except BaseException as ex:
-            err_msg = str(ex)
-            speech_to_srt_logger.error(err_msg)
-            raise
-        speech_to_srt_logger.info('The AST-based voice activity detector is loaded.')
-
-        try:
-            asr = initialize_model_for_speech_recognition(language_name, model_info=whisper_path)
-        except BaseException as ex:
-            err_msg = str(ex)
-            speech_to_srt_logger.error(err_msg)
-            raise
-        speech_to_srt_logger.info('The Whisper-based ASR is initialized.')
-
-        texts_with_timestamps = transcribe(input_sound, segmenter, vad, asr, min_segment_size=1, max_segment_size=20)
+        if (args.n_processes is not None) and (args.n_processes > 1):
+            texts_with_timestamps = transcribe_sharded(
+                input_sound, min_segment_size=1, max_segment_size=20, n_processes=args.n_processes,
+                language=language_name, segmenter_type=args.segmenter_type, wav2vec2_path=wav2vec2_path,
+                audiotransformer_path=audiotransformer_path, whisper_path=whisper_path, min_silence=args.min_silence,
+                max_pause=args.max_pause, speech_guard=args.speech_guard
+            )
+        else:
+            segmenter, vad, asr = load_models(language_name, wav2vec2_path, audiotransformer_path, whisper_path,
+                                              args.segmenter_type)
+            texts_with_timestamps = transcribe(input_sound, segmenter, vad, asr, min_segment_size=1,
+                                               max_segment_size=20, min_silence=args.min_silence,
+                                               max_pause=args.max_pause, speech_guard=args.speech_guard)
 
-    with codecs.open(output_srt_fname, mode='w', encoding='utf-8') as fp:
-        for counter, (sent_start, sent_end, sentence_text) in enumerate(texts_with_timestamps):
-            fp.write(f'{counter + 1}\n')
-            fp.write(f'{time_to_str(sent_start)} --> {time_to_str(sent_end)}\n')
-            fp.write(f'{sentence_text}\n\n')
+    save_srt(texts_with_timestamps, output_srt_fname)
 
 
 if __name__ == '__main__':
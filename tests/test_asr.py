@@ -1,19 +1,41 @@
+import io
 import os
 import sys
+import time
 import unittest
+from unittest import mock
+import wave
 
+import numpy as np
+import torch
 
 try:
     from asr.asr import select_word_groups
     from asr.asr import strip_segments
     from asr.asr import join_short_segments_to_long_ones
     from asr.asr import find_repeated_tokens, find_tokens_in_text, remove_oscillatory_hallucinations
+    from asr.asr import find_repeated_ngrams, remove_repeated_phrases
+    from asr.asr import RepetitionLoopStoppingCriteria, calculate_max_new_tokens, recognize_sounds
+    from asr.asr import calculate_frame_levels, find_channel_activity, transcribe_channels
+    from asr.asr import segment_sound, find_shard_bounds, transcribe_sharded, snap_segments_to_speech
+    from asr.asr import select_shard_devices, merge_shard_results, _transcribe_shard
+    from asr.asr import SegmentTable, find_word_bounds, find_word_bounds_streaming, segment_sound_streaming
+    from vad.vad import VADSegmenter
+    from wav_io.wav_io import load_sound, float32_to_pcm, AudioBuffer, as_waveform
 except:
     sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
     from asr.asr import select_word_groups
     from asr.asr import strip_segments
     from asr.asr import join_short_segments_to_long_ones
     from asr.asr import find_repeated_tokens, find_tokens_in_text, remove_oscillatory_hallucinations
+    from asr.asr import find_repeated_ngrams, remove_repeated_phrases
+    from asr.asr import RepetitionLoopStoppingCriteria, calculate_max_new_tokens, recognize_sounds
+    from asr.asr import calculate_frame_levels, find_channel_activity, transcribe_channels
+    from asr.asr import segment_sound, find_shard_bounds, transcribe_sharded, snap_segments_to_speech
+    from asr.asr import select_shard_devices, merge_shard_results, _transcribe_shard
+    from asr.asr import SegmentTable, find_word_bounds, find_word_bounds_streaming, segment_sound_streaming
+    from vad.vad import VADSegmenter
+    from wav_io.wav_io import load_sound, float32_to_pcm, AudioBuffer, as_waveform
 
 
 class TestASR(unittest.TestCase):
@@ -128,6 +150,20 @@ class TestASR(unittest.TestCase):
         self.assertIsInstance(predicted_groups, list)
         self.assertEqual(len(predicted_groups), len(target_groups))
 
+    def test_select_word_groups_pos06(self):
+        words = [(float(idx), idx + 0.5) for idx in range(100_000)]
+        start_time = time.perf_counter()
+        predicted_groups = select_word_groups(words, 20.0)
+        self.assertLess(time.perf_counter() - start_time, 5.0)
+        self.assertEqual([word for cur_group in predicted_groups for word in cur_group], words)
+        for cur_group in predicted_groups[:-1]:
+            self.assertEqual(cur_group[-1][1] - cur_group[0][0], 0.5)
+
+    def test_select_word_groups_pos07(self):
+        words = [(0.0, 1.0), (2.0, 3.0), (4.0, 5.0), (5.5, 6.0), (7.0, 8.0)]
+        target_groups = [[(0.0, 1.0)], [(2.0, 3.0)], [(4.0, 5.0), (5.5, 6.0), (7.0, 8.0)]]
+        self.assertEqual(select_word_groups(words, 4.5), target_groups)
+
     def test_find_repeated_tokens_pos01(self):
         tokens = ['мама', 'мыла', 'раму']
         self.assertIsNone(find_repeated_tokens(tokens, 0))
@@ -272,6 +308,122 @@ class TestASR(unittest.TestCase):
         self.assertIsInstance(res, str)
         self.assertEqual(res, true_text)
 
+    def test_remove_oscillatory_hallucinations_pos03(self):
+        source_text = 'What a mess, someone stole the words! A-a-a-a!'
+        true_text = 'What a mess, someone stole the words! A!'
+        self.assertEqual(remove_oscillatory_hallucinations(source_text), true_text)
+
+    def test_remove_oscillatory_hallucinations_pos04(self):
+        source_words = []
+        true_words = []
+        for idx in range(10_000):
+            source_words += [f'слово{idx}', 'да', 'да', 'да', 'да', 'да', f'конец{idx},', 'нет', 'нет', 'нет']
+            true_words += [f'слово{idx}', 'да', f'конец{idx},', 'нет', 'нет', 'нет']
+        self.assertEqual(len(source_words), 100_000)
+        source_text = ' '.join(source_words)
+        start_time = time.perf_counter()
+        res = remove_oscillatory_hallucinations(source_text)
+        self.assertLess(time.perf_counter() - start_time, 5.0)
+        self.assertEqual(res, ' '.join(true_words))
+        source_text = ' '.join(['да'] * 100_000)
+        self.assertEqual(remove_oscillatory_hallucinations(source_text), 'да')
+
+    def test_find_repeated_ngrams_pos01(self):
+        tokens = ['x', 'a', 'a', 'a', 'a', 'a', 'b', 'c', 'd', 'B', 'C', 'D', 'b', 'c', 'd', 'b', 'c']
+        self.assertEqual(find_repeated_ngrams(tokens), [(1, 6, 1), (6, 15, 3)])
+        self.assertEqual(find_repeated_ngrams(tokens, min_period=2), [(6, 15, 3)])
+        self.assertEqual(find_repeated_ngrams(tokens, max_period=2), [(1, 6, 1)])
+        self.assertEqual(find_repeated_ngrams(tokens, min_repetitions=4), [(1, 6, 1)])
+
+    def test_find_repeated_ngrams_pos02(self):
+        tokens = ['a', 'b'] * 6
+        self.assertEqual(find_repeated_ngrams(tokens), [(0, 12, 2)])
+        self.assertEqual(find_repeated_ngrams(['мама', 'мыла', 'раму']), [])
+        self.assertEqual(find_repeated_ngrams([]), [])
+
+    def test_find_repeated_ngrams_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = find_repeated_ngrams(['a', 'a'], min_repetitions=1)
+        with self.assertRaises(ValueError):
+            _ = find_repeated_ngrams(['a', 'a'], max_period=0)
+
+    def test_remove_repeated_phrases_pos01(self):
+        source_text = 'Спасибо за внимание. Спасибо за внимание. Спасибо за внимание. Спасибо за внимание.'
+        self.assertEqual(remove_repeated_phrases(source_text), 'Спасибо за внимание.')
+        source_text = 'Я думаю, я думаю, я думаю, что да, да, да.'
+        self.assertEqual(remove_repeated_phrases(source_text), 'Я думаю, что да, да, да.')
+        source_text = '  Мама   мыла раму. '
+        self.assertEqual(remove_repeated_phrases(source_text), 'Мама мыла раму.')
+
+    def test_remove_repeated_phrases_pos02(self):
+        source_words = []
+        true_words = []
+        for idx in range(5_000):
+            source_words += [f'начало{idx}'] + ['и', 'вот', 'так'] * 5 + [f'конец{idx}.', 'нет', 'да', 'нет']
+            true_words += [f'начало{idx}', 'и', 'вот', 'так', f'конец{idx}.', 'нет', 'да', 'нет']
+        self.assertEqual(len(source_words), 100_000)
+        start_time = time.perf_counter()
+        res = remove_repeated_phrases(' '.join(source_words))
+        self.assertLess(time.perf_counter() - start_time, 5.0)
+        self.assertEqual(res, ' '.join(true_words))
+
+    def test_repetition_loop_stopping_criteria_pos01(self):
+        criteria = RepetitionLoopStoppingCriteria(min_repetitions=3, max_period=4, min_loop_length=4)
+        input_ids = torch.tensor([
+            [50258, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12],
+            [50258, 1, 2, 3, 7, 8, 9, 7, 8, 9, 7, 8, 9],
+            [50258, 1, 2, 3, 4, 5, 6, 7, 8, 5, 5, 5, 5],
+            [50258, 7, 8, 9, 7, 8, 9, 7, 8, 9, 7, 8, 1]
+        ], dtype=torch.long)
+        self.assertEqual(criteria(input_ids, None).tolist(), [False, True, True, False])
+        self.assertEqual(criteria(input_ids[:, 0:3], None).tolist(), [False, False, False, False])
+
+    def test_repetition_loop_stopping_criteria_pos02(self):
+        # "да, да, да, да, да, конечно" and "нет нет нет нет нет, я не согласен" are not stopped after the repetition
+        criteria = RepetitionLoopStoppingCriteria()
+        hypotheses = [
+            [50258] + [1, 2] * 5 + [3, 4, 5, 6, 7, 8],
+            [50258] + [9] * 5 + [2, 10, 11, 12, 13]
+        ]
+        for hypothesis in hypotheses:
+            input_ids = torch.tensor([hypothesis], dtype=torch.long)
+            for length in range(1, input_ids.shape[1] + 1):
+                self.assertEqual(criteria(input_ids[:, 0:length], None).tolist(), [False])
+        # a real loop is stopped, although its period is short
+        input_ids = torch.tensor([[50258, 3, 4] + [1, 2] * 12, [50258, 3, 4] + [1, 2] * 11 + [1, 5]], dtype=torch.long)
+        self.assertEqual(criteria(input_ids, None).tolist(), [True, False])
+        with self.assertRaises(ValueError):
+            _ = RepetitionLoopStoppingCriteria(min_loop_length=0)
+
+    def test_calculate_max_new_tokens_pos01(self):
+        self.assertEqual(calculate_max_new_tokens(1.0, max_chars_per_second=20.0), 28)
+        self.assertEqual(calculate_max_new_tokens(0.0), 8)
+        self.assertEqual(calculate_max_new_tokens(3600.0), 440)
+
+    def test_recognize_sounds_pos01(self):
+        class FakeModel:
+            def can_generate(self):
+                return True
+
+        class FakeRecognizer:
+            def __init__(self):
+                self.model = FakeModel()
+                self.calls = []
+
+            def __call__(self, waveform, **kwargs):
+                self.calls.append(kwargs)
+                return {'text': ' да да да да да, спасибо за внимание спасибо за внимание спасибо за внимание'}
+
+        recognizer = FakeRecognizer()
+        res = recognize_sounds([np.zeros((16000,), dtype=np.float32)], recognizer)
+        self.assertEqual(res, ['да, спасибо за внимание'])
+        self.assertEqual(len(recognizer.calls), 1)
+        self.assertEqual(recognizer.calls[0]['generate_kwargs']['max_new_tokens'], calculate_max_new_tokens(1.0))
+        self.assertIn('stopping_criteria', recognizer.calls[0]['generate_kwargs'])
+        _ = recognize_sounds([np.zeros((16000,), dtype=np.float32)], recognizer, max_chars_per_second=None,
+                             stop_loops=False)
+        self.assertEqual(recognizer.calls[1], dict())
+
     def test_join_short_segments_to_long_ones_pos01(self):
         source_segments = [(0.5, 2.5), (2.7, 3.92), (5.0, 7.5)]
         true_segments = [(0.5, 2.5), (2.7, 3.92), (5.0, 7.5)]
@@ -375,6 +527,340 @@ class TestASR(unittest.TestCase):
         self.assertIsInstance(predicted_segments, list)
         self.assertEqual(len(predicted_segments), len(true_segments))
 
+    def test_join_short_segments_to_long_ones_pos10(self):
+        source_segments = [(0.5, 0.6), (0.7, 0.8), (0.9, 1.0)]
+        true_segments = [(0.5, 1.0)]
+        predicted_segments = join_short_segments_to_long_ones(source_segments, 1)
+        self.assertEqual(predicted_segments, true_segments)
+
+    def test_join_short_segments_to_long_ones_pos11(self):
+        source_segments = [(float(idx), idx + 0.2) for idx in range(100_000)]
+        start_time = time.perf_counter()
+        predicted_segments = join_short_segments_to_long_ones(source_segments, 1)
+        self.assertLess(time.perf_counter() - start_time, 5.0)
+        self.assertEqual(len(predicted_segments), 49_999)
+        self.assertEqual(predicted_segments[0], (0.0, 1.2))
+        self.assertEqual(predicted_segments[-1], (99_997.0, 99_999.2))
+
+    def test_calculate_frame_levels_pos01(self):
+        sound = np.zeros((1100,), dtype=np.float32)
+        sound[0:500] = 0.5
+        sound[1000:1100] = -0.1
+        levels = calculate_frame_levels(sound, 500, block_size=1000)
+        self.assertEqual(levels.shape, (3,))
+        self.assertAlmostEqual(float(levels[0]), 20.0 * np.log10(0.5), places=3)
+        self.assertLess(float(levels[1]), -100.0)
+        self.assertAlmostEqual(float(levels[2]), 20.0 * np.log10(0.1), places=3)
+
+    def test_find_channel_activity_pos01(self):
+        levels = np.array([
+            [-20.0, -20.0, -45.0, -60.0, -60.0, -60.0, -30.0],
+            [-40.0, -35.0, -20.0, -60.0, -60.0, -60.0, -32.0]
+        ], dtype=np.float32)
+        true_activity = np.array([
+            [True, True, False, False, False, False, True],
+            [False, False, True, False, False, False, True]
+        ])
+        self.assertTrue(np.array_equal(find_channel_activity(levels), true_activity))
+        true_activity_with_hangover = np.array([
+            [True, True, True, False, False, True, True],
+            [False, True, True, True, False, True, True]
+        ])
+        self.assertTrue(np.array_equal(find_channel_activity(levels, hangover=1), true_activity_with_hangover))
+
+    def test_transcribe_channels_pos01(self):
+        # the interviewer and the candidate take turns, and each of them is faintly heard in the other channel
+        class FakeModel:
+            def can_generate(self):
+                return False
+
+        class FakeRecognizer:
+            model = FakeModel()
+
+            def __call__(self, waveform, **kwargs):
+                return {'text': f' {float(np.max(np.abs(waveform))):.1f}'}
+
+        turn = self.generate_bursts(6.0)
+        pause = np.zeros_like(turn)
+        left_channel = np.concatenate((turn, pause, turn))
+        right_channel = np.concatenate((0.01 * turn, 0.6 * turn, 0.01 * turn))
+        sound = np.stack((left_channel, right_channel), axis=1)
+        vad = lambda waveform: [{'label': 'Speech', 'score': 1.0}]
+        true_texts = ['0.5', '0.3', '0.5']
+        results = transcribe_channels(sound, self.energy_segmenter, vad, FakeRecognizer(), min_segment_size=1.0,
+                                      max_segment_size=5.0, speakers=['interviewer', 'candidate'])
+        self.assertEqual([it[2] for it in results], true_texts)
+        self.assertEqual([it[3] for it in results], ['interviewer', 'candidate', 'interviewer'])
+        for idx, (start_time, end_time, text, speaker) in enumerate(results):
+            self.assertLess(start_time, end_time)
+            self.assertLessEqual(abs(start_time - 6.0 * idx), 0.5)
+            self.assertLessEqual(abs(end_time - 6.0 * (idx + 1)), 0.5)
+            if idx > 0:
+                self.assertLessEqual(results[idx - 1][1], start_time)
+        results = transcribe_channels((left_channel, float32_to_pcm(right_channel)), self.energy_segmenter, vad,
+                                      FakeRecognizer(), min_segment_size=1.0, max_segment_size=5.0)
+        self.assertEqual([it[2] for it in results], true_texts)
+        self.assertEqual([it[3] for it in results], ['SPEAKER_00', 'SPEAKER_01', 'SPEAKER_00'])
+        with self.assertRaises(ValueError):
+            _ = transcribe_channels(sound, self.energy_segmenter, vad, FakeRecognizer(), min_segment_size=1.0,
+                                    max_segment_size=5.0, speakers=['interviewer'])
+
+    def test_segment_sound_pos01(self):
+        speech = load_sound(os.path.join(os.path.dirname(__file__), 'testdata', 'mono_sound.wav'))
+        silence = np.zeros((16000 * 10,), dtype=np.float32)
+        sound = np.concatenate((silence, speech, silence, speech, silence))
+        segmenter_inputs = []
+
+        def segmenter(waveform, return_timestamps):
+            self.assertEqual(return_timestamps, 'word')
+            segmenter_inputs.append(waveform.shape[0])
+            duration = waveform.shape[0] / 16000.0
+            return {'text': 'a b', 'chunks': [{'text': 'a', 'timestamp': (0.0, 1.0)},
+                                              {'text': 'b', 'timestamp': (duration - 1.0, duration)}]}
+
+        segments = segment_sound(sound, segmenter, min_segment_size=1.0, max_segment_size=5.0,
+                                 indent_for_silence=0.0, min_silence=2.0)
+        self.assertEqual(len(segmenter_inputs), 2)
+        self.assertLess(sum(segmenter_inputs), sound.shape[0] // 2)
+        self.assertEqual(len(segments), 4)
+        speech_duration = speech.shape[0] / 16000.0
+        self.assertLessEqual(segments[0][0], 10.0)
+        self.assertGreater(segments[0][0], 9.0)
+        self.assertGreaterEqual(segments[1][1], 10.0 + speech_duration)
+        self.assertLess(segments[1][1], 11.0 + speech_duration)
+        self.assertLessEqual(segments[2][0], 20.0 + speech_duration)
+        self.assertGreater(segments[2][0], 19.0 + speech_duration)
+        self.assertGreaterEqual(segments[3][1], 20.0 + 2 * speech_duration)
+        self.assertLess(segments[3][1], 21.0 + 2 * speech_duration)
+
+    def test_snap_segments_to_speech_pos01(self):
+        probabilities = np.zeros((800,), dtype=np.float32)
+        probabilities[160:320] = 1.0  # speech from 1.6 to 3.22 seconds
+        probabilities[480:640] = 1.0  # speech from 4.8 to 6.42 seconds
+        segments = [(1.7, 3.1), (4.75, 6.0), (7.5, 7.8)]
+        true_segments = [(1.5, 3.32), (4.65, 6.5), (7.4, 7.9)]
+        snapped_segments = snap_segments_to_speech(segments, probabilities, indent_for_silence=0.5, speech_guard=0.1)
+        self.assertEqual(len(snapped_segments), len(true_segments))
+        for idx in range(len(true_segments)):
+            self.assertAlmostEqual(snapped_segments[idx][0], true_segments[idx][0], msg=f'Segment {idx} is wrong!')
+            self.assertAlmostEqual(snapped_segments[idx][1], true_segments[idx][1], msg=f'Segment {idx} is wrong!')
+
+    def test_segment_table_pos01(self):
+        segments = SegmentTable.from_list([(-0.5, 2.0), (1.5, 3.0), (2.5, 4.0), (5.0, 7.0)])
+        self.assertEqual(len(segments), 4)
+        self.assertEqual(segments.flags.tolist(), [0, 0, 0, 0])
+        self.assertTrue(np.all(np.isnan(segments.scores)))
+        resolved_segments = segments.clip(6.0).resolve_overlaps()
+        self.assertEqual(resolved_segments.to_list(), [(0.0, 1.75), (1.75, 2.75), (2.75, 4.0), (5.0, 6.0)])
+        self.assertEqual(list(resolved_segments), resolved_segments.to_list())
+        self.assertEqual(resolved_segments[1], (1.75, 2.75))
+        self.assertEqual(resolved_segments.to_samples(90_000).tolist(),
+                         [[0, 28_000], [28_000, 44_000], [44_000, 64_000], [80_000, 90_000]])
+        statistics = resolved_segments.describe()
+        self.assertEqual(statistics['min_segment_idx'], 1)
+        self.assertAlmostEqual(statistics['min'], 1.0)
+        self.assertAlmostEqual(statistics['max'], 1.75)
+        self.assertAlmostEqual(statistics['median'], 1.25)
+        self.assertAlmostEqual(statistics['mean'], 1.25)
+        speech_segments = resolved_segments.select(np.array([True, False, True, False]))
+        self.assertEqual(speech_segments.to_list(), [(0.0, 1.75), (2.75, 4.0)])
+
+    def test_segment_table_pos02(self):
+        segments = SegmentTable.from_list([])
+        self.assertEqual(len(segments), 0)
+        self.assertEqual(segments.clip(1.0).resolve_overlaps().to_list(), [])
+        self.assertEqual(segments.to_samples(16000).shape, (0, 2))
+
+    def test_segment_table_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = SegmentTable(np.array([0.0, 1.0]), np.array([0.5]))
+        with self.assertRaises(ValueError):
+            _ = SegmentTable(np.array([0.0, 1.0]), np.array([0.5, 1.5]), flags=np.array([1], dtype=np.uint8))
+
+    @staticmethod
+    def energy_segmenter(waveform, return_timestamps):
+        # each run of loud 10-ms frames is a "word"
+        n_frames = waveform.shape[0] // 160
+        is_loud = np.abs(waveform[0:(n_frames * 160)]).reshape((n_frames, 160)).max(axis=1) > 0.1
+        changes = np.diff(np.concatenate(([0], is_loud.astype(np.int8), [0])))
+        starts = np.flatnonzero(changes == 1) * 0.01
+        ends = np.flatnonzero(changes == -1) * 0.01
+        return {'text': '', 'chunks': [{'text': 'a', 'timestamp': (float(start), float(end))}
+                                       for start, end in zip(starts, ends)]}
+
+    @staticmethod
+    def generate_bursts(duration: float) -> np.ndarray:
+        sound = np.zeros((round(duration * 16000),), dtype=np.float32)
+        for burst_idx in range(int(duration / 0.77)):
+            burst_start = round((burst_idx * 0.77 + 0.1) * 16000)
+            burst_length = round((0.2 + 0.02 * ((7 * burst_idx) % 11)) * 16000)  # pauses vary from burst to burst
+            sound[burst_start:(burst_start + burst_length)] = 0.5
+        return sound
+
+    def test_find_word_bounds_streaming_pos01(self):
+        sound = self.generate_bursts(20.0)
+        true_words = [it['timestamp'] for it in self.energy_segmenter(sound, 'word')['chunks']]
+        pcm = float32_to_pcm(sound)
+        blocks = [(block_start, pcm[block_start:(block_start + 11_200)])
+                  for block_start in range(0, pcm.shape[0], 11_200)]
+        words, sound_length = find_word_bounds_streaming(blocks, self.energy_segmenter, window_duration=3.0,
+                                                         overlap_duration=1.0)
+        self.assertEqual(sound_length, pcm.shape[0])
+        self.assertEqual(len(words), len(true_words))
+        for (true_start, true_end), (start, end) in zip(true_words, words):
+            self.assertAlmostEqual(start, true_start)
+            self.assertAlmostEqual(end, true_end)
+
+    def test_find_word_bounds_streaming_pos02(self):
+        # word timestamps depend on the context, so a word near the cut point is shifted in neighbouring windows
+        true_words = [(1.03, 1.3), (5.01, 5.3), (7.97, 8.3), (9.5, 11.2)]
+        sound = np.zeros((16000 * 12,), dtype=np.float32)
+        for word_start, word_end in true_words:
+            sound[round(word_start * 16000):round(word_end * 16000)] = 0.5
+        pcm = float32_to_pcm(sound)
+        blocks = [(block_start, pcm[block_start:(block_start + 16000)])
+                  for block_start in range(0, pcm.shape[0], 16000)]
+        for jitter in [0.03, -0.03]:
+            def jittering_segmenter(waveform, return_timestamps):
+                output = self.energy_segmenter(waveform, return_timestamps)
+                middle = waveform.shape[0] / 32000.0
+                for it in output['chunks']:
+                    shift = jitter if it['timestamp'][0] < middle else -jitter
+                    it['timestamp'] = (it['timestamp'][0] + shift, it['timestamp'][1])
+                return output
+
+            words, sound_length = find_word_bounds_streaming(blocks, jittering_segmenter, window_duration=6.0,
+                                                             overlap_duration=2.0)
+            self.assertEqual(sound_length, pcm.shape[0])
+            self.assertEqual(len(words), len(true_words), msg=f'jitter = {jitter}, words = {words}')
+            for (true_start, true_end), (start, end) in zip(true_words, words):
+                self.assertAlmostEqual(start, true_start, delta=0.035)
+                self.assertAlmostEqual(end, true_end, delta=0.01)
+            for idx in range(1, len(words)):
+                self.assertLessEqual(words[idx - 1][1], words[idx][0])
+
+    def test_find_word_bounds_streaming_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = find_word_bounds_streaming([(0, np.zeros((16000,), dtype=np.int16))], self.energy_segmenter,
+                                           window_duration=3.0, overlap_duration=3.0)
+        with self.assertRaises(ValueError):
+            _ = find_word_bounds_streaming([(0, np.zeros((16000,), dtype=np.int16)),
+                                            (8000, np.zeros((16000,), dtype=np.int16))], self.energy_segmenter)
+
+    def test_segment_sound_streaming_pos01(self):
+        sound = self.generate_bursts(30.0)
+        wav_file = io.BytesIO()
+        with wave.open(wav_file, 'wb') as wav_writer:
+            wav_writer.setnchannels(1)
+            wav_writer.setsampwidth(2)
+            wav_writer.setframerate(16000)
+            wav_writer.writeframes(float32_to_pcm(sound).tobytes())
+        wav_file.seek(0)
+        segments = segment_sound_streaming(wav_file, self.energy_segmenter, min_segment_size=1.0,
+                                           max_segment_size=5.0, indent_for_silence=0.1, window_duration=7.0,
+                                           overlap_duration=2.0, block_duration=1.5, max_prefetched=1)
+        true_segments = segment_sound(float32_to_pcm(sound).astype(np.float32) / 32768.0, self.energy_segmenter,
+                                      min_segment_size=1.0, max_segment_size=5.0, indent_for_silence=0.1)
+        self.assertIsInstance(segments, SegmentTable)
+        self.assertGreater(len(segments), 1)
+        self.assertEqual(len(segments), len(true_segments))
+        self.assertTrue(np.allclose(segments.starts, true_segments.starts))
+        self.assertTrue(np.allclose(segments.ends, true_segments.ends))
+
+    def test_segment_sound_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = segment_sound(np.zeros((16000,), dtype=np.float32), lambda *args, **kwargs: None,
+                              min_segment_size=1.0, max_segment_size=5.0, min_silence=0.0)
+
+    def test_find_word_bounds_pos01(self):
+        sound = AudioBuffer(float32_to_pcm(load_sound(os.path.join(os.path.dirname(__file__), 'testdata',
+                                                                   'mono_sound.wav'))))
+        segmenter = VADSegmenter()
+        true_words = [it['timestamp'] for it in segmenter(as_waveform(sound), return_timestamps='word')['chunks']]
+        self.assertGreater(len(true_words), 0)
+        # the AudioBuffer is passed to the VAD-based segmenter without the float32 copy of the whole sound
+        with mock.patch('asr.asr.as_waveform', side_effect=as_waveform) as conversion:
+            words = find_word_bounds(sound, segmenter)
+        conversion.assert_not_called()
+        self.assertEqual(words, true_words)
+        segmenter_inputs = []
+
+        def wav2vec2_segmenter(waveform, return_timestamps):
+            segmenter_inputs.append(waveform)
+            return self.energy_segmenter(waveform, return_timestamps)
+
+        words = find_word_bounds(sound, wav2vec2_segmenter)
+        self.assertEqual(len(segmenter_inputs), 1)
+        self.assertIsInstance(segmenter_inputs[0], np.ndarray)
+        self.assertEqual(segmenter_inputs[0].dtype, np.float32)
+        true_words = [it['timestamp'] for it in self.energy_segmenter(segmenter_inputs[0], 'word')['chunks']]
+        self.assertEqual(words, true_words)
+
+    def test_find_shard_bounds_pos01(self):
+        speech = load_sound(os.path.join(os.path.dirname(__file__), 'testdata', 'mono_sound.wav'))
+        sound = np.concatenate((speech, np.zeros((16000,), dtype=np.float32), speech))
+        bounds_of_shards = find_shard_bounds(sound, max_shard_size=5.0)
+        self.assertIsInstance(bounds_of_shards, np.ndarray)
+        self.assertEqual(bounds_of_shards.dtype, np.int64)
+        self.assertGreater(bounds_of_shards.shape[0], 3)
+        self.assertEqual(int(bounds_of_shards[0, 0]), 0)
+        self.assertEqual(int(bounds_of_shards[-1, 1]), sound.shape[0])
+        self.assertTrue(np.array_equal(bounds_of_shards[1:, 0], bounds_of_shards[:-1, 1]))
+        self.assertTrue(np.all((bounds_of_shards[:, 1] - bounds_of_shards[:, 0]) > 1600))
+        self.assertTrue(np.all((bounds_of_shards[:, 1] - bounds_of_shards[:, 0]) <= 5 * 16000 + 480))
+
+    def test_transcribe_sharded_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = transcribe_sharded(np.zeros((16000,), dtype=np.float32), min_segment_size=1.0, max_segment_size=5.0,
+                                   n_processes=0)
+        with self.assertRaises(ValueError):
+            _ = transcribe_sharded(np.zeros((16000,), dtype=np.float32), min_segment_size=1.0, max_segment_size=5.0,
+                                   n_processes=2, devices=['cpu'])
+
+    def test_transcribe_sharded_pos01(self):
+        # the shards are transcribed in this process by stub models instead of the process pool
+        class FakeModel:
+            def can_generate(self):
+                return False
+
+        class FakeRecognizer:
+            model = FakeModel()
+
+            def __call__(self, waveform, **kwargs):
+                return {'text': f' {waveform.shape[0]}'}
+
+        sound = float32_to_pcm(self.generate_bursts(60.0))
+        bounds_of_shards = find_shard_bounds(sound, max_shard_size=10.0)
+        self.assertGreater(bounds_of_shards.shape[0], 1)
+        self.assertEqual(int(bounds_of_shards[0, 0]), 0)
+        self.assertEqual(int(bounds_of_shards[-1, 1]), sound.shape[0])
+        self.assertTrue(np.array_equal(bounds_of_shards[1:, 0], bounds_of_shards[:-1, 1]))
+        self.assertTrue(np.all(bounds_of_shards[:, 1] > bounds_of_shards[:, 0]))
+        fake_models = {'segmenter': self.energy_segmenter, 'vad': lambda waveform: [{'label': 'Speech', 'score': 1.0}],
+                       'asr': FakeRecognizer()}
+        with mock.patch.dict('asr.asr._shard_worker_models', fake_models):
+            shard_results = [(shard_start, _transcribe_shard(sound[shard_start:shard_end], 1.0, 5.0, None, None, None))
+                             for shard_start, shard_end in bounds_of_shards.tolist()]
+        results = merge_shard_results(list(reversed(shard_results)))
+        self.assertGreater(len(results), bounds_of_shards.shape[0])
+        self.assertEqual(len(results), sum(len(it[1]) for it in shard_results))
+        for idx, (start_time, end_time, text) in enumerate(results):
+            self.assertLess(start_time, end_time)
+            self.assertAlmostEqual(int(text), round((end_time - start_time) * 16000), delta=1)
+            if idx > 0:
+                self.assertLessEqual(results[idx - 1][1], start_time)
+        for shard_start, cur_results in shard_results:
+            shard_offset = shard_start / 16000.0
+            self.assertIn((cur_results[0][0] + shard_offset, cur_results[0][1] + shard_offset, cur_results[0][2]),
+                          results)
+
+    def test_select_shard_devices_pos01(self):
+        devices = select_shard_devices(3)
+        if torch.cuda.is_available():
+            self.assertEqual(devices, [f'cuda:{idx}' for idx in range(min(3, torch.cuda.device_count()))])
+        else:
+            self.assertEqual(devices, ['cpu', 'cpu', 'cpu'])
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
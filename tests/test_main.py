@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+# the diarization depends on pyannote.audio, which is replaced with a stub, because the diarization is not run here
+with mock.patch.dict(sys.modules, {'diarization': types.SimpleNamespace(perform_diarization=None)}):
+    try:
+        import main
+    except:
+        sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+        import main
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.initial_dir = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.initial_dir)
+        self.temp_dir.cleanup()
+
+    def run_pipeline(self, split_channels):
+        argv_of_transcription = []
+        with mock.patch.object(main, 'perform_transcribation',
+                               side_effect=lambda: argv_of_transcription.extend(sys.argv)) as transcription, \
+                mock.patch.object(main, 'perform_diarization') as diarization, \
+                mock.patch.object(main, 'process_speaker_segments'), \
+                mock.patch.object(main, 'convert_diarization_file'), \
+                mock.patch.object(sys, 'argv', list(sys.argv)):
+            main.main('interview.mp3', 'models/ru', enable_diarization=True, enable_postprocessing=False,
+                      cache_dir='cache', split_channels=split_channels)
+        transcription.assert_called_once()
+        return argv_of_transcription, diarization
+
+    def test_main_pos01(self):
+        argv_of_transcription, diarization = self.run_pipeline(split_channels=True)
+        self.assertIn('--split_channels', argv_of_transcription)
+        diarization.assert_not_called()
+
+    def test_main_pos02(self):
+        argv_of_transcription, diarization = self.run_pipeline(split_channels=False)
+        self.assertNotIn('--split_channels', argv_of_transcription)
+        diarization.assert_called_once_with('interview.mp3', os.path.join('results', 'diarization',
+                                                                          'interview_diarization_raw.txt'), 'cache')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
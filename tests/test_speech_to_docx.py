@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from docx import Document
+
+try:
+    import speech_to_docx
+    from wav_io.wav_io import AudioInfo
+except:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    import speech_to_docx
+    from wav_io.wav_io import AudioInfo
+
+
+class TestSpeechToDocx(unittest.TestCase):
+    def setUp(self):
+        self.input_name = os.path.join(os.path.dirname(__file__), 'testdata', 'stereo_sound.wav')
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_name = os.path.join(self.temp_dir.name, 'stereo_sound.docx')
+        # the models are not loaded, because the transcription itself is replaced with stubs
+        self.model_patchers = [
+            mock.patch('speech_to_docx.initialize_segmenter', return_value=None),
+            mock.patch('speech_to_docx.initialize_model_for_speech_classification', return_value=None),
+            mock.patch('speech_to_docx.initialize_model_for_speech_recognition', return_value=None)
+        ]
+        for it in self.model_patchers:
+            it.start()
+
+    def tearDown(self):
+        for it in self.model_patchers:
+            it.stop()
+        self.temp_dir.cleanup()
+
+    def transcribe(self, sound_info, split_channels):
+        argv = ['speech_to_docx.py', '-i', self.input_name, '-o', self.output_name]
+        if split_channels:
+            argv.append('--split_channels')
+        if isinstance(sound_info, BaseException):
+            probe_patcher = mock.patch('speech_to_docx.probe_audio', side_effect=sound_info)
+        else:
+            probe_patcher = mock.patch('speech_to_docx.probe_audio', return_value=sound_info)
+        with mock.patch.object(sys, 'argv', argv), probe_patcher, \
+                mock.patch('speech_to_docx.transcribe', return_value=[(0.5, 1.5, 'mixed')]) as transcribe, \
+                mock.patch('speech_to_docx.transcribe_channels',
+                           return_value=[(0.5, 1.5, 'hello', 'SPEAKER_00'),
+                                         (2.0, 3.0, 'hi', 'SPEAKER_01')]) as transcribe_channels:
+            speech_to_docx.perform_transcribation()
+        lines = [it.text for it in Document(self.output_name).paragraphs if len(it.text) > 0]
+        return transcribe, transcribe_channels, lines
+
+    def test_split_channels_pos01(self):
+        transcribe, transcribe_channels, lines = self.transcribe(AudioInfo(None, 2, 16000, 'pcm_s16le', 'wav'),
+                                                                 split_channels=True)
+        transcribe.assert_not_called()
+        transcribe_channels.assert_called_once()
+        channels = transcribe_channels.call_args[0][0]
+        self.assertEqual(len(channels.shape), 2)
+        self.assertEqual(channels.shape[1], 2)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith(' - SPEAKER_00: hello'))
+        self.assertTrue(lines[1].endswith(' - SPEAKER_01: hi'))
+
+    def test_split_channels_pos02(self):
+        transcribe, transcribe_channels, lines = self.transcribe(AudioInfo(None, 2, 16000, 'pcm_s16le', 'wav'),
+                                                                 split_channels=False)
+        transcribe.assert_called_once()
+        transcribe_channels.assert_not_called()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith(' - mixed'))
+
+    def test_split_channels_neg01(self):
+        # a mono sound and a sound, which cannot be probed, are not split into channels
+        for sound_info in [AudioInfo(None, 1, 16000, 'pcm_s16le', 'wav'), IOError('ffprobe is not found')]:
+            transcribe, transcribe_channels, lines = self.transcribe(sound_info, split_channels=True)
+            transcribe.assert_called_once()
+            transcribe_channels.assert_not_called()
+            self.assertEqual(len(lines), 1)
+            self.assertTrue(lines[0].endswith(' - mixed'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
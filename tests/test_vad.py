@@ -8,12 +8,20 @@ from webrtcvad import Vad
 try:
     from vad.vad import sound_to_bytes, calculate_voice_probabilities, split_long_sound
     from vad.vad import stick_subsounds, stick_short_subsounds_to_longer_neighbours
-    from wav_io.wav_io import load_sound
+    from vad.vad import sound_to_pcm, initialize_vad_ensemble, find_speech_regions, VADSegmenter
+    from vad.vad import StreamingVAD
+    from vad.vad import split_long_sound_bounds, iter_subsounds, stick_bounds, stick_short_bounds_to_longer_neighbours
+    from vad.vad import compress_pauses, map_to_original, find_speech_run_bounds
+    from wav_io.wav_io import load_sound, AudioBuffer
 except:
     sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
     from vad.vad import sound_to_bytes, calculate_voice_probabilities, split_long_sound
     from vad.vad import stick_subsounds, stick_short_subsounds_to_longer_neighbours
-    from wav_io.wav_io import load_sound
+    from vad.vad import sound_to_pcm, initialize_vad_ensemble, find_speech_regions, VADSegmenter
+    from vad.vad import StreamingVAD
+    from vad.vad import split_long_sound_bounds, iter_subsounds, stick_bounds, stick_short_bounds_to_longer_neighbours
+    from vad.vad import compress_pauses, map_to_original, find_speech_run_bounds
+    from wav_io.wav_io import load_sound, AudioBuffer
 
 
 def find_subarray(full_array: np.ndarray, sub_array: np.ndarray, start_pos: int) -> int:
@@ -62,6 +70,150 @@ class TestVAD(unittest.TestCase):
         self.assertGreaterEqual(np.min(probabilities), 0.0)
         self.assertGreater(np.max(probabilities), np.min(probabilities))
 
+    def test_sound_pos02(self):
+        true_probabilities = np.zeros(((self.sound.shape[0] - 480) // 160 + 1,), dtype=np.float32)
+        for window_idx in range(true_probabilities.shape[0]):
+            buffer = sound_to_bytes(self.sound[(window_idx * 160):(window_idx * 160 + 480)])
+            for cur_vad in self.vad_ensemble:
+                true_probabilities[window_idx] += (1.0 if cur_vad.is_speech(buffer, 16_000) else 0.0)
+            true_probabilities[window_idx] /= float(len(self.vad_ensemble))
+        probabilities = calculate_voice_probabilities(self.sound, initialize_vad_ensemble())
+        self.assertTrue(np.array_equal(probabilities, true_probabilities))
+        probabilities = calculate_voice_probabilities(AudioBuffer(sound_to_pcm(self.sound)), n_processes=2)
+        self.assertTrue(np.array_equal(probabilities, true_probabilities))
+
+    def test_sound_to_pcm_pos01(self):
+        input_sound = np.array([0.0, 0.5, -0.5, 0.99999, -1.0, 1e-5], dtype=np.float32)
+        self.assertEqual(sound_to_pcm(np.tile(input_sound, 80)).tobytes(), sound_to_bytes(np.tile(input_sound, 80)))
+
+    def test_find_speech_regions_pos01(self):
+        probabilities = np.zeros((320,), dtype=np.float32)
+        probabilities[0:10] = 1.0
+        probabilities[310:320] = 0.75
+        sound_length = 319 * 160 + 480
+        self.assertEqual(find_speech_regions(probabilities, sound_length, min_silence_length=16000, padding=1600),
+                         [(0, 3520), (48000, sound_length)])
+        self.assertEqual(find_speech_regions(probabilities, sound_length, min_silence_length=48000, padding=1600),
+                         [(0, sound_length)])
+        self.assertEqual(find_speech_regions(probabilities, sound_length, min_silence_length=16000,
+                                             max_silence_probability=0.75),
+                         [(0, 1920)])
+
+    def test_find_speech_regions_pos02(self):
+        probabilities = np.zeros((210,), dtype=np.float32)
+        probabilities[200:210] = 0.5
+        sound_length = 209 * 160 + 480
+        self.assertEqual(find_speech_regions(probabilities, sound_length, min_silence_length=16000),
+                         [(32000, sound_length)])
+        self.assertEqual(find_speech_regions(probabilities, sound_length, min_silence_length=16000, padding=800),
+                         [(31200, sound_length)])
+        self.assertEqual(find_speech_regions(np.zeros((210,), dtype=np.float32), sound_length, 16000), [])
+
+    def test_vad_segmenter_pos01(self):
+        silence = np.zeros((16000 * 3,), dtype=np.float32)
+        sound = np.concatenate((silence, self.sound, silence))
+        output = VADSegmenter(max_island_duration=1.0)(sound, return_timestamps='word')
+        self.assertIsInstance(output, dict)
+        self.assertIn('chunks', output)
+        self.assertGreater(len(output['chunks']), 1)
+        prev_end = 0.0
+        for it in output['chunks']:
+            self.assertEqual(it['text'], '')
+            island_start, island_end = it['timestamp']
+            self.assertGreaterEqual(island_start, prev_end)
+            self.assertGreater(island_end, island_start)
+            self.assertLessEqual(island_end - island_start, 1.0 + 1e-6)
+            prev_end = island_end
+        self.assertGreaterEqual(output['chunks'][0]['timestamp'][0], 3.0 - 0.03)
+        self.assertLessEqual(output['chunks'][-1]['timestamp'][1], 3.0 + self.sound.shape[0] / 16000.0 + 0.03)
+
+    def test_vad_segmenter_pos02(self):
+        self.assertEqual(VADSegmenter()(self.silence)['chunks'], [])
+
+    def test_vad_segmenter_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = VADSegmenter(max_silence_probability=1.0)
+        with self.assertRaises(ValueError):
+            _ = VADSegmenter()(self.sound, return_timestamps=True)
+
+    def test_streaming_vad_pos01(self):
+        silence = np.zeros((16000 * 3,), dtype=np.float32)
+        sound = np.concatenate((silence, self.sound, silence, self.sound, silence))
+        true_probabilities = calculate_voice_probabilities(sound)
+        true_segments = [(it[0] / 16000.0, it[1] / 16000.0)
+                         for it in find_speech_regions(true_probabilities, sound.shape[0], min_silence_length=8000,
+                                                             max_silence_probability=0.5)]
+        streaming_vad = StreamingVAD(min_silence=0.5)
+        probabilities = []
+        segments = []
+        chunk_sizes = [1, 479, 100, 5000, 160, 161, 32000]
+        chunk_start = 0
+        chunk_idx = 0
+        while chunk_start < sound.shape[0]:
+            chunk_end = min(sound.shape[0], chunk_start + chunk_sizes[chunk_idx % len(chunk_sizes)])
+            new_probabilities, new_segments = streaming_vad.push(sound[chunk_start:chunk_end])
+            self.assertLess(streaming_vad.tail.shape[0], 480)
+            probabilities.append(new_probabilities)
+            segments += new_segments
+            chunk_start = chunk_end
+            chunk_idx += 1
+        self.assertAlmostEqual(streaming_vad.duration, sound.shape[0] / 16000.0)
+        self.assertEqual(streaming_vad.flush(), [])
+        self.assertTrue(np.array_equal(np.concatenate(probabilities), true_probabilities))
+        self.assertGreater(len(true_segments), 1)
+        self.assertEqual(segments, true_segments)
+
+    def test_streaming_vad_pos02(self):
+        streaming_vad = StreamingVAD()
+        probabilities, segments = streaming_vad.push(sound_to_pcm(self.sound).tobytes())
+        self.assertTrue(np.array_equal(probabilities, calculate_voice_probabilities(self.sound)))
+        self.assertEqual(segments, [])
+        segments = streaming_vad.flush()
+        self.assertEqual(len(segments), 1)
+        self.assertLess(segments[0][0], segments[0][1])
+        self.assertLessEqual(segments[0][1], self.sound.shape[0] / 16000.0)
+        self.assertEqual(streaming_vad.duration, 0.0)
+
+    def test_streaming_vad_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = StreamingVAD(min_silence=0.0)
+        with self.assertRaises(ValueError):
+            _ = StreamingVAD().push(b'\x00\x00\x00')
+
+    def test_find_speech_run_bounds_pos01(self):
+        probabilities = np.zeros((50,), dtype=np.float32)
+        probabilities[10:30] = 0.5
+        probabilities[40:42] = 0.25
+        starts, ends = find_speech_run_bounds(probabilities, np.array([2000, 500, 4900, 5200, 6500, 100000]))
+        self.assertEqual(starts.tolist(), [1600, 500, 1600, 5200, 6500, 100000])
+        self.assertEqual(ends.tolist(), [5120, 500, 5120, 5200, 6500, 100000])
+        starts, ends = find_speech_run_bounds(probabilities, np.array([6500]), max_silence_probability=0.0)
+        self.assertEqual(starts.tolist(), [6400])
+        self.assertEqual(ends.tolist(), [6400 + 160 + 480])
+
+    def test_compress_pauses_pos01(self):
+        silence = np.zeros((16000 * 2,), dtype=np.float32)
+        sound = np.concatenate((silence, self.sound, silence, self.sound, silence))
+        compressed_sound, remapping_table = compress_pauses(sound, max_pause_length=8000)
+        self.assertIsInstance(compressed_sound, np.ndarray)
+        self.assertLess(compressed_sound.shape[0], sound.shape[0] - 4 * 16000)
+        self.assertEqual(remapping_table.dtype, np.int64)
+        self.assertEqual(remapping_table.shape[1], 2)
+        self.assertEqual(int(remapping_table[0, 0]), 0)
+        self.assertTrue(np.all(np.diff(remapping_table[:, 0]) > 0))
+        self.assertTrue(np.all(np.diff(remapping_table[:, 1]) > 0))
+        positions = np.arange(0, compressed_sound.shape[0], 997)
+        original_positions = map_to_original(positions, remapping_table)
+        self.assertTrue(np.array_equal(compressed_sound[positions], sound[original_positions]))
+        self.assertEqual(map_to_original(int(positions[-1]), remapping_table), int(original_positions[-1]))
+
+    def test_compress_pauses_pos02(self):
+        buffer = AudioBuffer(sound_to_pcm(self.sound))
+        compressed_sound, remapping_table = compress_pauses(buffer, max_pause_length=16000 * 5)
+        self.assertIs(compressed_sound, buffer)
+        self.assertEqual(remapping_table.tolist(), [[0, 0]])
+        self.assertEqual(map_to_original(12345, remapping_table), 12345)
+
     def test_sound_to_bytes_pos01(self):
         input_sound = np.zeros((480,), dtype=np.float32)
         target_bytes = b'\x00\x00' * 480
@@ -110,6 +262,20 @@ class TestVAD(unittest.TestCase):
                              msg=f'Subsound {idx} does not correspond to its bounds!')
             start_pos = found_idx + cur.shape[0] - 1000
 
+    def test_split_long_sound_bounds(self):
+        subsounds, bounds_of_subsounds = split_long_sound(self.sound, initialize_vad_ensemble(), 3 * 16_000)
+        res = split_long_sound_bounds(self.sound, initialize_vad_ensemble(), 3 * 16_000)
+        self.assertIsInstance(res, np.ndarray)
+        self.assertEqual(res.dtype, np.int64)
+        self.assertEqual(res.tolist(), [list(it) for it in bounds_of_subsounds])
+        for idx, cur in enumerate(iter_subsounds(self.sound, res)):
+            self.assertTrue(np.shares_memory(cur, self.sound))
+            self.assertTrue(np.array_equal(cur, subsounds[idx]))
+        buffer = AudioBuffer(sound_to_pcm(self.sound))
+        for idx, cur in enumerate(iter_subsounds(buffer, res)):
+            self.assertIsInstance(cur, AudioBuffer)
+            self.assertEqual(cur.shape, subsounds[idx].shape)
+
     def test_stick_subsounds_pos01(self):
         lengths = [3200, 800, 2200, 400, 650, 1800, 16000]
         bounds_of_subsounds = [
@@ -197,6 +363,41 @@ class TestVAD(unittest.TestCase):
             self.assertEqual(res[0][idx].shape, true_subsounds[idx].shape)
             self.assertLess(np.max(np.abs(res[0][idx] - true_subsounds[idx])), 1e-5)
 
+    def test_stick_short_bounds_to_longer_neighbours_pos01(self):
+        bounds_of_subsounds = np.array([
+            (0, 3200),
+            (3000, 3800),
+            (3750, 5950),
+            (5900, 6300),
+            (6290, 6940),
+            (6800, 8600),
+            (8500, 24500)
+        ], dtype=np.int64)
+        true_bounds_of_subsounds = [
+            (0, 3200),
+            (3000, 5950),
+            (5900, 8600),
+            (8500, 24500)
+        ]
+        res = stick_short_bounds_to_longer_neighbours(bounds_of_subsounds)
+        self.assertIsInstance(res, np.ndarray)
+        self.assertEqual(res.dtype, np.int64)
+        self.assertEqual([tuple(it) for it in res.tolist()], true_bounds_of_subsounds)
+        self.assertEqual(stick_bounds(bounds_of_subsounds, (1, 3)), (3000, 5950))
+
+    def test_stick_short_bounds_to_longer_neighbours_pos02(self):
+        source_sound = np.random.normal(loc=0.0, scale=0.1, size=(16_000 * 4,)).astype(np.float32)
+        bounds_of_subsounds = split_long_sound_bounds(source_sound, initialize_vad_ensemble(), 4000)
+        subsounds = [source_sound[it[0]:it[1]] for it in bounds_of_subsounds]
+        new_subsounds, true_bounds_of_subsounds = stick_short_subsounds_to_longer_neighbours(
+            subsounds,
+            [(int(it[0]), int(it[1])) for it in bounds_of_subsounds]
+        )
+        res = stick_short_bounds_to_longer_neighbours(bounds_of_subsounds)
+        self.assertEqual([tuple(it) for it in res.tolist()], true_bounds_of_subsounds)
+        for idx, cur in enumerate(iter_subsounds(source_sound, res)):
+            self.assertTrue(np.array_equal(cur, new_subsounds[idx]))
+
     def test_stick_short_subsounds_to_longer_neighbours_pos02(self):
         lengths = [3200, 2950, 2700, 16000]
         bounds_of_subsounds = [
@@ -1,16 +1,31 @@
+import io
 import os
 import re
+import shutil
+import struct
+import subprocess
 import sys
 import unittest
+from unittest import mock
 import tempfile
 
 import numpy as np
 
 try:
     from wav_io.wav_io import load_sound, transform_to_wavpcm
+    from wav_io.wav_io import read_wav_header, pcm_to_float32, downmix_to_mono
+    from wav_io.wav_io import decode_audio, AudioCache, AudioBuffer, float32_to_pcm
+    from wav_io.wav_io import convert_wav, decode_pcm_frames, resample_sound, PolyphaseResampler
+    from wav_io.wav_io import probe_audio, AudioInfo, iter_sound_blocks, decode_audio_batch
+    from wav_io.wav_io import prefetch_sound_blocks, FFMPEG_EXECUTABLE
 except:
     sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
     from wav_io.wav_io import load_sound, transform_to_wavpcm
+    from wav_io.wav_io import read_wav_header, pcm_to_float32, downmix_to_mono
+    from wav_io.wav_io import decode_audio, AudioCache, AudioBuffer, float32_to_pcm
+    from wav_io.wav_io import convert_wav, decode_pcm_frames, resample_sound, PolyphaseResampler
+    from wav_io.wav_io import probe_audio, AudioInfo, iter_sound_blocks, decode_audio_batch
+    from wav_io.wav_io import prefetch_sound_blocks, FFMPEG_EXECUTABLE
 
 
 class TestWavIO(unittest.TestCase):
@@ -25,11 +40,15 @@ class TestWavIO(unittest.TestCase):
         self.not_sound = os.path.join(os.path.dirname(__file__), 'testdata', 'notsound.wav')
         with tempfile.NamedTemporaryFile(mode='wb', delete=False) as fp:
             self.tmp_fname = fp.name
+        self.tmp_dirname = tempfile.mkdtemp()
 
     def tearDown(self) -> None:
         if hasattr(self, 'tmp_fname'):
             if os.path.isfile(self.tmp_fname):
                 os.remove(self.tmp_fname)
+        if hasattr(self, 'tmp_dirname'):
+            if os.path.isdir(self.tmp_dirname):
+                shutil.rmtree(self.tmp_dirname)
 
     def test_load_mono(self):
         loaded = load_sound(self.mono_fname)
@@ -68,6 +87,258 @@ class TestWavIO(unittest.TestCase):
         eps = np.max(np.abs(mono)) / 500.0
         self.assertLess(np.max(np.abs(mono - (stereo[0] + stereo[1]) / 2.0)), eps)
 
+    def test_load_mono_mmap(self):
+        loaded = load_sound(self.mono_fname, use_mmap=True)
+        self.assertIsInstance(loaded, np.memmap)
+        self.assertEqual(loaded.dtype, np.int16)
+        self.assertEqual(len(loaded.shape), 1)
+        true_sound = load_sound(self.mono_fname)
+        self.assertEqual(loaded.shape, true_sound.shape)
+        self.assertTrue(np.array_equal(pcm_to_float32(loaded[1000:5000]), true_sound[1000:5000]))
+
+    def test_load_stereo_mmap(self):
+        loaded = load_sound(self.stereo_fname, use_mmap=True)
+        self.assertIsInstance(loaded, tuple)
+        self.assertEqual(len(loaded), 2)
+        true_sound = load_sound(self.stereo_fname)
+        for channel_idx in range(2):
+            self.assertEqual(loaded[channel_idx].dtype, np.int16)
+            self.assertEqual(loaded[channel_idx].shape, true_sound[channel_idx].shape)
+            self.assertTrue(np.array_equal(pcm_to_float32(loaded[channel_idx]), true_sound[channel_idx]))
+
+    def test_downmix_to_mono(self):
+        stereo = load_sound(self.stereo_fname)
+        true_mono = (stereo[0] + stereo[1]) / 2.0
+        mono = downmix_to_mono(load_sound(self.stereo_fname, use_mmap=True), block_size=1000)
+        self.assertIsInstance(mono, np.ndarray)
+        self.assertEqual(mono.dtype, np.float32)
+        self.assertEqual(mono.shape, true_mono.shape)
+        self.assertTrue(np.array_equal(mono, true_mono))
+        self.assertTrue(np.array_equal(downmix_to_mono(stereo), true_mono))
+
+    def test_downmix_to_mono_int16(self):
+        stereo = load_sound(self.stereo_fname, use_mmap=True)
+        true_mono = downmix_to_mono(stereo)
+        mono = downmix_to_mono(stereo, block_size=1000, dtype=np.int16)
+        self.assertEqual(mono.dtype, np.int16)
+        self.assertEqual(mono.shape, true_mono.shape)
+        self.assertLessEqual(np.max(np.abs(pcm_to_float32(mono) - true_mono)), 0.5 / 32768.0)
+
+    def test_float32_to_pcm(self):
+        sound = np.array([-1.5, -1.0, -0.5, 0.0, 0.25, 0.5, 1.0, 1.5], dtype=np.float32)
+        true_pcm = np.array([-32768, -32768, -16384, 0, 8192, 16384, 32767, 32767], dtype=np.int16)
+        pcm = float32_to_pcm(sound)
+        self.assertEqual(pcm.dtype, np.int16)
+        self.assertTrue(np.array_equal(pcm, true_pcm))
+
+    def test_audio_buffer_pos01(self):
+        true_sound = load_sound(self.mono_fname)
+        buffer = AudioBuffer(load_sound(self.mono_fname, use_mmap=True))
+        self.assertEqual(len(buffer), true_sound.shape[0])
+        self.assertEqual(buffer.shape, true_sound.shape)
+        self.assertEqual(buffer.nbytes, 2 * true_sound.shape[0])
+        self.assertIsInstance(buffer[100:2000], np.ndarray)
+        self.assertEqual(buffer[100:2000].dtype, np.float32)
+        self.assertTrue(np.array_equal(buffer[100:2000], true_sound[100:2000]))
+        self.assertAlmostEqual(buffer[150], float(true_sound[150]))
+        self.assertAlmostEqual(buffer[-1], float(true_sound[-1]))
+        self.assertTrue(np.array_equal(np.asarray(buffer), true_sound))
+        sub_buffer = buffer.view(100, 2000)
+        self.assertIsInstance(sub_buffer, AudioBuffer)
+        self.assertTrue(np.shares_memory(sub_buffer.pcm, buffer.pcm))
+        self.assertTrue(np.array_equal(sub_buffer[:], true_sound[100:2000]))
+
+    def test_audio_buffer_pos02(self):
+        true_sound = load_sound(self.mono_fname)
+        buffer = AudioBuffer.from_float32(true_sound)
+        self.assertEqual(buffer.pcm.dtype, np.int16)
+        self.assertTrue(np.array_equal(buffer[:], true_sound))
+
+    def test_audio_buffer_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = AudioBuffer(load_sound(self.mono_fname))
+
+    def test_read_wav_header(self):
+        header = read_wav_header(self.stereo_fname)
+        self.assertEqual(header.n_channels, 2)
+        self.assertEqual(header.sampling_frequency, 16_000)
+        self.assertEqual(header.bytes_per_sample, 2)
+        self.assertEqual(header.data_offset, 44)
+        self.assertEqual(header.n_frames, 180480)
+
+    def test_read_wav_header_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = read_wav_header(self.not_sound)
+
+    @staticmethod
+    def write_wav(fname: str, data: bytes, audio_format: int, n_channels: int, fs: int, bytes_per_sample: int):
+        block_align = n_channels * bytes_per_sample
+        fmt_chunk = struct.pack('<HHIIHH', audio_format, n_channels, fs, fs * block_align, block_align,
+                                8 * bytes_per_sample)
+        with open(fname, 'wb') as fp:
+            fp.write(b'RIFF' + struct.pack('<I', 4 + 8 + len(fmt_chunk) + 8 + len(data)) + b'WAVE')
+            fp.write(b'fmt ' + struct.pack('<I', len(fmt_chunk)) + fmt_chunk)
+            fp.write(b'data' + struct.pack('<I', len(data)) + data)
+
+    def test_decode_pcm_frames(self):
+        header = read_wav_header(self.stereo_fname)._replace(bytes_per_sample=3, n_channels=1)
+        data = bytes([0x00, 0x00, 0x40, 0xFF, 0xFF, 0xFF, 0x00, 0x00, 0x80])
+        self.assertTrue(np.allclose(decode_pcm_frames(data, header)[:, 0], [0.5, -1.0 / 8388608.0, -1.0]))
+
+    def test_resampler_pos01(self):
+        sound = np.random.default_rng(42).uniform(-0.5, 0.5, size=(44_100,)).astype(np.float32)
+        true_resampled = resample_sound(sound, 44_100)
+        self.assertEqual(true_resampled.shape, (16_000,))
+        resampler = PolyphaseResampler(44_100, 16_000)
+        parts = [resampler.process(sound[0:1000]), resampler.process(sound[1000:1001]),
+                 resampler.process(sound[1001:30000]), resampler.process(sound[30000:], final=True)]
+        self.assertTrue(np.allclose(np.concatenate(parts), true_resampled, atol=1e-6))
+
+    def test_resampler_pos02(self):
+        for src_fs in (8_000, 22_050, 44_100, 48_000):
+            times = np.arange(2 * src_fs, dtype=np.float64) / src_fs
+            resampled = resample_sound((0.5 * np.sin(2.0 * np.pi * 440.0 * times)).astype(np.float32), src_fs)
+            self.assertEqual(resampled.shape, (32_000,))
+            true_times = np.arange(32_000, dtype=np.float64) / 16_000.0
+            true_sound = 0.5 * np.sin(2.0 * np.pi * 440.0 * true_times)
+            self.assertLess(np.max(np.abs(resampled[800:-800] - true_sound[800:-800])), 1e-2, msg=f'fs={src_fs}')
+
+    def test_convert_wav_pos01(self):
+        times = np.arange(44_100, dtype=np.float64) / 44_100.0
+        left = np.round(0.5 * np.sin(2.0 * np.pi * 440.0 * times) * 8388607.0).astype(np.int32)
+        right = -left
+        frames = np.stack((left, right), axis=1).reshape((-1,)).astype('<i4').view(np.uint8).reshape((-1, 4))
+        self.write_wav(self.tmp_fname, frames[:, 0:3].tobytes(), 1, 2, 44_100, 3)
+        loaded_sound = load_sound(self.tmp_fname)
+        self.assertIsInstance(loaded_sound, np.ndarray)
+        self.assertEqual(loaded_sound.shape, (16_000,))
+        self.assertLess(np.max(np.abs(loaded_sound)), 1e-3)
+
+    def test_convert_wav_pos02(self):
+        times = np.arange(48_000, dtype=np.float64) / 48_000.0
+        sound = (0.5 * np.sin(2.0 * np.pi * 440.0 * times)).astype('<f4')
+        self.write_wav(self.tmp_fname, sound.tobytes(), 3, 1, 48_000, 4)
+        converted_sound = convert_wav(self.tmp_fname, block_size=5000)
+        self.assertEqual(converted_sound.dtype, np.int16)
+        self.assertEqual(converted_sound.shape, (16_000,))
+        true_sound = 0.5 * np.sin(2.0 * np.pi * 440.0 * np.arange(16_000, dtype=np.float64) / 16_000.0)
+        self.assertLess(np.max(np.abs(pcm_to_float32(converted_sound)[800:-800] - true_sound[800:-800])), 1e-2)
+        with open(self.tmp_fname, 'rb') as fp:
+            self.assertTrue(np.array_equal(decode_audio(fp), converted_sound))
+
+    def test_convert_wav_pos03(self):
+        header = read_wav_header(self.mono_fname)
+        with open(self.mono_fname, 'rb') as fp:
+            fp.seek(header.data_offset)
+            true_sound = np.frombuffer(fp.read(2 * header.n_frames), dtype='<i2')
+        self.assertTrue(np.array_equal(convert_wav(self.mono_fname), true_sound))
+        self.assertTrue(np.array_equal(decode_audio(self.mono_fname), true_sound))
+
+    def test_probe_audio_pos01(self):
+        true_info = AudioInfo(duration=11.28, n_channels=2, sampling_frequency=16_000, codec='pcm_s16le',
+                              container='wav')
+        self.assertEqual(probe_audio(self.stereo_fname), true_info)
+        with open(self.stereo_fname, 'rb') as fp:
+            self.assertEqual(probe_audio(fp), true_info)
+            self.assertEqual(fp.tell(), 0)
+
+    def test_probe_audio_pos02(self):
+        self.write_wav(self.tmp_fname, bytes(6 * 44_100), 1, 2, 44_100, 3)
+        self.assertEqual(probe_audio(self.tmp_fname), AudioInfo(duration=1.0, n_channels=2, sampling_frequency=44_100,
+                                                                codec='pcm_s24le', container='wav'))
+
+    @unittest.skipIf(shutil.which('ffprobe') is None, 'FFprobe is not installed')
+    def test_probe_audio_pos03(self):
+        info = probe_audio(self.mpeg_fname)
+        self.assertEqual(info.codec, 'aac')
+        self.assertGreater(info.duration, 0.0)
+        self.assertGreater(info.sampling_frequency, 0)
+
+    def test_probe_audio_neg01(self):
+        true_err_msg = f'The file "nonexisted.wav" does not exist!'
+        with self.assertRaisesRegex(IOError, re.escape(true_err_msg)):
+            _ = probe_audio('nonexisted.wav')
+
+    def test_iter_sound_blocks_pos01(self):
+        true_sound = decode_audio(self.mpeg_fname)
+        blocks = list(iter_sound_blocks(self.mpeg_fname, block_seconds=3.0, overlap_seconds=0.5, dtype=np.int16))
+        self.assertGreater(len(blocks), 1)
+        for block_idx, (block_start, block) in enumerate(blocks):
+            self.assertEqual(block_start, block_idx * 40_000)
+            self.assertEqual(block.dtype, np.int16)
+            self.assertTrue(np.array_equal(block, true_sound[block_start:(block_start + 48_000)]))
+        self.assertEqual(blocks[-1][0] + blocks[-1][1].shape[0], true_sound.shape[0])
+
+    def test_iter_sound_blocks_pos02(self):
+        times = np.arange(3 * 44_100, dtype=np.float64) / 44_100.0
+        sound = (0.5 * np.sin(2.0 * np.pi * 440.0 * times)).astype('<f4')
+        self.write_wav(self.tmp_fname, sound.tobytes(), 3, 1, 44_100, 4)
+        true_sound = pcm_to_float32(decode_audio(self.tmp_fname))
+        blocks = list(iter_sound_blocks(self.tmp_fname, block_seconds=1.0))
+        self.assertEqual([it[0] for it in blocks], [0, 16_000, 32_000])
+        for block_start, block in blocks:
+            self.assertEqual(block.dtype, np.float32)
+        self.assertTrue(np.array_equal(np.concatenate([it[1] for it in blocks]), true_sound))
+
+    def test_iter_sound_blocks_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = list(iter_sound_blocks(self.mono_fname, block_seconds=1.0, overlap_seconds=1.0))
+
+    def test_prefetch_sound_blocks_pos01(self):
+        true_blocks = list(iter_sound_blocks(self.mpeg_fname, block_seconds=1.0, dtype=np.int16))
+        blocks = list(prefetch_sound_blocks(iter_sound_blocks(self.mpeg_fname, block_seconds=1.0, dtype=np.int16),
+                                            max_prefetched=1))
+        self.assertEqual([it[0] for it in blocks], [it[0] for it in true_blocks])
+        for (_, true_block), (_, block) in zip(true_blocks, blocks):
+            self.assertTrue(np.array_equal(block, true_block))
+        early_stopped = prefetch_sound_blocks(iter_sound_blocks(self.mpeg_fname, block_seconds=1.0), max_prefetched=2)
+        self.assertEqual(next(early_stopped)[0], 0)
+        early_stopped.close()
+
+    def test_prefetch_sound_blocks_neg01(self):
+        with self.assertRaises(IOError):
+            _ = list(prefetch_sound_blocks(iter_sound_blocks('nonexisted.wav', block_seconds=1.0)))
+
+    def test_decode_audio_batch_pos01(self):
+        fnames = [self.mpeg_fname, self.not_sound, self.mono_fname, self.stereo_fname]
+        results = list(decode_audio_batch(fnames, n_processes=2, max_in_flight=3))
+        self.assertEqual([it[0] for it in results], fnames)
+        for fname, sound, err_msg in results:
+            if fname == self.not_sound:
+                self.assertIsNone(sound)
+                self.assertIsInstance(err_msg, str)
+                self.assertIn(f'The file "{self.not_sound}" cannot be opened.', err_msg)
+            else:
+                self.assertIsNone(err_msg)
+                self.assertTrue(np.array_equal(sound, decode_audio(fname)))
+
+    def test_decode_audio_batch_pos02(self):
+        fnames = [self.mono_fname, self.stereo_fname, self.mpeg_fname]
+        results = list(decode_audio_batch(fnames, n_processes=2, max_in_flight=1, ordered=False,
+                                          cache_dir=self.tmp_dirname))
+        self.assertEqual(sorted([it[0] for it in results]), sorted(fnames))
+        for fname, sound, err_msg in results:
+            self.assertIsNone(err_msg)
+            self.assertTrue(np.array_equal(sound, decode_audio(fname)))
+        self.assertEqual(len(os.listdir(self.tmp_dirname)), 3)
+
+    def test_decode_audio_batch_neg01(self):
+        with self.assertRaises(ValueError):
+            _ = list(decode_audio_batch([self.mono_fname], n_processes=0))
+
+    def test_decode_audio_keep_channels(self):
+        channels = load_sound(self.stereo_fname, use_mmap=True)
+        decoded_sound = decode_audio(self.stereo_fname, keep_channels=True)
+        self.assertEqual(decoded_sound.shape, (channels[0].shape[0], 2))
+        self.assertTrue(np.array_equal(decoded_sound[:, 0], channels[0]))
+        self.assertTrue(np.array_equal(decoded_sound[:, 1], channels[1]))
+        frames = np.stack((channels[0], channels[1]), axis=1)[0:16_000].repeat(3, axis=0).astype('<i2')
+        self.write_wav(self.tmp_fname, frames.tobytes(), 1, 2, 48_000, 2)
+        converted_sound = decode_audio(self.tmp_fname, keep_channels=True)
+        self.assertEqual(converted_sound.shape, (16_000, 2))
+        self.assertTrue(np.array_equal(converted_sound, convert_wav(self.tmp_fname, keep_channels=True)))
+        self.assertFalse(np.array_equal(converted_sound[:, 0], converted_sound[:, 1]))
+
     def test_load_empty(self):
         loaded = load_sound(self.empty_fname)
         self.assertIsNone(loaded)
@@ -88,6 +359,98 @@ class TestWavIO(unittest.TestCase):
         diff = float(np.max(np.abs(converted_sound - true_sound)))
         self.assertLess(diff, eps)
 
+    def test_decode_audio_pos01(self):
+        true_sound = load_sound(self.wav_from_mpeg_fname)
+        decoded_sound = decode_audio(self.mpeg_fname)
+        self.assertIsInstance(decoded_sound, np.ndarray)
+        self.assertEqual(decoded_sound.dtype, np.int16)
+        self.assertEqual(decoded_sound.shape, true_sound.shape)
+        max_val = float(np.max(np.abs(true_sound)))
+        diff = float(np.max(np.abs(pcm_to_float32(decoded_sound) - true_sound)))
+        self.assertLess(diff, max_val / 100.0)
+
+    def test_decode_audio_pos02(self):
+        with open(self.mpeg_fname, 'rb') as fp:
+            decoded_sound = decode_audio(fp)
+        self.assertIsInstance(decoded_sound, np.ndarray)
+        self.assertEqual(decoded_sound.dtype, np.int16)
+        self.assertTrue(np.array_equal(decoded_sound, decode_audio(self.mpeg_fname)))
+
+    def test_decode_audio_pos03(self):
+        decoded_sound = decode_audio(self.stereo_fname)
+        true_sound = load_sound(self.mono_fname)
+        self.assertEqual(decoded_sound.shape, true_sound.shape)
+        eps = np.max(np.abs(true_sound)) / 500.0
+        self.assertLess(np.max(np.abs(pcm_to_float32(decoded_sound) - true_sound)), eps)
+
+    def test_decode_audio_pos04(self):
+        # MP4 without "faststart": the moov atom is written after the samples, so it cannot be demuxed from a pipe
+        fname = os.path.join(self.tmp_dirname, 'moov_at_end.m4a')
+        subprocess.run([FFMPEG_EXECUTABLE, '-hide_banner', '-loglevel', 'error', '-y', '-f', 'lavfi',
+                        '-i', 'sine=frequency=440:sample_rate=44100:duration=10', '-c:a', 'aac', fname], check=True)
+        with open(fname, 'rb') as fp:
+            data = fp.read()
+        self.assertGreater(data.find(b'moov'), data.find(b'mdat'))
+        true_sound = decode_audio(fname)
+        self.assertEqual(true_sound.shape[0] // 16_000, 10)
+        self.assertTrue(np.array_equal(decode_audio(io.BytesIO(data)), true_sound))
+        blocks = list(iter_sound_blocks(io.BytesIO(data), block_seconds=3.0, dtype=np.int16))
+        self.assertTrue(np.array_equal(np.concatenate([it[1] for it in blocks]), true_sound))
+        self.assertEqual(os.listdir(self.tmp_dirname), ['moov_at_end.m4a'])
+
+    def test_decode_audio_neg01(self):
+        true_err_msg = f'The file "nonexisted.wav" does not exist!'
+        with self.assertRaisesRegex(IOError, re.escape(true_err_msg)):
+            _ = decode_audio('nonexisted.wav')
+
+    def test_decode_audio_neg02(self):
+        true_err_msg = f'The file "{self.not_sound}" cannot be opened. '
+        with self.assertRaisesRegex(IOError, re.escape(true_err_msg) + r'.+'):
+            _ = decode_audio(self.not_sound)
+
+    @unittest.skipIf(os.name != 'posix', 'The fake FFmpeg is a shell script.')
+    def test_decode_audio_neg03(self):
+        # FFmpeg may exit with 0 after a demuxing error without any decoded samples
+        fake_ffmpeg = os.path.join(self.tmp_dirname, 'fake_ffmpeg')
+        with open(fake_ffmpeg, 'w') as fp:
+            fp.write('#!/bin/sh\necho "Error during demuxing: Invalid data found when processing input" >&2\n'
+                     'exit 0\n')
+        os.chmod(fake_ffmpeg, 0o755)
+        with mock.patch('wav_io.wav_io.FFMPEG_EXECUTABLE', fake_ffmpeg):
+            with self.assertRaisesRegex(IOError, 'Error during demuxing'):
+                _ = decode_audio(self.mpeg_fname)
+
+    def test_audio_cache_pos01(self):
+        cache = AudioCache(self.tmp_dirname)
+        true_sound = decode_audio(self.mpeg_fname)
+        cached_sound = cache.load(self.mpeg_fname)
+        self.assertIsInstance(cached_sound, np.memmap)
+        self.assertEqual(cached_sound.dtype, np.int16)
+        self.assertTrue(np.array_equal(cached_sound, true_sound))
+        self.assertEqual(os.listdir(self.tmp_dirname), [cache.key(self.mpeg_fname) + '.npy'])
+        other_cache = AudioCache(self.tmp_dirname)
+        self.assertIsNotNone(other_cache.get(cache.key(self.mpeg_fname)))
+        self.assertTrue(np.array_equal(other_cache.load(self.mpeg_fname), true_sound))
+
+    def test_audio_cache_pos02(self):
+        cache = AudioCache(self.tmp_dirname)
+        shutil.copyfile(self.mono_fname, os.path.join(self.tmp_dirname, 'copy_of_mono_sound.bin'))
+        self.assertEqual(cache.key(self.mono_fname), cache.key(os.path.join(self.tmp_dirname, 'copy_of_mono_sound.bin')))
+        self.assertNotEqual(cache.key(self.mono_fname), cache.key(self.stereo_fname))
+
+    def test_audio_cache_pos03(self):
+        cache = AudioCache(self.tmp_dirname, max_size=600_000)
+        _ = cache.load(self.stereo_fname)
+        _ = cache.load(self.mono_fname)
+        self.assertIsNone(cache.get(cache.key(self.stereo_fname)))
+        self.assertIsNotNone(cache.get(cache.key(self.mono_fname)))
+
+    def test_audio_cache_neg01(self):
+        cache = AudioCache(self.tmp_dirname)
+        true_err_msg = f'The file "nonexisted.wav" does not exist!'
+        with self.assertRaisesRegex(IOError, re.escape(true_err_msg)):
+            _ = cache.load('nonexisted.wav')
+
     def test_transform_to_wavpcm_neg01(self):
         true_err_msg = f'The file "nonexisted.wav" does not exist!'
         with self.assertRaisesRegex(IOError, re.escape(true_err_msg)):
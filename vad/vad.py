@@ -1,14 +1,27 @@
-from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 from webrtcvad import Vad
 
+from wav_io.wav_io import TARGET_SAMPLING_FREQUENCY, AudioBuffer
+
 
 MIN_SOUND_LENGTH = 1600  # 100 milliseconds with sampling frequency = 16000 Hz
+VAD_AGGRESSIVENESS_MODES = (0, 1, 2, 3)
+VAD_WINDOW_SIZE = 480  # 30 milliseconds
+VAD_SHIFT_SIZE = 160  # 10 milliseconds
+QUANTIZATION_BLOCK_SIZE = 1 << 20
+PARALLEL_VAD_MIN_WINDOWS = 60_000  # 10 minutes: shorter sounds are processed faster than worker processes start
+ISLAND_MIN_PAUSE = 0.15  # seconds: shorter pauses are considered as pauses inside a word
+ISLAND_MAX_DURATION = 2.0  # seconds: longer speech islands are split, because a word is rarely longer
+STREAMING_MIN_SILENCE = 0.5  # seconds: a pause which closes a speech segment of a live stream
 
 
 def initialize_vad_ensemble() -> List[Vad]:
-    return [Vad(aggressiveness) for aggressiveness in range(4)]
+    return [Vad(aggressiveness) for aggressiveness in VAD_AGGRESSIVENESS_MODES]
 
 
 def sound_to_bytes(sound: np.ndarray) -> bytes:
@@ -24,27 +37,405 @@ def sound_to_bytes(sound: np.ndarray) -> bytes:
     return res.tobytes()
 
 
-def calculate_voice_probabilities(sound: np.ndarray, vad_ensemble: List[Vad]) -> np.ndarray:
-    window_size = 480
-    shift_size = 160
-    number_of_windows = (sound.shape[0] - window_size) // shift_size + 1
-    probabilities = np.zeros((number_of_windows,), dtype=np.float32)
-    for window_idx in range(number_of_windows):
-        window_start = window_idx * shift_size
-        window_end = min(sound.shape[0], window_start + window_size)
-        cur_window = np.zeros((window_size,), dtype=np.float32)
-        if (window_end - window_start) < window_size:
-            cur_window[:(window_end - window_start)] = sound[window_start:window_end]
-        else:
-            cur_window = sound[window_start:window_end]
-        buffer = sound_to_bytes(cur_window)
+def sound_to_pcm(sound: Union[np.ndarray, AudioBuffer], block_size: int = QUANTIZATION_BLOCK_SIZE) -> np.ndarray:
+    """
+    Quantizes a whole waveform to 16-bit PCM once, exactly as `sound_to_bytes` quantizes each window.
+    16-bit PCM (e.g. the samples of an AudioBuffer) is returned as is.
+    """
+    if isinstance(sound, AudioBuffer):
+        sound = sound.pcm
+    if len(sound.shape) != 1:
+        err_msg = f'The sound channel number is wrong! Expected 1, got {len(sound.shape)}.'
+        raise ValueError(err_msg)
+    if sound.dtype == np.int16:
+        return np.ascontiguousarray(sound, dtype='<i2')
+    if sound.dtype == np.uint8:
+        sound = np.subtract(sound, 128, dtype=np.int16)
+        sound *= 256
+        return sound
+    res = np.empty((sound.shape[0],), dtype='<i2')
+    for block_start in range(0, sound.shape[0], block_size):
+        block_end = min(sound.shape[0], block_start + block_size)
+        res[block_start:block_end] = np.asarray(sound[block_start:block_end] * 32768.0, dtype=np.int16)
+    return res
+
+
+def _count_speech_windows(pcm: np.ndarray, vad: Vad, number_of_windows: int) -> np.ndarray:
+    # the windows are zero-copy slices of the byte view (each sample takes 2 bytes)
+    with memoryview(pcm).cast('B') as pcm_bytes:
+        is_speech = vad.is_speech
+        window_bytes = 2 * VAD_WINDOW_SIZE
+        shift_bytes = 2 * VAD_SHIFT_SIZE
+        res = np.fromiter(
+            (is_speech(pcm_bytes[pos:(pos + window_bytes)], 16_000)
+             for pos in range(0, number_of_windows * shift_bytes, shift_bytes)),
+            dtype=np.bool_, count=number_of_windows
+        )
+    return res
+
+
+def _vad_worker(shared_memory_name: str, number_of_samples: int, aggressiveness: int,
+                number_of_windows: int) -> np.ndarray:
+    shared_sound = shared_memory.SharedMemory(name=shared_memory_name)
+    try:
+        pcm = np.ndarray((number_of_samples,), dtype='<i2', buffer=shared_sound.buf)
+        res = _count_speech_windows(pcm, Vad(aggressiveness), number_of_windows)
+        del pcm
+    finally:
+        shared_sound.close()
+    return res
+
+
+def calculate_voice_probabilities(sound: Union[np.ndarray, AudioBuffer], vad_ensemble: Optional[List[Vad]] = None,
+                                  n_processes: int = 1) -> np.ndarray:
+    """
+    Calculates the share of the VAD ensemble members which detect a speech in each 30 ms window with 10 ms shift.
+
+    The sound is quantized to 16-bit PCM once, and the windows are passed to WebRTC VAD as zero-copy byte views.
+    WebRTC VAD adapts to the sound which it has seen, so each ensemble member has to process the windows in order,
+    and splitting the sound into independently processed chunks would change the results. Therefore, the sound is
+    processed by the ensemble members in parallel instead: if `vad_ensemble` is None, then fresh detectors with
+    `VAD_AGGRESSIVENESS_MODES` are run in up to `n_processes` worker processes, which share the quantized sound
+    (a sound shorter than `PARALLEL_VAD_MIN_WINDOWS` windows is processed in this process anyway). The results
+    are identical to the sequential processing with `initialize_vad_ensemble()`.
+
+    Arguments:
+    - sound: a mono 16kHz waveform or an AudioBuffer.
+    - vad_ensemble: WebRTC VAD instances, which are applied in this process (and keep their state after the call),
+      or None to use fresh detectors for all aggressiveness modes.
+    - n_processes: a number of worker processes when `vad_ensemble` is None.
+
+    Returns a float32 array of speech probabilities, one for each window.
+    """
+    pcm = sound_to_pcm(sound)
+    number_of_windows = max(0, (pcm.shape[0] - VAD_WINDOW_SIZE) // VAD_SHIFT_SIZE + 1)
+    if vad_ensemble is not None:
+        ensemble_size = len(vad_ensemble)
+        n_speech_windows = np.zeros((number_of_windows,), dtype=np.float32)
         for cur_vad in vad_ensemble:
-            probabilities[window_idx] += (1.0 if cur_vad.is_speech(buffer, 16_000) else 0.0)
-        probabilities[window_idx] /= float(len(vad_ensemble))
-        del cur_window
+            n_speech_windows += _count_speech_windows(pcm, cur_vad, number_of_windows)
+    elif (n_processes <= 1) or (number_of_windows < PARALLEL_VAD_MIN_WINDOWS):
+        ensemble_size = len(VAD_AGGRESSIVENESS_MODES)
+        n_speech_windows = np.zeros((number_of_windows,), dtype=np.float32)
+        for aggressiveness in VAD_AGGRESSIVENESS_MODES:
+            n_speech_windows += _count_speech_windows(pcm, Vad(aggressiveness), number_of_windows)
+    else:
+        ensemble_size = len(VAD_AGGRESSIVENESS_MODES)
+        n_speech_windows = np.zeros((number_of_windows,), dtype=np.float32)
+        shared_sound = shared_memory.SharedMemory(create=True, size=max(1, pcm.nbytes))
+        try:
+            shared_pcm = np.ndarray(pcm.shape, dtype='<i2', buffer=shared_sound.buf)
+            shared_pcm[:] = pcm
+            del shared_pcm
+            with ProcessPoolExecutor(max_workers=min(n_processes, ensemble_size),
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(_vad_worker, shared_sound.name, pcm.shape[0], aggressiveness, number_of_windows)
+                           for aggressiveness in VAD_AGGRESSIVENESS_MODES]
+                for cur_future in futures:
+                    n_speech_windows += cur_future.result()
+        finally:
+            shared_sound.close()
+            shared_sound.unlink()
+    del pcm
+    probabilities = n_speech_windows
+    probabilities /= float(ensemble_size)
     return probabilities
 
 
+def find_speech_regions(speech_probabilities: np.ndarray, sound_length: int, min_silence_length: int,
+                        padding: int = 0, max_silence_probability: float = 0.25) -> List[Tuple[int, int]]:
+    """
+    Finds the regions of a sound which remain after removing long silences.
+
+    A window is silent if its speech probability (see `calculate_voice_probabilities`) is not greater than
+    `max_silence_probability`. A pause between two non-silent windows is removed only if it is no shorter than
+    `min_silence_length` samples, and `padding` samples of the pause are kept at each of its sides.
+
+    Returns a list of (start, end) sample bounds of the speech regions, sorted and non-overlapping.
+    The list is empty if the whole sound is silent.
+    """
+    speech_windows = np.flatnonzero(speech_probabilities > max_silence_probability)
+    if speech_windows.shape[0] == 0:
+        return []
+    # a pause lasts from the end of a non-silent window to the start of the next non-silent window
+    pause_starts = speech_windows[:-1] * VAD_SHIFT_SIZE + VAD_WINDOW_SIZE
+    pause_ends = speech_windows[1:] * VAD_SHIFT_SIZE
+    long_pauses = np.flatnonzero((pause_ends - pause_starts) >= min_silence_length)
+    # the leading and the trailing silences are removed under the same rule as the pauses
+    first_speech_start = int(speech_windows[0]) * VAD_SHIFT_SIZE
+    last_speech_end = int(speech_windows[-1]) * VAD_SHIFT_SIZE + VAD_WINDOW_SIZE
+    region_starts = [max(0, first_speech_start - padding) if first_speech_start >= min_silence_length else 0]
+    region_ends = []
+    for pause_idx in long_pauses:
+        region_ends.append(int(pause_starts[pause_idx]) + padding)
+        region_starts.append(int(pause_ends[pause_idx]) - padding)
+    if (sound_length - last_speech_end) >= min_silence_length:
+        region_ends.append(min(sound_length, last_speech_end + padding))
+    else:
+        region_ends.append(sound_length)
+    return [(region_start, region_end) for region_start, region_end in zip(region_starts, region_ends)
+            if region_end > region_start]
+
+
+def find_speech_run_bounds(speech_probabilities: np.ndarray, positions: np.ndarray,
+                           max_silence_probability: float = 0.25) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the speech run (a stretch of consecutive windows with the speech probability greater than
+    `max_silence_probability`) around each sample position, i.e. the run of any window covering the position.
+
+    Returns two int64 arrays of the same shape as `positions`: the start and the end samples of the speech run
+    around each position. A position outside speech runs is its own start and end.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    number_of_windows = speech_probabilities.shape[0]
+    if number_of_windows == 0:
+        return positions.copy(), positions.copy()
+    is_speech = speech_probabilities > max_silence_probability
+    window_indices = np.arange(number_of_windows, dtype=np.int64)
+    run_starts = np.maximum.accumulate(np.where(is_speech, -1, window_indices)) + 1
+    run_ends = np.minimum.accumulate(np.where(is_speech, number_of_windows, window_indices)[::-1])[::-1] - 1
+    # a position is covered by up to VAD_WINDOW_SIZE // VAD_SHIFT_SIZE windows, and it is in a speech run,
+    # if any of them is a speech window
+    first_windows = np.maximum((positions - VAD_WINDOW_SIZE) // VAD_SHIFT_SIZE + 1, 0)
+    last_windows = np.minimum(positions // VAD_SHIFT_SIZE, number_of_windows - 1)
+    starts = positions.copy()
+    ends = positions.copy()
+    is_start_found = np.zeros(positions.shape, dtype=np.bool_)
+    for window_offset in range(VAD_WINDOW_SIZE // VAD_SHIFT_SIZE):
+        window_indices = np.minimum(first_windows + window_offset, number_of_windows - 1)
+        in_speech = (first_windows + window_offset <= last_windows) & is_speech[window_indices]
+        starts = np.where(in_speech & (~is_start_found), run_starts[window_indices] * VAD_SHIFT_SIZE, starts)
+        is_start_found |= in_speech
+        ends = np.where(in_speech, run_ends[window_indices] * VAD_SHIFT_SIZE + VAD_WINDOW_SIZE, ends)
+    return starts, ends
+
+
+def compress_pauses(sound: Union[np.ndarray, AudioBuffer], max_pause_length: int,
+                    max_silence_probability: float = 0.5) -> Tuple[Union[np.ndarray, AudioBuffer], np.ndarray]:
+    """
+    Shortens the pauses of a mono 16kHz sound, which are longer than `max_pause_length` samples, to this length.
+
+    The pauses are found by the VAD ensemble (see `find_speech_regions`): half of `max_pause_length` is kept
+    at each side of a long pause, and the middle of the pause is removed. Leading and trailing silences
+    are shortened to the half of `max_pause_length` too.
+
+    Returns the compressed sound (an AudioBuffer for an AudioBuffer, otherwise an array of the same type)
+    and a remapping table, which is an int64 array of shape (n_pieces, 2). Each row of the table contains
+    the start of a kept piece in the compressed sound and in the original one, so positions in the compressed
+    sound can be mapped to the original timeline by `map_to_original`. If nothing is removed, then the sound
+    is returned as is.
+    """
+    if max_pause_length <= 0:
+        err_msg = f'The maximal pause length is wrong! Expected a positive value, got {max_pause_length}.'
+        raise ValueError(err_msg)
+    speech_regions = find_speech_regions(calculate_voice_probabilities(sound), sound_length=sound.shape[0],
+                                         min_silence_length=max_pause_length, padding=max_pause_length // 2,
+                                         max_silence_probability=max_silence_probability)
+    if (len(speech_regions) == 0) or (speech_regions == [(0, sound.shape[0])]):
+        return sound, np.zeros((1, 2), dtype=np.int64)
+    region_bounds = np.array(speech_regions, dtype=np.int64)
+    region_lengths = region_bounds[:, 1] - region_bounds[:, 0]
+    remapping_table = np.empty(region_bounds.shape, dtype=np.int64)
+    remapping_table[0, 0] = 0
+    np.cumsum(region_lengths[:-1], out=remapping_table[1:, 0])
+    remapping_table[:, 1] = region_bounds[:, 0]
+    samples = sound.pcm if isinstance(sound, AudioBuffer) else sound
+    compressed_samples = np.concatenate([samples[region_start:region_end]
+                                         for region_start, region_end in speech_regions])
+    if isinstance(sound, AudioBuffer):
+        return AudioBuffer(compressed_samples), remapping_table
+    return compressed_samples, remapping_table
+
+
+def map_to_original(positions: Union[int, np.ndarray], remapping_table: np.ndarray) -> Union[int, np.ndarray]:
+    """
+    Maps sample positions in a sound compressed by `compress_pauses` to the positions in the original sound.
+    """
+    piece_indices = np.searchsorted(remapping_table[:, 0], positions, side='right') - 1
+    piece_indices = np.maximum(piece_indices, 0)
+    original_positions = positions - remapping_table[piece_indices, 0] + remapping_table[piece_indices, 1]
+    if isinstance(positions, np.ndarray):
+        return original_positions
+    return int(original_positions)
+
+
+class VADSegmenter:
+    """
+    A lightweight replacement of the Wav2Vec2-based segmenter (see `asr.initialize_model_for_speech_segmentation`),
+    which finds word-like speech islands by the WebRTC VAD ensemble instead of a neural network.
+
+    An island is a stretch of windows with the speech probability greater than `max_silence_probability`, where
+    pauses shorter than `min_pause` seconds are ignored. Islands longer than `max_island_duration` seconds are split
+    into equal parts. The segmenter is called as the speech recognition pipeline, and it returns the islands as
+    chunks with empty texts, so `asr.segment_sound` can group them as words. The boundaries are less precise than
+    the Wav2Vec2 word timestamps, but neither a GPU nor model weights are needed.
+    """
+    def __init__(self, max_silence_probability: float = 0.5, min_pause: float = ISLAND_MIN_PAUSE,
+                 max_island_duration: float = ISLAND_MAX_DURATION, n_processes: int = 1):
+        if (max_silence_probability < 0.0) or (max_silence_probability >= 1.0):
+            err_msg = f'The maximal silence probability is wrong! Expected a value in [0, 1), ' \
+                      f'got {max_silence_probability}.'
+            raise ValueError(err_msg)
+        if min_pause <= 0.0:
+            err_msg = f'The minimal pause duration is wrong! Expected a positive value, got {min_pause}.'
+            raise ValueError(err_msg)
+        if max_island_duration <= (VAD_WINDOW_SIZE / TARGET_SAMPLING_FREQUENCY):
+            err_msg = f'The maximal island duration is wrong! Expected a value greater than ' \
+                      f'{VAD_WINDOW_SIZE / TARGET_SAMPLING_FREQUENCY} seconds, got {max_island_duration}.'
+            raise ValueError(err_msg)
+        self.max_silence_probability = max_silence_probability
+        self.min_pause = min_pause
+        self.max_island_duration = max_island_duration
+        self.n_processes = n_processes
+
+    def find_islands(self, sound: Union[np.ndarray, AudioBuffer]) -> List[Tuple[int, int]]:
+        """
+        Returns a list of (start, end) sample bounds of the speech islands of a mono 16kHz sound.
+        """
+        speech_regions = find_speech_regions(
+            calculate_voice_probabilities(sound, n_processes=self.n_processes),
+            sound_length=sound.shape[0],
+            min_silence_length=round(self.min_pause * TARGET_SAMPLING_FREQUENCY),
+            max_silence_probability=self.max_silence_probability
+        )
+        max_island_length = round(self.max_island_duration * TARGET_SAMPLING_FREQUENCY)
+        islands = []
+        for region_start, region_end in speech_regions:
+            n_parts = (region_end - region_start + max_island_length - 1) // max_island_length
+            part_bounds = np.linspace(region_start, region_end, n_parts + 1).round().astype(np.int64)
+            islands += [(int(part_bounds[idx]), int(part_bounds[idx + 1])) for idx in range(n_parts)]
+        return islands
+
+    def __call__(self, waveform: Union[np.ndarray, AudioBuffer], return_timestamps: str = 'word',
+                 **kwargs) -> Dict[str, Union[str, List[Dict[str, Union[str, Tuple[float, float]]]]]]:
+        if return_timestamps != 'word':
+            err_msg = f'The timestamp type "{return_timestamps}" is not supported! Expected "word".'
+            raise ValueError(err_msg)
+        return {
+            'text': '',
+            'chunks': [
+                {
+                    'text': '',
+                    'timestamp': (island_start / TARGET_SAMPLING_FREQUENCY, island_end / TARGET_SAMPLING_FREQUENCY)
+                }
+                for island_start, island_end in self.find_islands(waveform)
+            ]
+        }
+
+
+class StreamingVAD:
+    """
+    A voice activity detector for a live 16kHz mono stream, which is pushed by chunks of any size.
+
+    The stream is processed by the VAD ensemble window by window (30 ms windows with 10 ms shift, as in
+    `calculate_voice_probabilities`, so the probabilities of the whole stream are identical to the probabilities
+    of the concatenated sound). Only the samples of the last incomplete window are kept between pushes, so the
+    memory and the work per push depend on the chunk size only, but not on the stream duration.
+
+    A speech segment lasts from the start of a window with the speech probability greater than
+    `max_silence_probability` to the end of the last such window before a pause of at least `min_silence` seconds
+    (a pause is counted in the same way as in `find_speech_regions`). The segment is finalized as soon as its pause
+    is long enough, and its bounds are returned in seconds from the stream start.
+
+    Example:
+    ```
+    streaming_vad = StreamingVAD()
+    for chunk in microphone_chunks:
+        probabilities, segments = streaming_vad.push(chunk)
+        for segment_start, segment_end in segments:
+            transcribe_segment(segment_start, segment_end)
+    for segment_start, segment_end in streaming_vad.flush():
+        transcribe_segment(segment_start, segment_end)
+    ```
+    """
+    def __init__(self, min_silence: float = STREAMING_MIN_SILENCE, max_silence_probability: float = 0.5):
+        if min_silence <= 0.0:
+            err_msg = f'The minimal silence duration is wrong! Expected a positive value, got {min_silence}.'
+            raise ValueError(err_msg)
+        if (max_silence_probability < 0.0) or (max_silence_probability >= 1.0):
+            err_msg = f'The maximal silence probability is wrong! Expected a value in [0, 1), ' \
+                      f'got {max_silence_probability}.'
+            raise ValueError(err_msg)
+        self.min_silence_length = round(min_silence * TARGET_SAMPLING_FREQUENCY)
+        self.max_silence_probability = max_silence_probability
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Starts a new stream: WebRTC VAD adapts to the sound which it has seen, so the detectors are recreated.
+        """
+        self.vad_ensemble = initialize_vad_ensemble()
+        self.tail = np.zeros((0,), dtype='<i2')  # the samples of the next window, which is not complete yet
+        self.number_of_windows = 0  # the number of processed windows, i.e. the stream position in VAD shifts
+        self.segment_start = None  # the start sample of the open speech segment
+        self.segment_end = None  # the end sample of the last speech window of the open segment
+
+    @property
+    def duration(self) -> float:
+        """
+        The duration of the stream (in seconds), which is pushed to the detector.
+        """
+        return (self.number_of_windows * VAD_SHIFT_SIZE + self.tail.shape[0]) / TARGET_SAMPLING_FREQUENCY
+
+    def push(self, chunk: Union[np.ndarray, AudioBuffer, bytes]) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+        """
+        Processes a new chunk of the stream.
+
+        Arguments:
+        - chunk: a mono 16kHz waveform (float32 or 16-bit PCM), an AudioBuffer or raw 16-bit little-endian PCM bytes.
+
+        Returns the speech probabilities of the windows which are completed by the chunk (possibly none of them)
+        and a list of (start_time, end_time) of the speech segments which are finalized by the chunk.
+        """
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            if (len(chunk) % 2) != 0:
+                err_msg = f'The PCM chunk size is wrong! Expected an even number of bytes, got {len(chunk)}.'
+                raise ValueError(err_msg)
+            pcm = np.frombuffer(chunk, dtype='<i2')
+        else:
+            pcm = sound_to_pcm(chunk)
+        if self.tail.shape[0] > 0:
+            pcm = np.concatenate((self.tail, pcm))
+        number_of_windows = max(0, (pcm.shape[0] - VAD_WINDOW_SIZE) // VAD_SHIFT_SIZE + 1)
+        n_speech_windows = np.zeros((number_of_windows,), dtype=np.float32)
+        if number_of_windows > 0:
+            pcm = np.ascontiguousarray(pcm)
+            for cur_vad in self.vad_ensemble:
+                n_speech_windows += _count_speech_windows(pcm, cur_vad, number_of_windows)
+        probabilities = n_speech_windows
+        probabilities /= float(len(self.vad_ensemble))
+        self.tail = pcm[(number_of_windows * VAD_SHIFT_SIZE):].copy()
+        del pcm
+        segments = []
+        for window_idx in range(self.number_of_windows, self.number_of_windows + number_of_windows):
+            window_start = window_idx * VAD_SHIFT_SIZE
+            if probabilities[window_idx - self.number_of_windows] > self.max_silence_probability:
+                if (self.segment_end is not None) and ((window_start - self.segment_end) >= self.min_silence_length):
+                    segments.append(self._close_segment())
+                if self.segment_start is None:
+                    self.segment_start = window_start
+                self.segment_end = window_start + VAD_WINDOW_SIZE
+            elif (self.segment_end is not None) and ((window_start - self.segment_end) >= self.min_silence_length):
+                segments.append(self._close_segment())
+        self.number_of_windows += number_of_windows
+        return probabilities, segments
+
+    def flush(self) -> List[Tuple[float, float]]:
+        """
+        Finishes the stream and returns the open speech segment (if any), which is not closed by a pause yet.
+        The detector is ready for a new stream after that.
+        """
+        segments = [] if self.segment_end is None else [self._close_segment()]
+        self.reset()
+        return segments
+
+    def _close_segment(self) -> Tuple[float, float]:
+        segment = (self.segment_start / TARGET_SAMPLING_FREQUENCY, self.segment_end / TARGET_SAMPLING_FREQUENCY)
+        self.segment_start = None
+        self.segment_end = None
+        return segment
+
+
 def start_to_time(start_pos: int) -> int:
     return start_pos * 160
 
@@ -53,43 +444,54 @@ def end_to_time(end_pos: int) -> int:
     return (end_pos - 1) * 160 + 480
 
 
-def split_long_sound(sound: np.ndarray, vad_ensemble: List[Vad],
-                     max_sound_len: int = 16_000 * 50) -> Tuple[List[np.ndarray], List[Tuple[int, int]]]:
-    speech_probabilities = calculate_voice_probabilities(sound, vad_ensemble)
+def split_long_sound_bounds(sound: Union[np.ndarray, AudioBuffer], vad_ensemble: Optional[List[Vad]],
+                            max_sound_len: int = 16_000 * 50, n_processes: int = 1) -> np.ndarray:
+    """
+    Finds the same sub-sounds as `split_long_sound`, but returns only their bounds as an int64 array
+    of shape (n_subsounds, 2), so no sample is copied. Use `iter_subsounds` to get the sub-sounds as views.
+    The `vad_ensemble` and `n_processes` arguments are passed to `calculate_voice_probabilities`.
+    """
+    speech_probabilities = calculate_voice_probabilities(sound, vad_ensemble, n_processes)
     start_pos = 0
     best_pos = 0
-    subsounds = []
     bounds_of_subsounds = []
     for cur_pos in range(1, speech_probabilities.shape[0]):
         if (cur_pos - start_pos) >= (max_sound_len // 160):
             if best_pos > start_pos:
-                cur_bounds = (
-                    start_to_time(start_pos),
-                    end_to_time(best_pos + 1)
-                )
-                subsounds.append(sound[cur_bounds[0]:cur_bounds[1]])
+                bounds_of_subsounds.append((start_to_time(start_pos), end_to_time(best_pos + 1)))
                 start_pos = best_pos
             else:
-                cur_bounds = (
-                    start_to_time(start_pos),
-                    end_to_time(cur_pos)
-                )
-                subsounds.append(sound[cur_bounds[0]:cur_bounds[1]])
+                bounds_of_subsounds.append((start_to_time(start_pos), end_to_time(cur_pos)))
                 start_pos = cur_pos - 1
                 best_pos = start_pos
-            bounds_of_subsounds.append(cur_bounds)
         else:
             if speech_probabilities[cur_pos] <= speech_probabilities[best_pos]:
                 best_pos = cur_pos
-    cur_bounds = (
-        start_to_time(start_pos),
-        sound.shape[0]
-    )
-    subsounds.append(sound[cur_bounds[0]:cur_bounds[1]])
-    bounds_of_subsounds.append(cur_bounds)
+    bounds_of_subsounds.append((start_to_time(start_pos), sound.shape[0]))
+    return np.array(bounds_of_subsounds, dtype=np.int64).reshape((-1, 2))
+
+
+def split_long_sound(sound: np.ndarray, vad_ensemble: List[Vad],
+                     max_sound_len: int = 16_000 * 50) -> Tuple[List[np.ndarray], List[Tuple[int, int]]]:
+    bounds_of_subsounds = [(int(it[0]), int(it[1]))
+                           for it in split_long_sound_bounds(sound, vad_ensemble, max_sound_len)]
+    subsounds = [sound[it[0]:it[1]] for it in bounds_of_subsounds]
     return subsounds, bounds_of_subsounds
 
 
+def iter_subsounds(sound: Union[np.ndarray, AudioBuffer],
+                   bounds_of_subsounds: np.ndarray) -> Iterator[Union[np.ndarray, AudioBuffer]]:
+    """
+    Yields the sub-sounds with the specified (start, end) bounds as views of `sound`, one by one,
+    so the samples are neither copied nor kept after the consumer releases them.
+    """
+    for subsound_start, subsound_end in bounds_of_subsounds:
+        if isinstance(sound, AudioBuffer):
+            yield sound.view(int(subsound_start), int(subsound_end))
+        else:
+            yield sound[int(subsound_start):int(subsound_end)]
+
+
 def stick_subsounds(subsounds: List[np.ndarray], bounds_of_subsounds: List[Tuple[int, int]],
                     indices: Tuple[int, int]) -> Tuple[np.ndarray, Tuple[int, int]]:
     subsound_start = bounds_of_subsounds[indices[0]][0]
@@ -102,17 +504,21 @@ def stick_subsounds(subsounds: List[np.ndarray], bounds_of_subsounds: List[Tuple
     return new_subsound, (subsound_start, subsound_end)
 
 
-def stick_short_subsounds_to_longer_neighbours(
-        subsounds: List[np.ndarray],
-        bounds_of_subsounds: List[Tuple[int, int]]
-) -> Tuple[List[np.ndarray], List[Tuple[int, int]]]:
-    n = len(subsounds)
-    if n < 2:
-        return subsounds, bounds_of_subsounds
+def stick_bounds(bounds_of_subsounds: np.ndarray, indices: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    The bounds-only variant of `stick_subsounds`: the sub-sounds from `indices[0]` to `indices[1] - 1`
+    are contiguous pieces of the same sound, so their union is just a slice between the outer bounds.
+    """
+    return int(bounds_of_subsounds[indices[0]][0]), int(bounds_of_subsounds[indices[1] - 1][1])
+
+
+def _find_subsounds_to_stick(lengths_of_subsounds: List[int],
+                             bounds_of_subsounds: Union[List[Tuple[int, int]], np.ndarray]) -> List[Tuple[int, int]]:
+    n = len(lengths_of_subsounds)
     indices_of_sticked_subsounds = []
     start_idx = -1
     for idx in range(n):
-        if subsounds[idx].shape[0] <= MIN_SOUND_LENGTH:
+        if lengths_of_subsounds[idx] <= MIN_SOUND_LENGTH:
             if start_idx < 0:
                 start_idx = idx
         else:
@@ -140,10 +546,37 @@ def stick_short_subsounds_to_longer_neighbours(
                 indices_of_sticked_subsounds.append((start_idx, n))
         else:
             indices_of_sticked_subsounds.append((start_idx, n))
+    return indices_of_sticked_subsounds
+
+
+def stick_short_subsounds_to_longer_neighbours(
+        subsounds: List[np.ndarray],
+        bounds_of_subsounds: List[Tuple[int, int]]
+) -> Tuple[List[np.ndarray], List[Tuple[int, int]]]:
+    n = len(subsounds)
+    if n < 2:
+        return subsounds, bounds_of_subsounds
     new_subsounds = []
     new_bounds_of_subsounds = []
-    for indices in indices_of_sticked_subsounds:
+    for indices in _find_subsounds_to_stick([it.shape[0] for it in subsounds], bounds_of_subsounds):
         subsound, bounds_of_subsound = stick_subsounds(subsounds, bounds_of_subsounds, indices)
         new_subsounds.append(subsound)
         new_bounds_of_subsounds.append(bounds_of_subsound)
     return new_subsounds, new_bounds_of_subsounds
+
+
+def stick_short_bounds_to_longer_neighbours(bounds_of_subsounds: np.ndarray) -> np.ndarray:
+    """
+    The bounds-only variant of `stick_short_subsounds_to_longer_neighbours` for the sub-sounds of the same sound
+    (e.g. found by `split_long_sound_bounds`). It returns an int64 array of shape (n_subsounds, 2) with the bounds
+    of the joined sub-sounds, and the samples are sliced by `iter_subsounds` only when they are consumed.
+    """
+    bounds_of_subsounds = np.asarray(bounds_of_subsounds, dtype=np.int64).reshape((-1, 2))
+    if bounds_of_subsounds.shape[0] < 2:
+        return bounds_of_subsounds
+    indices_of_sticked_subsounds = _find_subsounds_to_stick(
+        (bounds_of_subsounds[:, 1] - bounds_of_subsounds[:, 0]).tolist(),
+        bounds_of_subsounds
+    )
+    return np.array([stick_bounds(bounds_of_subsounds, indices) for indices in indices_of_sticked_subsounds],
+                    dtype=np.int64).reshape((-1, 2))
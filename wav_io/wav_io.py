@@ -1,78 +1,956 @@
-import os.path
-from typing import Tuple, Union
-import wave
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import queue
+import shutil
+import struct
+import subprocess
 import tempfile
+import threading
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+import wave
 
 import numpy as np
-from pydub import AudioSegment
-from pydub.exceptions import CouldntDecodeError
+from numpy.lib.stride_tricks import sliding_window_view
 
 
 TARGET_SAMPLING_FREQUENCY = 16_000
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+DOWNMIX_BLOCK_SIZE = 1 << 20  # frames per block when several channels are averaged
+CONVERSION_BLOCK_SIZE = 1 << 18  # frames per block when a WAV file is converted without FFmpeg
+RESAMPLING_FILTER_HALF_WIDTH = 10  # zero crossings of the windowed sinc on each side of the resampling filter
+RESAMPLING_KAISER_BETA = 5.0
+FFMPEG_EXECUTABLE = 'ffmpeg'
+FFPROBE_EXECUTABLE = 'ffprobe'
+PIPE_CHUNK_SIZE = 1 << 20  # bytes which are read from (or written to) the ffmpeg pipe at once
+DECODING_BUFFER_SIZE = TARGET_SAMPLING_FREQUENCY * 60  # initial capacity (in samples) of the decoding buffer
+AUDIO_CACHE_VERSION = 2  # increase it when the decoding changes, so the old cache entries are not used
+AUDIO_CACHE_MAX_SIZE = 10 * 1024 ** 3  # bytes
+PREFETCHED_BLOCKS = 2  # sound blocks which are decoded ahead of their processing
+PREFETCH_POLLING_INTERVAL = 0.1  # seconds
+
+
+class AudioInfo(NamedTuple):
+    duration: Optional[float]  # seconds, None if the container does not store it
+    n_channels: int
+    sampling_frequency: int
+    codec: str
+    container: str
+
+
+class WavHeader(NamedTuple):
+    audio_format: int
+    n_channels: int
+    sampling_frequency: int
+    bytes_per_sample: int
+    data_offset: int
+    n_frames: int
+
+
+def _source_name(source: Union[str, BinaryIO]) -> str:
+    if isinstance(source, str):
+        return source
+    source_name = getattr(source, 'name', None)
+    if not isinstance(source_name, str):
+        source_name = '<stream>'
+    return source_name
+
+
+def _parse_wav_header(fp: BinaryIO, source_name: str) -> WavHeader:
+    err_msg_prefix = f'"{source_name}": cannot be read as a valid WAV file.'
+    start_pos = fp.tell()
+    fp.seek(0, os.SEEK_END)
+    file_size = fp.tell()
+    fp.seek(start_pos, os.SEEK_SET)
+    riff_header = fp.read(12)
+    if (len(riff_header) < 12) or (riff_header[0:4] != b'RIFF') or (riff_header[8:12] != b'WAVE'):
+        raise ValueError(f'{err_msg_prefix} The RIFF/WAVE signature is not found.')
+    fmt_chunk = None
+    data_offset = -1
+    data_size = 0
+    while True:
+        chunk_header = fp.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id = chunk_header[0:4]
+        chunk_size = struct.unpack('<I', chunk_header[4:8])[0]
+        if chunk_id == b'fmt ':
+            fmt_chunk = fp.read(chunk_size)
+            if (chunk_size % 2) != 0:
+                fp.seek(1, os.SEEK_CUR)
+        elif chunk_id == b'data':
+            data_offset = fp.tell()
+            data_size = min(chunk_size, file_size - data_offset)
+            break
+        else:
+            fp.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+    if (fmt_chunk is None) or (len(fmt_chunk) < 16):
+        raise ValueError(f'{err_msg_prefix} The "fmt " chunk is not found.')
+    if data_offset < 0:
+        raise ValueError(f'{err_msg_prefix} The "data" chunk is not found.')
+    audio_format, n_channels, fs, _, block_align, bits_per_sample = struct.unpack('<HHIIHH', fmt_chunk[0:16])
+    if (audio_format == WAVE_FORMAT_EXTENSIBLE) and (len(fmt_chunk) >= 26):
+        audio_format = struct.unpack('<H', fmt_chunk[24:26])[0]
+    if (n_channels < 1) or (fs < 1) or (bits_per_sample < 1):
+        raise ValueError(f'{err_msg_prefix} The "fmt " chunk is wrong.')
+    bytes_per_sample = (bits_per_sample + 7) // 8
+    if block_align != n_channels * bytes_per_sample:
+        block_align = n_channels * bytes_per_sample
+    return WavHeader(
+        audio_format=audio_format,
+        n_channels=n_channels,
+        sampling_frequency=fs,
+        bytes_per_sample=bytes_per_sample,
+        data_offset=data_offset,
+        n_frames=data_size // block_align
+    )
+
+
+def read_wav_header(source: Union[str, BinaryIO]) -> WavHeader:
+    """
+    Parses the RIFF/WAVE header of a file (or a seekable binary stream) without reading the sound samples.
+
+    Returns the sample format description and the position of the PCM data chunk in the file.
+    Raises ValueError if the file is not a valid WAV file. The stream position is restored.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as fp:
+            return _parse_wav_header(fp, source)
+    start_pos = source.tell()
+    try:
+        return _parse_wav_header(source, _source_name(source))
+    finally:
+        source.seek(start_pos, os.SEEK_SET)
+
+
+def map_pcm(fname: str, header: WavHeader) -> np.ndarray:
+    """
+    Memory-maps the 8-bit or 16-bit PCM data chunk of a WAV file without copying it.
+
+    Returns a read-only 2-D array of shape (n_frames, n_channels): uint8 for 8-bit sound, int16 for 16-bit one.
+    """
+    if (header.audio_format != WAVE_FORMAT_PCM) or (header.bytes_per_sample not in {1, 2}):
+        err_msg = f'"{fname}": only 8-bit and 16-bit PCM can be memory-mapped, ' \
+                  f'got {8 * header.bytes_per_sample}-bit sound with format tag {header.audio_format}.'
+        raise ValueError(err_msg)
+    return np.memmap(
+        fname, mode='r', offset=header.data_offset,
+        dtype=np.uint8 if header.bytes_per_sample == 1 else np.dtype('<i2'),
+        shape=(header.n_frames, header.n_channels)
+    )
+
+
+def pcm_to_float32(pcm: np.ndarray) -> np.ndarray:
+    """
+    Converts a (usually small) slice of 8-bit or 16-bit PCM samples to float32 waveform in [-1.0, 1.0).
+    Float arrays are returned as float32 without rescaling.
+    """
+    if pcm.dtype == np.uint8:
+        res = np.subtract(pcm, 128.0, dtype=np.float32)
+        res *= (1.0 / 128.0)
+    elif pcm.dtype == np.int16:
+        res = np.multiply(pcm, 1.0 / 32768.0, dtype=np.float32)
+    else:
+        res = np.asarray(pcm, dtype=np.float32)
+    return res
+
+
+def float32_to_pcm(sound: np.ndarray) -> np.ndarray:
+    """
+    Quantizes a float32 waveform in [-1.0, 1.0] to 16-bit PCM with rounding and clipping.
+    """
+    res = np.multiply(sound, 32768.0, dtype=np.float32)
+    np.rint(res, out=res)
+    np.clip(res, -32768.0, 32767.0, out=res)
+    return res.astype(np.int16)
+
+
+def downmix_to_mono(sound: Union[np.ndarray, Tuple[np.ndarray, ...]],
+                    block_size: int = DOWNMIX_BLOCK_SIZE, dtype: type = np.float32) -> np.ndarray:
+    """
+    Averages channels into one waveform in a single pass.
+
+    Arguments:
+    - sound: a mono waveform, a tuple of channel waveforms (as returned by `load_sound`) or a 2-D array
+      of shape (n_frames, n_channels). The channels may be float32 waveforms or PCM views (uint8 or int16).
+    - block_size: a number of frames which are converted at once, so no full-length temporary arrays
+      are allocated except the output.
+    - dtype: np.float32 for a waveform in [-1.0, 1.0), or np.int16 for 16-bit PCM.
+    """
+    if isinstance(sound, np.ndarray) and (len(sound.shape) == 2):
+        channels = tuple(sound[:, channel_idx] for channel_idx in range(sound.shape[1]))
+    elif isinstance(sound, np.ndarray):
+        channels = (sound,)
+    else:
+        channels = tuple(sound)
+    if (len(channels) == 1) and (channels[0].dtype == dtype):
+        return channels[0]
+    n_frames = min(channel.shape[0] for channel in channels)
+    mono_sound = np.empty((n_frames,), dtype=dtype)
+    for block_start in range(0, n_frames, block_size):
+        block_end = min(n_frames, block_start + block_size)
+        block = pcm_to_float32(channels[0][block_start:block_end])
+        if len(channels) > 1:
+            if np.may_share_memory(block, channels[0]):
+                block = block.copy()
+            for channel in channels[1:]:
+                block += pcm_to_float32(channel[block_start:block_end])
+            block /= float(len(channels))
+        mono_sound[block_start:block_end] = block if dtype == np.float32 else float32_to_pcm(block)
+        del block
+    return mono_sound
+
+
+class AudioBuffer:
+    """
+    A compact mono 16kHz waveform: 16-bit (or 8-bit) PCM samples, in memory or memory-mapped from a file.
+
+    The buffer imitates a 1-D float32 array: `len(buffer)` and `buffer.shape` give the number of samples,
+    and `buffer[start:end]` returns a float32 waveform in [-1.0, 1.0) for this slice only, so the whole sound
+    is stored with 2 bytes per sample instead of 4. Use `view` to get a zero-copy sub-buffer.
+
+    Example:
+    ```
+    buffer = AudioBuffer(decode_audio('data/interview.mp3'))
+    waveform_of_first_second = buffer[0:TARGET_SAMPLING_FREQUENCY]
+    ```
+    """
+    def __init__(self, pcm: np.ndarray):
+        if not isinstance(pcm, np.ndarray):
+            err_msg = f'The sound is wrong! Expected {type(np.array([1, 2]))}, got {type(pcm)}.'
+            raise ValueError(err_msg)
+        if len(pcm.shape) != 1:
+            err_msg = f'The sound channel number is wrong! Expected 1, got {len(pcm.shape)}.'
+            raise ValueError(err_msg)
+        if pcm.dtype not in {np.dtype(np.int16), np.dtype(np.uint8)}:
+            err_msg = f'The sound sample type is wrong! Expected int16 or uint8, got {pcm.dtype}.'
+            raise ValueError(err_msg)
+        self.pcm = pcm
+
+    @classmethod
+    def from_float32(cls, sound: np.ndarray, block_size: int = DOWNMIX_BLOCK_SIZE) -> 'AudioBuffer':
+        return cls(downmix_to_mono(sound, block_size=block_size, dtype=np.int16))
+
+    @property
+    def shape(self) -> Tuple[int]:
+        return self.pcm.shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.pcm.nbytes
+
+    def __len__(self) -> int:
+        return self.pcm.shape[0]
+
+    def __getitem__(self, item) -> Union[np.ndarray, float]:
+        if isinstance(item, slice):
+            return pcm_to_float32(self.pcm[item])
+        return float(pcm_to_float32(np.asarray(self.pcm[item]).reshape((1,)))[0])
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        res = pcm_to_float32(self.pcm)
+        if (dtype is not None) and (np.dtype(dtype) != res.dtype):
+            res = res.astype(dtype)
+        return res
 
+    def view(self, start: int, end: int) -> 'AudioBuffer':
+        return AudioBuffer(self.pcm[start:end])
 
-def load_sound(fname: str) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray], None]:
+
+def is_convertible_wav(header: WavHeader) -> bool:
+    """
+    Checks whether a WAV file with this header can be converted by `convert_wav` without FFmpeg.
+    """
+    if header.audio_format == WAVE_FORMAT_PCM:
+        return header.bytes_per_sample in {1, 2, 3, 4}
+    if header.audio_format == WAVE_FORMAT_IEEE_FLOAT:
+        return header.bytes_per_sample in {4, 8}
+    return False
+
+
+def decode_pcm_frames(data: bytes, header: WavHeader) -> np.ndarray:
+    """
+    Decodes raw bytes of the WAV data chunk into a float32 array of shape (n_frames, n_channels).
+
+    8-bit, 16-bit, 24-bit and 32-bit integer PCM are scaled to [-1.0, 1.0), and 32-bit or 64-bit float samples
+    are kept as is. An incomplete trailing frame is ignored.
+    """
+    if not is_convertible_wav(header):
+        err_msg = f'The WAV sample format is not supported: {8 * header.bytes_per_sample}-bit sound ' \
+                  f'with format tag {header.audio_format}.'
+        raise ValueError(err_msg)
+    frame_size = header.bytes_per_sample * header.n_channels
+    n_frames = len(data) // frame_size
+    raw = np.frombuffer(data, dtype=np.uint8, count=n_frames * frame_size)
+    if header.audio_format == WAVE_FORMAT_IEEE_FLOAT:
+        samples = raw.view('<f4' if header.bytes_per_sample == 4 else '<f8').astype(np.float32)
+    elif header.bytes_per_sample == 1:
+        samples = pcm_to_float32(raw)
+    elif header.bytes_per_sample == 2:
+        samples = pcm_to_float32(raw.view('<i2'))
+    elif header.bytes_per_sample == 3:
+        triples = raw.reshape((-1, 3)).astype(np.int32)
+        int_samples = (triples[:, 0] << 8) | (triples[:, 1] << 16) | (triples[:, 2] << 24)
+        del triples
+        int_samples >>= 8
+        samples = np.multiply(int_samples, 1.0 / 8388608.0, dtype=np.float32)
+        del int_samples
+    else:
+        samples = np.multiply(raw.view('<i4'), 1.0 / 2147483648.0, dtype=np.float32)
+    return samples.reshape((n_frames, header.n_channels))
+
+
+class PolyphaseResampler:
+    """
+    Streaming polyphase resampler with a Kaiser-windowed sinc filter.
+
+    The sampling frequency is changed by the rational factor `up / down` (for example, 160/441 for 44.1kHz
+    to 16kHz), but the upsampled signal is never built: every output sample is a dot product of the last
+    input samples and one of `up` filter phases. Outputs with the same phase are computed at once as
+    a matrix-vector product over a strided view of the input, so a block is resampled in `up` vectorized steps.
+
+    The sound may be fed block by block with `process`, and the concatenated outputs are identical to the result
+    of resampling the whole sound at once. The last block must be passed with `final=True` to flush the filter.
+
+    Example:
+    ```
+    resampler = PolyphaseResampler(44_100, TARGET_SAMPLING_FREQUENCY)
+    first_part = resampler.process(sound[:100_000])
+    second_part = resampler.process(sound[100_000:], final=True)
+    ```
+    """
+    def __init__(self, src_fs: int, dst_fs: int, half_width: int = RESAMPLING_FILTER_HALF_WIDTH,
+                 kaiser_beta: float = RESAMPLING_KAISER_BETA):
+        if (src_fs < 1) or (dst_fs < 1):
+            err_msg = f'The sampling frequencies are wrong! Expected positive values, got {src_fs} and {dst_fs}.'
+            raise ValueError(err_msg)
+        if half_width < 1:
+            err_msg = f'The filter half-width is wrong! Expected a positive value, got {half_width}.'
+            raise ValueError(err_msg)
+        common_divisor = math.gcd(src_fs, dst_fs)
+        self.up = dst_fs // common_divisor
+        self.down = src_fs // common_divisor
+        self.half_len = half_width * max(self.up, self.down)
+        cutoff = 1.0 / max(self.up, self.down)
+        taps = np.arange(-self.half_len, self.half_len + 1, dtype=np.float64)
+        impulse_response = cutoff * np.sinc(cutoff * taps) * np.kaiser(taps.shape[0], kaiser_beta)
+        impulse_response *= self.up / np.sum(impulse_response)
+        self.n_taps = (impulse_response.shape[0] + self.up - 1) // self.up
+        impulse_response = np.concatenate((
+            impulse_response,
+            np.zeros((self.n_taps * self.up - impulse_response.shape[0],), dtype=np.float64)
+        ))
+        # filters[phase, k] is applied to the k-th sample of the input window which ends at the current position
+        self.filters = np.ascontiguousarray(impulse_response.reshape((self.n_taps, self.up))[::-1].T,
+                                            dtype=np.float32)
+        self.reset()
+
+    def reset(self) -> None:
+        self._buffer = np.zeros((self.n_taps - 1,), dtype=np.float32)
+        self._buffer_start = 1 - self.n_taps  # input index of the first sample in the buffer
+        self._n_input = 0
+        self._n_output = 0
+
+    def output_length(self, n_input: int) -> int:
+        return (n_input * self.up + self.down - 1) // self.down
+
+    def _window_end(self, output_idx: int) -> int:
+        return (output_idx * self.down + self.half_len) // self.up
+
+    def process(self, sound: np.ndarray, final: bool = False) -> np.ndarray:
+        sound = np.asarray(sound, dtype=np.float32)
+        if len(sound.shape) != 1:
+            err_msg = f'The sound channel number is wrong! Expected 1, got {len(sound.shape)}.'
+            raise ValueError(err_msg)
+        if self.up == self.down:
+            if final:
+                self.reset()
+            return sound
+        self._n_input += sound.shape[0]
+        if final:
+            output_end = self.output_length(self._n_input)
+        else:
+            output_end = max(self._n_output, -((self.half_len - self._n_input * self.up) // self.down))
+        output_start = self._n_output
+        parts = [self._buffer, sound]
+        if final and (output_end > output_start):
+            n_padding = self._window_end(output_end - 1) - (self._n_input - 1)
+            if n_padding > 0:
+                parts.append(np.zeros((n_padding,), dtype=np.float32))
+        buffer = np.concatenate(parts)
+        del parts
+
+        res = np.empty((output_end - output_start,), dtype=np.float32)
+        windows = sliding_window_view(buffer, self.n_taps)
+        for residue in range(min(self.up, output_end - output_start)):
+            output_idx = output_start + residue
+            phase = (output_idx * self.down + self.half_len) % self.up
+            window_start = self._window_end(output_idx) - self.n_taps + 1 - self._buffer_start
+            n_outputs = (output_end - output_idx + self.up - 1) // self.up
+            res[residue::self.up] = windows[window_start::self.down][:n_outputs] @ self.filters[phase]
+        del windows
+
+        if final:
+            self.reset()
+        else:
+            self._n_output = output_end
+            next_window_start = self._window_end(output_end) - self.n_taps + 1
+            self._buffer = buffer[(next_window_start - self._buffer_start):].copy()
+            self._buffer_start = next_window_start
+        return res
+
+
+def resample_sound(sound: np.ndarray, src_fs: int, dst_fs: int = TARGET_SAMPLING_FREQUENCY,
+                   block_size: int = CONVERSION_BLOCK_SIZE) -> np.ndarray:
+    """
+    Resamples a mono float32 waveform with the polyphase filter, block by block.
+    """
+    resampler = PolyphaseResampler(src_fs, dst_fs)
+    if resampler.up == resampler.down:
+        return np.asarray(sound, dtype=np.float32)
+    res = np.empty((resampler.output_length(sound.shape[0]),), dtype=np.float32)
+    n_samples = 0
+    for block_start in range(0, max(sound.shape[0], 1), block_size):
+        block_end = min(sound.shape[0], block_start + block_size)
+        block = resampler.process(sound[block_start:block_end], final=(block_end >= sound.shape[0]))
+        res[n_samples:(n_samples + block.shape[0])] = block
+        n_samples += block.shape[0]
+        del block
+    return res
+
+
+def _iter_wav_pcm(source: Union[str, BinaryIO], header: WavHeader, block_size: int = CONVERSION_BLOCK_SIZE,
+                  keep_channels: bool = False) -> Iterator[np.ndarray]:
+    resamplers = [PolyphaseResampler(header.sampling_frequency, TARGET_SAMPLING_FREQUENCY)
+                  for _ in range(header.n_channels if keep_channels else 1)]
+    frame_size = header.bytes_per_sample * header.n_channels
+    fp = open(source, 'rb') if isinstance(source, str) else source
+    try:
+        fp.seek(header.data_offset, os.SEEK_SET)
+        for block_start in range(0, header.n_frames, block_size):
+            block_end = min(header.n_frames, block_start + block_size)
+            data = fp.read((block_end - block_start) * frame_size)
+            frames = decode_pcm_frames(data, header)
+            del data
+            final = (block_end >= header.n_frames) or (frames.shape[0] < (block_end - block_start))
+            if keep_channels:
+                block = np.stack([cur_resampler.process(frames[:, channel_idx], final=final)
+                                  for channel_idx, cur_resampler in enumerate(resamplers)], axis=1)
+            else:
+                block = resamplers[0].process(downmix_to_mono(frames), final=final)
+            del frames
+            yield float32_to_pcm(block)
+            del block
+            if final:
+                break
+    finally:
+        if isinstance(source, str):
+            fp.close()
+
+
+def convert_wav(source: Union[str, BinaryIO], header: Optional[WavHeader] = None,
+                block_size: int = CONVERSION_BLOCK_SIZE, keep_channels: bool = False) -> Optional[np.ndarray]:
+    """
+    Converts a WAV file of any common sample format to mono 16kHz 16-bit PCM without FFmpeg.
+
+    The data chunk is read block by block: each block is decoded, downmixed and resampled to
+    `TARGET_SAMPLING_FREQUENCY`, so only the output is allocated for the whole sound.
+
+    Arguments:
+    - source: a file name or a seekable binary file object.
+    - header: the header returned by `read_wav_header`, if it is already parsed.
+    - block_size: a number of frames which are converted at once.
+    - keep_channels: if True, the channels are resampled separately instead of being downmixed.
+
+    Returns an int16 waveform (or a 2-D array of shape (n_samples, n_channels) if `keep_channels` is True)
+    or None for an empty sound.
+    """
+    if header is None:
+        header = read_wav_header(source)
+    if header.n_frames == 0:
+        return None
+    if not is_convertible_wav(header):
+        err_msg = f'"{_source_name(source)}": the WAV sample format is not supported: ' \
+                  f'{8 * header.bytes_per_sample}-bit sound with format tag {header.audio_format}.'
+        raise ValueError(err_msg)
+    n_output_samples = PolyphaseResampler(header.sampling_frequency, TARGET_SAMPLING_FREQUENCY).output_length(
+        header.n_frames
+    )
+    if keep_channels:
+        res = np.empty((n_output_samples, header.n_channels), dtype=np.int16)
+    else:
+        res = np.empty((n_output_samples,), dtype=np.int16)
+    n_samples = 0
+    for block in _iter_wav_pcm(source, header, block_size, keep_channels):
+        block = block[:(res.shape[0] - n_samples)]
+        res[n_samples:(n_samples + block.shape[0])] = block
+        n_samples += block.shape[0]
+        del block
+    if n_samples == 0:
+        return None
+    if n_samples < res.shape[0]:
+        res.resize((n_samples,) + res.shape[1:], refcheck=False)
+    return res
+
+
+def as_waveform(sound: Union[np.ndarray, AudioBuffer]) -> np.ndarray:
+    """
+    Returns a float32 waveform of the sound, converting an AudioBuffer (or PCM samples) only here.
+    """
+    if isinstance(sound, AudioBuffer):
+        return sound[:]
+    return pcm_to_float32(sound)
+
+
+def load_sound(fname: str, use_mmap: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray], None]:
     """
     Loads .wav audio. Automatically converts to mono, 16kHz, 16-bit PCM if needed.
 
+    If `use_mmap` is True, PCM arrays (uint8 or int16) are returned instead of float32 waveforms, and if the sound
+    is already 8-bit or 16-bit PCM with 16kHz, the data chunk is memory-mapped instead of being read. Use
+    `pcm_to_float32` for the slices you need (or wrap a mono sound into `AudioBuffer`) and `downmix_to_mono`
+    for stereo.
+
     Returns:
     - A waveform array for mono-channel sound
     - Tuple of two waveform arrays for two-channel sound
     """
-    def _read_and_decode(filepath: str):
-        with wave.open(filepath, 'rb') as fp:
-            n_channels = fp.getnchannels()
-            fs = fp.getframerate()
-            bytes_per_sample = fp.getsampwidth()
-            sound_length = fp.getnframes()
-            sound_bytes = fp.readframes(sound_length)
-
-        if sound_length == 0:
-            return None
+    header = read_wav_header(fname)
+    if header.n_frames == 0:
+        return None
 
-        if bytes_per_sample == 1:
-            data = np.frombuffer(sound_bytes, dtype=np.uint8)
+    if (header.audio_format == WAVE_FORMAT_PCM) and (header.n_channels in {1, 2}) and \
+            (header.sampling_frequency == TARGET_SAMPLING_FREQUENCY) and (header.bytes_per_sample in {1, 2}):
+        pcm = map_pcm(fname, header)
+        if header.n_channels == 1:
+            channels = (pcm[:, 0],)
         else:
-            data = np.frombuffer(sound_bytes, dtype=np.int16)
+            channels = (pcm[:, 0], pcm[:, 1])
+        if not use_mmap:
+            channels = tuple(pcm_to_float32(it) for it in channels)
+        del pcm
+        return channels[0] if len(channels) == 1 else channels
 
-        if len(data.shape) != 1:
-            raise ValueError(f'"{filepath}": the loaded data is wrong! Expected 1-d array, got {len(data.shape)}-d one.')
+    print(f'Автоконвертация "{fname}" (channels={header.n_channels}, fs={header.sampling_frequency}, '
+          f'width={header.bytes_per_sample}) → mono, 16kHz, 16-bit')
+    if is_convertible_wav(header):
+        pcm = convert_wav(fname, header)
+    else:
+        pcm = decode_audio(fname)
+    if (pcm is None) or use_mmap:
+        return pcm
+    return pcm_to_float32(pcm)
 
-        if n_channels == 1:
-            if bytes_per_sample == 1:
-                return (data.astype(np.float32) - 128.0) / 128.0
-            else:
-                return data.astype(np.float32) / 32768.0
-        else:
-            ch1 = data[0::2]
-            ch2 = data[1::2]
-            if bytes_per_sample == 1:
-                return (
-                    (ch1.astype(np.float32) - 128.0) / 128.0,
-                    (ch2.astype(np.float32) - 128.0) / 128.0,
-                )
-            else:
-                return (
-                    ch1.astype(np.float32) / 32768.0,
-                    ch2.astype(np.float32) / 32768.0,
-                )
 
+def _feed_ffmpeg(proc: subprocess.Popen, fileobj: BinaryIO) -> None:
     try:
-        with wave.open(fname, 'rb') as fp:
-            n_channels = fp.getnchannels()
-            fs = fp.getframerate()
-            bytes_per_sample = fp.getsampwidth()
+        while True:
+            chunk = fileobj.read(PIPE_CHUNK_SIZE)
+            if not chunk:
+                break
+            proc.stdin.write(chunk)
+    except (BrokenPipeError, ValueError):
+        pass
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
 
-        if n_channels in {1, 2} and fs == TARGET_SAMPLING_FREQUENCY and bytes_per_sample in {1, 2}:
-            return _read_and_decode(fname)
-        else:
-            print(f'Автоконвертация "{fname}" (channels={n_channels}, fs={fs}, width={bytes_per_sample}) → mono, 16kHz, 16-bit')
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=True) as tmp:
-                transform_to_wavpcm(fname, tmp.name)
-                return _read_and_decode(tmp.name)
 
-    except wave.Error as e:
-        raise ValueError(f'"{fname}": cannot be read as a valid WAV file. {str(e)}')
+def _collect_ffmpeg_errors(proc: subprocess.Popen, messages: list) -> None:
+    for line in proc.stderr:
+        messages.append(line.decode('utf-8', errors='replace').strip())
+        del messages[:-10]
+
+
+def _try_read_wav_header(source: Union[str, BinaryIO]) -> Optional[WavHeader]:
+    if (not isinstance(source, str)) and ((not hasattr(source, 'seekable')) or (not source.seekable())):
+        return None
+    try:
+        return read_wav_header(source)
+    except ValueError:
+        return None
+
+
+def _spool_stream(fileobj: BinaryIO) -> str:
+    # FFmpeg cannot demux some containers from a pipe (e.g. MP4 with the moov atom after the samples),
+    # so a stream is written into a temporary file, which is removed by the caller.
+    with tempfile.NamedTemporaryFile(mode='wb', prefix='pisets_', suffix='.audio', delete=False) as fp:
+        spooled_name = fp.name
+        try:
+            shutil.copyfileobj(fileobj, fp, PIPE_CHUNK_SIZE)
+        except BaseException:
+            fp.close()
+            os.remove(spooled_name)
+            raise
+    return spooled_name
+
+
+def _start_ffmpeg(cmd: List[str], source: Union[str, BinaryIO],
+                  program_name: str = 'FFmpeg') -> Tuple[subprocess.Popen, List[threading.Thread], List[str]]:
+    try:
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            stdin=(subprocess.DEVNULL if isinstance(source, str) else subprocess.PIPE)
+        )
+    except OSError as err:
+        err_msg = f'The file "{_source_name(source)}" cannot be opened. ' \
+                  f'{program_name} cannot be started: {str(err)}'
+        raise IOError(err_msg)
+    error_messages = []
+    helper_threads = [threading.Thread(target=_collect_ffmpeg_errors, args=(proc, error_messages), daemon=True)]
+    if not isinstance(source, str):
+        helper_threads.append(threading.Thread(target=_feed_ffmpeg, args=(proc, source), daemon=True))
+    for cur_thread in helper_threads:
+        cur_thread.start()
+    return proc, helper_threads, error_messages
+
+
+def _finish_ffmpeg(proc: subprocess.Popen, helper_threads: List[threading.Thread], error_messages: List[str],
+                   terminate: bool = False) -> int:
+    proc.stdout.close()
+    if terminate and (proc.poll() is None):
+        proc.kill()
+    return_code = proc.wait()
+    for cur_thread in helper_threads:
+        cur_thread.join()
+    proc.stderr.close()
+    return return_code
+
+
+def _check_ffmpeg_result(return_code: int, error_messages: List[str], source: Union[str, BinaryIO]) -> None:
+    if return_code != 0:
+        err_msg = f'The file "{_source_name(source)}" cannot be opened.'
+        if len(error_messages) > 0:
+            err_msg += ' ' + ' '.join(error_messages)
+        raise IOError(err_msg)
+
+
+def _ffmpeg_decoding_command(source: Union[str, BinaryIO], n_channels: int = 1) -> List[str]:
+    return [
+        FFMPEG_EXECUTABLE, '-hide_banner', '-loglevel', 'error',
+        '-i', (source if isinstance(source, str) else 'pipe:0'), '-vn',
+        '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', f'{n_channels}', '-ar', f'{TARGET_SAMPLING_FREQUENCY}', 'pipe:1'
+    ]
+
+
+def decode_audio(source: Union[str, BinaryIO], keep_channels: bool = False) -> Optional[np.ndarray]:
+    """
+    Decodes any sound (or video) supported by FFmpeg into mono 16kHz 16-bit PCM.
+
+    WAV files of common sample formats (and seekable WAV streams) are converted in-process by `convert_wav`.
+    For other formats, FFmpeg is run once with raw s16le output into a pipe, and the pipe is read in chunks
+    straight into a growing NumPy buffer. A stream of another format is written into a temporary file first,
+    because FFmpeg cannot demux some containers (e.g. MP4 with the moov atom at the end) from a pipe.
+
+    Arguments:
+    - source: a file name or a binary file object (e.g. an uploaded file stream).
+    - keep_channels: if True, the channels are not downmixed. The channel number of a non-WAV sound is probed
+      with `probe_audio`, so a stream has to be seekable in this case.
+
+    Returns an int16 waveform (use `pcm_to_float32` to convert it or its slices), or a 2-D int16 array of shape
+    (n_samples, n_channels) if `keep_channels` is True, or None for an empty sound.
+
+    Raises IOError if FFmpeg fails, or if it decodes nothing and reports errors.
+    """
+    if isinstance(source, str):
+        if not os.path.isfile(source):
+            err_msg = f'The file "{source}" does not exist!'
+            raise IOError(err_msg)
+    wav_header = _try_read_wav_header(source)
+    if (wav_header is not None) and is_convertible_wav(wav_header):
+        return convert_wav(source, wav_header, keep_channels=keep_channels)
+    if not isinstance(source, str):
+        spooled_name = _spool_stream(source)
+        try:
+            return decode_audio(spooled_name, keep_channels=keep_channels)
+        finally:
+            os.remove(spooled_name)
+    n_channels = max(1, probe_audio(source).n_channels) if keep_channels else 1
+    proc, helper_threads, error_messages = _start_ffmpeg(_ffmpeg_decoding_command(source, n_channels), source)
+
+    buffer = np.empty((DECODING_BUFFER_SIZE,), dtype=np.int16)
+    n_bytes = 0
+    try:
+        while True:
+            if (buffer.nbytes - n_bytes) < PIPE_CHUNK_SIZE:
+                new_buffer = np.empty((max(2 * buffer.shape[0], (n_bytes + PIPE_CHUNK_SIZE) // 2),), dtype=np.int16)
+                new_buffer[:(n_bytes // 2)] = buffer[:(n_bytes // 2)]
+                if (n_bytes % 2) != 0:
+                    new_buffer.view(np.uint8)[n_bytes - 1] = buffer.view(np.uint8)[n_bytes - 1]
+                buffer = new_buffer
+                del new_buffer
+            with memoryview(buffer).cast('B') as buffer_view:
+                n_read = proc.stdout.readinto(buffer_view[n_bytes:(n_bytes + PIPE_CHUNK_SIZE)])
+            if not n_read:
+                break
+            n_bytes += n_read
+    finally:
+        return_code = _finish_ffmpeg(proc, helper_threads, error_messages)
+    _check_ffmpeg_result(return_code, error_messages, source)
+
+    n_samples = n_bytes // (2 * n_channels)
+    if n_samples == 0:
+        if len(error_messages) > 0:
+            # FFmpeg may exit with 0 after a demuxing error, so the errors are checked too
+            err_msg = f'The file "{_source_name(source)}" cannot be decoded. ' + ' '.join(error_messages)
+            raise IOError(err_msg)
+        return None
+    buffer.resize((n_samples * n_channels,), refcheck=False)
+    if keep_channels:
+        return buffer.reshape((n_samples, n_channels))
+    return buffer
+
+
+def _iter_ffmpeg_pcm(source: Union[str, BinaryIO]) -> Iterator[np.ndarray]:
+    proc, helper_threads, error_messages = _start_ffmpeg(_ffmpeg_decoding_command(source), source)
+    is_finished = False
+    try:
+        while True:
+            data = proc.stdout.read(PIPE_CHUNK_SIZE)
+            if len(data) >= 2:
+                yield np.frombuffer(data, dtype='<i2', count=len(data) // 2).astype(np.int16)
+            if len(data) < PIPE_CHUNK_SIZE:
+                break
+            del data
+        is_finished = True
+    finally:
+        return_code = _finish_ffmpeg(proc, helper_threads, error_messages, terminate=(not is_finished))
+    _check_ffmpeg_result(return_code, error_messages, source)
+
+
+def iter_sound_blocks(source: Union[str, BinaryIO], block_seconds: float, overlap_seconds: float = 0.0,
+                      dtype: type = np.float32) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Reads a sound of any length block by block as mono 16kHz waveform.
+
+    WAV files are converted in-process by the streaming resampler, and other formats are decoded by FFmpeg
+    through a pipe, so the memory usage does not depend on the sound duration. A stream of another format
+    is written into a temporary file first (see `decode_audio`). Each block starts
+    `overlap_seconds` before the end of the previous one; the last block may be shorter.
+
+    Arguments:
+    - source: a file name or a binary file object.
+    - block_seconds: a block duration in seconds.
+    - overlap_seconds: an overlap between neighbouring blocks in seconds.
+    - dtype: np.float32 for waveforms in [-1.0, 1.0), or np.int16 for 16-bit PCM.
+
+    Yields pairs of the absolute offset of a block (in samples at `TARGET_SAMPLING_FREQUENCY`) and the block.
+
+    Example:
+    ```
+    for block_start, block in iter_sound_blocks('data/long_interview.mp3', block_seconds=60.0, overlap_seconds=1.0):
+        process(block, block_start / TARGET_SAMPLING_FREQUENCY)
+    ```
+    """
+    block_size = round(block_seconds * TARGET_SAMPLING_FREQUENCY)
+    overlap_size = round(overlap_seconds * TARGET_SAMPLING_FREQUENCY)
+    if block_size < 1:
+        err_msg = f'The block duration is too short! Expected a positive value, got {block_seconds} seconds.'
+        raise ValueError(err_msg)
+    if (overlap_size < 0) or (overlap_size >= block_size):
+        err_msg = f'The block overlap is wrong! Expected a non-negative value which is less than the block ' \
+                  f'duration {block_seconds}, got {overlap_seconds} seconds.'
+        raise ValueError(err_msg)
+    if dtype not in {np.float32, np.int16}:
+        err_msg = f'The sample type is wrong! Expected float32 or int16, got {dtype}.'
+        raise ValueError(err_msg)
+    if isinstance(source, str):
+        if not os.path.isfile(source):
+            err_msg = f'The file "{source}" does not exist!'
+            raise IOError(err_msg)
+    wav_header = _try_read_wav_header(source)
+    spooled_name = None
+    if (wav_header is not None) and is_convertible_wav(wav_header):
+        chunks = _iter_wav_pcm(source, wav_header)
+    else:
+        if not isinstance(source, str):
+            spooled_name = _spool_stream(source)
+        chunks = _iter_ffmpeg_pcm(source if spooled_name is None else spooled_name)
+
+    block = np.empty((block_size,), dtype=np.int16)
+    block_start = 0
+    n_filled = 0  # samples in the current block
+    n_yielded = 0  # samples at the beginning of the current block which are already yielded (the overlap)
+    try:
+        for chunk in chunks:
+            chunk_pos = 0
+            while chunk_pos < chunk.shape[0]:
+                n_copied = min(block_size - n_filled, chunk.shape[0] - chunk_pos)
+                block[n_filled:(n_filled + n_copied)] = chunk[chunk_pos:(chunk_pos + n_copied)]
+                n_filled += n_copied
+                chunk_pos += n_copied
+                if n_filled == block_size:
+                    next_block = np.empty((block_size,), dtype=np.int16)
+                    next_block[0:overlap_size] = block[(block_size - overlap_size):]
+                    yield block_start, (pcm_to_float32(block) if dtype == np.float32 else block)
+                    block = next_block
+                    del next_block
+                    block_start += (block_size - overlap_size)
+                    n_filled = overlap_size
+                    n_yielded = overlap_size
+            del chunk
+    finally:
+        chunks.close()
+        if spooled_name is not None:
+            os.remove(spooled_name)
+    if n_filled > n_yielded:
+        block = block[0:n_filled]
+        yield block_start, (pcm_to_float32(block) if dtype == np.float32 else block)
+
+
+def prefetch_sound_blocks(blocks: Iterator[Tuple[int, np.ndarray]],
+                          max_prefetched: int = PREFETCHED_BLOCKS) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Iterates `blocks` (e.g. of `iter_sound_blocks`) in a background thread, so the next blocks are decoded
+    while the current one is processed. No more than `max_prefetched` blocks are kept waiting, so the memory usage
+    does not depend on the sound duration. An exception of the decoding is raised by this iterator, and if the
+    iteration is stopped early, then the decoding is stopped too.
+
+    Example:
+    ```
+    for block_start, block in prefetch_sound_blocks(iter_sound_blocks('data/long_interview.mp3', 60.0)):
+        process(block, block_start / TARGET_SAMPLING_FREQUENCY)
+    ```
+    """
+    if max_prefetched < 1:
+        err_msg = f'The number of prefetched blocks is wrong! Expected a positive value, got {max_prefetched}.'
+        raise ValueError(err_msg)
+    prefetched: queue.Queue = queue.Queue(maxsize=max_prefetched)
+    is_stopped = threading.Event()
+    end_of_blocks = object()
+
+    def put_item(item) -> bool:
+        while not is_stopped.is_set():
+            try:
+                prefetched.put(item, timeout=PREFETCH_POLLING_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def decode_blocks():
+        try:
+            for item in blocks:
+                if not put_item(item):
+                    break
+            put_item(end_of_blocks)
+        except BaseException as err:
+            put_item(err)
+        finally:
+            if hasattr(blocks, 'close'):
+                blocks.close()
+
+    decoding_thread = threading.Thread(target=decode_blocks, daemon=True)
+    decoding_thread.start()
+    try:
+        while True:
+            item = prefetched.get()
+            if item is end_of_blocks:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+            del item
+    finally:
+        is_stopped.set()
+        decoding_thread.join()
+
+
+def wav_codec_name(header: WavHeader) -> str:
+    if header.audio_format == WAVE_FORMAT_PCM:
+        if header.bytes_per_sample == 1:
+            return 'pcm_u8'
+        return f'pcm_s{8 * header.bytes_per_sample}le'
+    if header.audio_format == WAVE_FORMAT_IEEE_FLOAT:
+        return f'pcm_f{8 * header.bytes_per_sample}le'
+    return f'wav_format_0x{header.audio_format:04x}'
+
+
+def _parse_ffprobe_output(output: str, source_name: str) -> AudioInfo:
+    err_msg_prefix = f'The file "{source_name}" cannot be opened.'
+    try:
+        probe_results = json.loads(output)
+    except ValueError as err:
+        raise IOError(f'{err_msg_prefix} FFprobe output is wrong: {str(err)}')
+    audio_streams = [it for it in probe_results.get('streams', []) if it.get('codec_type') == 'audio']
+    if len(audio_streams) == 0:
+        raise IOError(f'{err_msg_prefix} There are no audio streams.')
+    stream_info = audio_streams[0]
+    format_info = probe_results.get('format', {})
+    duration = None
+    for duration_str in (stream_info.get('duration'), format_info.get('duration')):
+        try:
+            duration = float(duration_str)
+            break
+        except (TypeError, ValueError):
+            pass
+    try:
+        n_channels = int(stream_info.get('channels', 0))
+        sampling_frequency = int(stream_info.get('sample_rate', 0))
+    except (TypeError, ValueError) as err:
+        raise IOError(f'{err_msg_prefix} FFprobe output is wrong: {str(err)}')
+    return AudioInfo(
+        duration=duration,
+        n_channels=n_channels,
+        sampling_frequency=sampling_frequency,
+        codec=str(stream_info.get('codec_name', 'unknown')),
+        container=str(format_info.get('format_name', 'unknown'))
+    )
+
+
+def probe_audio(source: Union[str, BinaryIO]) -> AudioInfo:
+    """
+    Reads the duration, the channel number, the sampling frequency, the codec and the container of a sound
+    without decoding its samples.
+
+    WAV headers are parsed in-process, and other formats are examined by FFprobe, which reads only the container
+    headers, so it takes milliseconds even for a multi-gigabyte file. The position of a seekable stream is restored.
+
+    Raises IOError if the file does not exist, cannot be opened, or has no audio streams.
+    """
+    if isinstance(source, str):
+        if not os.path.isfile(source):
+            err_msg = f'The file "{source}" does not exist!'
+            raise IOError(err_msg)
+    source_name = _source_name(source)
+    wav_header = _try_read_wav_header(source)
+    if wav_header is not None:
+        return AudioInfo(
+            duration=wav_header.n_frames / float(wav_header.sampling_frequency),
+            n_channels=wav_header.n_channels,
+            sampling_frequency=wav_header.sampling_frequency,
+            codec=wav_codec_name(wav_header),
+            container='wav'
+        )
+    cmd = [
+        FFPROBE_EXECUTABLE, '-hide_banner', '-loglevel', 'error', '-print_format', 'json',
+        '-show_entries', 'format=format_name,duration:stream=codec_type,codec_name,channels,sample_rate,duration',
+        source if isinstance(source, str) else 'pipe:0'
+    ]
+    is_seekable = (not isinstance(source, str)) and hasattr(source, 'seekable') and source.seekable()
+    start_pos = source.tell() if is_seekable else None
+    proc, helper_threads, error_messages = _start_ffmpeg(cmd, source, program_name='FFprobe')
+    try:
+        output = proc.stdout.read()
+    finally:
+        return_code = _finish_ffmpeg(proc, helper_threads, error_messages)
+        if start_pos is not None:
+            source.seek(start_pos, os.SEEK_SET)
+    _check_ffmpeg_result(return_code, error_messages, source)
+    return _parse_ffprobe_output(output.decode('utf-8', errors='replace'), source_name)
+
 
 def transform_to_wavpcm(src_fname: str, dst_fname: str) -> None:
     found_idx = src_fname.rfind('.')
@@ -83,27 +961,213 @@ def transform_to_wavpcm(src_fname: str, dst_fname: str) -> None:
     if not os.path.isfile(src_fname):
         err_msg = f'The file "{src_fname}" does not exist!'
         raise IOError(err_msg)
-    source_audio_extension = src_fname[(found_idx + 1):]
+    pcm = decode_audio(src_fname)
+    with wave.open(dst_fname, 'wb') as fp:
+        fp.setnchannels(1)
+        fp.setsampwidth(2)
+        fp.setframerate(TARGET_SAMPLING_FREQUENCY)
+        if pcm is not None:
+            fp.writeframes(memoryview(np.ascontiguousarray(pcm, dtype='<i2')).cast('B'))
+
+
+def _decode_audio_worker(fname: str, cache_dir: Optional[str],
+                         cache_max_size: int) -> Tuple[Optional[np.ndarray], Optional[str]]:
     try:
-        audio = AudioSegment.from_file(src_fname, format=source_audio_extension)
-    except CouldntDecodeError as e1:
-        audio = None
-        additional_err_msg = str(e1)
-    except BaseException as e2:
-        audio = None
-        additional_err_msg = str(e2)
-    else:
-        additional_err_msg = ''
-    if audio is None:
-        err_msg = f'The file "{src_fname}" cannot be opened.'
-        if additional_err_msg != '':
-            err_msg += f' {additional_err_msg}'
-        raise IOError(err_msg)
-    if audio.channels != 1:
-        audio.set_channels(1)
-    if audio.frame_rate != TARGET_SAMPLING_FREQUENCY:
-        audio.set_frame_rate(TARGET_SAMPLING_FREQUENCY)
-    if audio.frame_width != 2:
-        audio.set_sample_width(2)
-    target_parameters = ['-ac', '1', '-ar', f'{TARGET_SAMPLING_FREQUENCY}', '-acodec', 'pcm_s16le']
-    audio.export(dst_fname, format='wav', parameters=target_parameters)
+        if cache_dir is None:
+            sound = decode_audio(fname)
+        else:
+            sound = AudioCache(cache_dir, cache_max_size).load(fname)
+            if sound is not None:
+                sound = np.array(sound)
+    except BaseException as err:
+        return None, str(err)
+    return sound, None
+
+
+def decode_audio_batch(fnames: Iterable[str], n_processes: Optional[int] = None,
+                       max_in_flight: Optional[int] = None, ordered: bool = True,
+                       cache_dir: Optional[str] = None,
+                       cache_max_size: int = AUDIO_CACHE_MAX_SIZE
+                       ) -> Iterator[Tuple[str, Optional[np.ndarray], Optional[str]]]:
+    """
+    Decodes many sound files concurrently in a pool of processes.
+
+    At most `max_in_flight` files are being decoded or waiting to be consumed at once, so the memory usage
+    is bounded however many files there are. The first sounds are yielded as soon as they are decoded,
+    so the caller may transcribe them while the others are still being decoded.
+
+    Arguments:
+    - fnames: sound file names.
+    - n_processes: a number of worker processes (the CPU number by default).
+    - max_in_flight: a number of files which are decoded in advance (twice the number of processes by default).
+    - ordered: if True, the sounds are yielded in the order of `fnames`, otherwise in the order of completion.
+    - cache_dir: the `AudioCache` directory, if the decoded sounds should be cached.
+    - cache_max_size: the maximal size of the cache in bytes.
+
+    Yields triples of a file name, an int16 waveform (as `decode_audio` returns) and an error message.
+    The error message is None for successfully decoded files, and the waveform is None for failed or empty ones.
+
+    Example:
+    ```
+    for fname, pcm, err_msg in decode_audio_batch(sorted(glob.glob('data/*.mp3')), ordered=False):
+        if err_msg is None:
+            transcribe(AudioBuffer(pcm), ...)
+    ```
+    """
+    if n_processes is None:
+        n_processes = max(1, os.cpu_count() or 1)
+    if n_processes < 1:
+        err_msg = f'The process number is wrong! Expected a positive value, got {n_processes}.'
+        raise ValueError(err_msg)
+    if max_in_flight is None:
+        max_in_flight = 2 * n_processes
+    if max_in_flight < 1:
+        err_msg = f'The in-flight file number is wrong! Expected a positive value, got {max_in_flight}.'
+        raise ValueError(err_msg)
+    fname_iterator = iter(fnames)
+    pending: deque = deque()
+    future_names: Dict[Future, str] = dict()
+    # The spawn start method is used, because forking a process with loaded models and their threads is not safe.
+    with ProcessPoolExecutor(max_workers=n_processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+        try:
+            while True:
+                while len(future_names) < max_in_flight:
+                    fname = next(fname_iterator, None)
+                    if fname is None:
+                        break
+                    new_future = pool.submit(_decode_audio_worker, fname, cache_dir, cache_max_size)
+                    future_names[new_future] = fname
+                    pending.append(new_future)
+                if len(future_names) == 0:
+                    break
+                if ordered:
+                    done_future = pending.popleft()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    done_future = min(done, key=lambda it: pending.index(it))
+                    pending.remove(done_future)
+                fname = future_names.pop(done_future)
+                sound, err_msg = done_future.result()
+                del done_future
+                yield fname, sound, err_msg
+                del sound
+        finally:
+            for cur_future in pending:
+                cur_future.cancel()
+
+
+class AudioCache:
+    """
+    Content-addressed on-disk cache of decoded sounds.
+
+    Each entry is a mono 16kHz int16 waveform saved as a .npy file, which is named after SHA-256 of the source
+    bytes and the decoding parameters, so the same content is decoded only once across all consumers and runs,
+    whatever its file name is. Cached waveforms are returned memory-mapped. When the total size of the cache
+    exceeds `max_size` bytes, the least recently used entries are removed.
+
+    Example:
+    ```
+    cache = AudioCache('cache/audio')
+    pcm = cache.load('data/interview.mp3')  # decoded by FFmpeg and saved
+    pcm = cache.load('data/interview.mp3')  # memory-mapped from the cache
+    ```
+    """
+    def __init__(self, cache_dir: str, max_size: int = AUDIO_CACHE_MAX_SIZE):
+        if max_size <= 0:
+            raise ValueError(f'The maximal cache size = {max_size} is wrong! Expected a positive integer.')
+        self.cache_dir = os.path.normpath(cache_dir)
+        self.max_size = max_size
+        self._known_keys: Dict[Tuple[str, int, int], str] = dict()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, fname: str) -> str:
+        """
+        Calculates the cache key of the sound file `fname` (the hash is memorized while the file is not modified).
+        """
+        stat = os.stat(fname)
+        file_id = (os.path.abspath(fname), stat.st_size, stat.st_mtime_ns)
+        if file_id not in self._known_keys:
+            hasher = hashlib.sha256()
+            hasher.update(f'v{AUDIO_CACHE_VERSION};fs={TARGET_SAMPLING_FREQUENCY};channels=1;s16le;'.encode('ascii'))
+            with open(fname, 'rb') as fp:
+                while True:
+                    chunk = fp.read(PIPE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+            self._known_keys[file_id] = hasher.hexdigest()
+        return self._known_keys[file_id]
+
+    def entry_name(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.npy')
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Returns a memory-mapped cached waveform, or None if there is no such entry.
+        """
+        entry_name = self.entry_name(key)
+        try:
+            pcm = np.load(entry_name, mmap_mode='r')
+            os.utime(entry_name)
+        except (FileNotFoundError, ValueError):
+            return None
+        return pcm
+
+    def put(self, key: str, pcm: np.ndarray) -> np.ndarray:
+        """
+        Saves the int16 waveform into the cache and returns its memory-mapped copy. A waveform which is larger
+        than the whole cache is not saved and is returned as is.
+        """
+        if pcm.nbytes > self.max_size:
+            return pcm
+        entry_name = self.entry_name(key)
+        tmp_name = entry_name + f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_name, 'wb') as fp:
+                np.save(fp, np.ascontiguousarray(pcm, dtype=np.int16))
+            os.replace(tmp_name, entry_name)
+        finally:
+            if os.path.isfile(tmp_name):
+                os.remove(tmp_name)
+        self.evict(keep=entry_name)
+        return np.load(entry_name, mmap_mode='r')
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        Removes the least recently used entries (except `keep`) until the cache size does not exceed the limit.
+        """
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as it:
+            for dir_entry in it:
+                if dir_entry.name.endswith('.npy') and dir_entry.is_file():
+                    stat = dir_entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, dir_entry.path))
+                    total_size += stat.st_size
+        entries.sort()
+        for _, entry_size, entry_name in entries:
+            if total_size <= self.max_size:
+                break
+            if entry_name == keep:
+                continue
+            try:
+                os.remove(entry_name)
+            except FileNotFoundError:
+                pass
+            total_size -= entry_size
+
+    def load(self, fname: str) -> Optional[np.ndarray]:
+        """
+        Returns the mono 16kHz int16 waveform of the sound file `fname` (see `decode_audio`), decoding it only
+        if it is not cached yet. Returns None for an empty sound.
+        """
+        if not os.path.isfile(fname):
+            err_msg = f'The file "{fname}" does not exist!'
+            raise IOError(err_msg)
+        key = self.key(fname)
+        pcm = self.get(key)
+        if pcm is None:
+            pcm = decode_audio(fname)
+            if pcm is not None:
+                pcm = self.put(key, pcm)
+        return pcm